@@ -1,26 +1,24 @@
 # Stores account information persistantly
-import json
-import os
-from os import path
 import threading
+from utility import log, storage
+
+_logger = log.get("account")
 
 
 class Account:
     # TODO : Use collections.UserDict ???
     """Models a user account.
 
-    Stores username, password, phone number and cookies persistantly.
+    Stores username, password, phone number and cookies persistantly in utility.storage.
 
     Attributes:
         username : str - Unique for Twitch so acts as an ID
         admin : bool - Is the user an admin (for purposes of notifications)
         lock : Lock - Use when changing account details e.g. cookies
-        _file_lock : Lock - Lock for saving and loading
+        expires : float - Timestamp the cookies stop working, None if not known
         _temporary : bool - Is this user account temporary
     """
 
-    _file = path.join(path.dirname(path.realpath(__file__)), "resources", "users")
-
     def __init__(self, username: str) -> None:
         self.username = username
         self.lock = threading.Lock()
@@ -28,26 +26,41 @@ class Account:
         self.phone = None
         self.admin = None
         self.cookies = None
-        self._file_lock = threading.Lock()  # TODO : Simplify this
+        self.expires = None
         self._temporary = False
 
-    def _save(self) -> None:
-        """Save the account."""
-        if self._temporary:
-            return
-
-        # Format for json
-        data = {
+    def _data(self) -> dir:
+        """The account details to store."""
+        return {
             "password": self.password,
             "phone": self.phone,
             "admin": self.admin,
             "cookies": self.cookies,
+            "expires": self.expires,
         }
 
-        self._file_lock.acquire()
-        with open(path.join(Account._file, self.username + ".json"), "w") as file:
-            json.dump(data, file)
-        self._file_lock.release()
+    def _fill(self, data: dir) -> None:
+        """Set the account details from stored data."""
+        self.password = data["password"]
+        self.phone = data["phone"]
+        self.admin = data["admin"]
+        self.cookies = data["cookies"]
+        self.expires = data.get("expires")  # Not stored before cookies were validated
+
+    def _save(self, buffered: bool = False) -> None:
+        """Save the account.
+
+        Args:
+            buffered : bool - Write later together with other saves, for frequent changes like cookies
+        """
+        if self._temporary:
+            return
+
+        if buffered:
+            storage.writer().put(self.username, self._data())
+        else:
+            storage.writer().discard(self.username)
+            storage.store().save(self.username, self._data())
 
     def delete(self) -> None:
         """Delete the account.
@@ -57,13 +70,13 @@ class Account:
         if self._temporary:
             return
 
-        if not path.isfile(path.join(Account._file, self.username + ".json")):
-            print("[!!] %s does not exsist" % self.username)
-            raise FileNotFoundError
+        storage.writer().discard(self.username)
 
-        self._file_lock.acquire()
-        os.remove(path.join(Account._file, self.username + ".json"))
-        self._file_lock.release()
+        try:
+            storage.store().delete(self.username)
+        except FileNotFoundError:
+            log.write(_logger, "[!!] %s does not exsist" % self.username)
+            raise
 
     def load(self) -> None:
         """Load the account from storage.
@@ -71,19 +84,16 @@ class Account:
         Raises:
             FileNotFoundError - If the user account is not stored
         """
-        if not path.isfile(path.join(Account._file, self.username + ".json")):
-            print("[!!] %s does not exsist" % self.username)
-            raise FileNotFoundError
+        data = storage.writer().get(self.username)
 
-        self._file_lock.acquire()
-        with open(path.join(Account._file, self.username + ".json"), "r") as file:
-            data = json.load(file)
+        if data == None:
+            try:
+                data = storage.store().load(self.username)
+            except FileNotFoundError:
+                log.write(_logger, "[!!] %s does not exsist" % self.username)
+                raise
 
-        self.password = data["password"]
-        self.phone = data["phone"]
-        self.admin = data["admin"]
-        self.cookies = data["cookies"]
-        self._file_lock.release()
+        self._fill(data)
 
     def create(
         self,
@@ -115,7 +125,14 @@ class Account:
         """Login account to Twitch.
 
         When you got cookies, who needs a password?
+        Saving is buffered as many users may login at once.
         """
         self.cookies = cookies
         self.password = None
-        self._save()
+        self.expires = None
+        self._save(buffered=True)
+
+    def record_expiry(self, expires: float) -> None:
+        """Record when the cookies stop working, saving is buffered like logging in."""
+        self.expires = expires
+        self._save(buffered=True)
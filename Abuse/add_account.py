@@ -71,7 +71,7 @@ def add_account(user_info: list[str, str, bool, str] = None) -> None:
             user_info[2] = True if user_info[2].lower().strip() == "true" else False
 
     # Update user account
-    if any(person.username == user_info[0] for person in accounts.get_accounts()):
+    if user_info[0] in accounts.registry():
         print("[+] updating exsisting account: %s " % user_info[0])
         user = account.Account(user_info[0])
         user.load()
@@ -0,0 +1,190 @@
+# Decides which drops campaign each user account watches
+from datetime import datetime
+import threading
+import time
+import twitch_api
+
+# Campaign watched when none are configured, each campaign has a game and directory tags
+DEFAULT = {"game": twitch_api.GAME, "tags": [twitch_api.DROPS_TAG]}
+
+
+def _end_time(end: str) -> float:
+    """Timestamp of a campaign's endAt, None if it has none."""
+    if not end:
+        return None
+
+    return datetime.fromisoformat(end.replace("Z", "+00:00")).timestamp()
+
+
+def read_inventory(campaigns: list) -> dir:
+    """Minutes to each game's next drop and when its campaign ends.
+
+    Args:
+        campaigns : list - dropCampaignsInProgress from the inventory query
+
+    Returns:
+        Lower case game name to {"remaining": minutes or None if every drop is earned, "end": timestamp or None}.
+    """
+    progress = {}
+
+    for campaign in campaigns:
+        game = ((campaign.get("game") or {}).get("name") or "").lower()
+        remaining = [
+            drop["requiredMinutesWatched"]
+            - (drop["self"]["currentMinutesWatched"] if drop.get("self") else 0)
+            for drop in campaign.get("timeBasedDrops") or []
+            if not (drop.get("self") and drop["self"]["isClaimed"])
+        ]
+        remaining = [minutes for minutes in remaining if minutes > 0]
+
+        entry = {
+            "remaining": min(remaining) if remaining else None,
+            "end": _end_time(campaign.get("endAt")),
+        }
+
+        # A game with several campaigns is watched for the one with the soonest drop
+        known = progress.get(game)
+        if known == None or (
+            entry["remaining"] != None
+            and (known["remaining"] == None or entry["remaining"] < known["remaining"])
+        ):
+            progress[game] = entry
+
+    return progress
+
+
+class Campaign_Scheduler:
+    """Picks the campaign a user account should watch next from its inventory.
+
+    The campaign with the fewest minutes to its next drop is watched first, so drops are
+    earned as often as possible, unless that would make a campaign ending sooner miss its end.
+    Campaigns that cannot be finished before they end are skipped.
+    Configured campaigns not in the inventory yet are tried in order for a probe period each,
+    watching is what starts them. The probe only starts once the inventory has been read,
+    until then pages fall back to what they can see.
+
+    Attributes:
+        campaigns : list - Configured campaigns in preference order
+        probe : float - Seconds a campaign missing from the inventory is watched before giving up on it
+        _directories : dir - Game to the Directory shared by every stream watching it
+        _progress : dir - Lower case game to its remaining minutes and end, from the last inventory
+        _seen : set - Lower case games that have been in the inventory
+        _started : dir - Lower case game to when it was first tried without being in the inventory
+        _current : dir - Campaign last chosen, None if none
+        _answered : bool - Has the inventory been read
+        _lock : Lock - Use when changing the schedule
+    """
+
+    def __init__(
+        self,
+        campaigns: list = None,
+        directories: dir = None,
+        probe: float = 1800,
+    ) -> None:
+        if campaigns == []:
+            raise ValueError("[!!] At least one campaign is needed")
+
+        self.campaigns = campaigns or [DEFAULT]
+        self.probe = probe
+        self._directories = directories or {}
+        self._progress = {}
+        self._seen = set()
+        self._started = {}
+        self._current = None
+        self._answered = False
+        self._lock = threading.Lock()
+
+    def update(self, campaigns: list) -> None:
+        """Record the campaigns in progress from the inventory.
+
+        Args:
+            campaigns : list - dropCampaignsInProgress from the inventory query
+        """
+        progress = read_inventory(campaigns)
+
+        with self._lock:
+            self._progress = progress
+            self._seen.update(progress)
+            self._answered = True
+
+    def choose(self, now: float = None) -> dir:
+        """Get the campaign to watch now.
+
+        Returns:
+            The campaign or None if there is nothing left to watch.
+        """
+        now = time.time() if now == None else now
+
+        with self._lock:
+            campaign = self._pick(now)
+
+            if campaign != None:
+                # Missing from an inventory never read is not known to be missing
+                game = campaign["game"].lower()
+                if game not in self._seen and self._answered:
+                    self._started.setdefault(game, now)
+
+            self._current = campaign
+            return campaign
+
+    def current(self) -> dir:
+        """The campaign last chosen, None if none."""
+        with self._lock:
+            return self._current
+
+    def answered(self) -> bool:
+        """Has the inventory been read, until then done is never True."""
+        with self._lock:
+            return self._answered
+
+    def done(self, now: float = None) -> bool:
+        """Is there nothing left to watch."""
+        now = time.time() if now == None else now
+
+        with self._lock:
+            return self._pick(now) == None
+
+    def directory(self, campaign: dir):
+        """The shared directory for a campaign, None to browse its directory."""
+        return self._directories.get(campaign["game"])
+
+    def _pick(self, now: float) -> dir:
+        """See choose, the lock must be held."""
+        live = []
+        for rank, campaign in enumerate(self.campaigns):
+            entry = self._progress.get(campaign["game"].lower())
+
+            if entry == None or entry["remaining"] == None:
+                continue
+
+            end = entry["end"] if entry["end"] != None else float("inf")
+            if now + entry["remaining"] * 60 <= end:
+                live.append((entry["remaining"], rank, end, campaign))
+
+        if live:
+            shortest = min(live, key=lambda candidate: candidate[:2])
+
+            # Campaigns that would end before they are reached if the shortest went first
+            urgent = [
+                candidate
+                for candidate in live
+                if candidate is not shortest
+                and now + (shortest[0] + candidate[0]) * 60 > candidate[2]
+            ]
+            if urgent:
+                return min(urgent, key=lambda candidate: candidate[2] - candidate[0] * 60)[3]
+
+            return shortest[3]
+
+        # Nothing known is left, try campaigns the inventory has never shown
+        for campaign in self.campaigns:
+            game = campaign["game"].lower()
+
+            if game in self._seen:
+                continue
+
+            started = self._started.get(game)
+            if started == None or now - started < self.probe:
+                return campaign
+
+        return None
@@ -0,0 +1,254 @@
+# One directory of droppable streams shared by every user account
+import math
+import threading
+import time
+from urllib import parse
+from selenium.common.exceptions import WebDriverException
+import campaigns
+import twitch_api
+from utility import chrome, log, reputation
+
+_logger = log.get("discovery")
+
+
+def directory_url(campaign: dir, base: str = twitch_api.WWW_URL) -> str:
+    """Directory page of a campaign's game filtered by its tags, on the base site."""
+    url = "%s/directory/game/%s" % (base, parse.quote(campaign["game"]))
+
+    if campaign["tags"]:
+        url += "/tags/" + ",".join(campaign["tags"])
+
+    return url
+
+
+# Directory twitch.Stream browses when not using discovery
+DIRECTORY_URL = directory_url(campaigns.DEFAULT)
+
+# Title links of the stream cards in the directory, in the order shown
+_CARDS_SCRIPT = """
+var links = document.querySelectorAll("a[data-a-target='preview-card-title-link']");
+return Array.prototype.map.call(links, function (link) { return link.getAttribute("href"); });
+"""
+
+
+def logins(links: list) -> list:
+    """Channel logins from the card links, in order and without repeats."""
+    found = []
+    for link in links:
+        login = parse.urlparse(link).path.strip("/").split("/")[0].lower()
+
+        if login and login not in found:
+            found.append(login)
+
+    return found
+
+
+def http_fetcher(
+    url: str = twitch_api.GQL_URL, limit: int = 30, campaign: dir = campaigns.DEFAULT
+) -> callable:
+    """Get a fetcher listing a campaign's directory through GraphQL, no account is needed."""
+    client = twitch_api.Client(None, url)
+
+    def fetch() -> list:
+        edges = client.query(
+            "DirectoryPage_Game",
+            twitch_api.DIRECTORY_QUERY,
+            {
+                "name": campaign["game"],
+                "options": {"tags": campaign["tags"], "sort": "RELEVANCE"},
+                "limit": limit,
+            },
+        )["game"]["streams"]["edges"]
+
+        return [
+            {
+                "login": edge["node"]["broadcaster"]["login"],
+                "id": edge["node"]["broadcaster"]["id"],
+                "broadcast id": edge["node"]["id"],
+                "viewers": edge["node"]["viewersCount"],
+            }
+            for edge in edges
+        ]
+
+    return fetch
+
+
+def browser_fetcher(headless: bool = True, url: str = DIRECTORY_URL) -> callable:
+    """Get a fetcher scraping the directory page in a browser launched for each fetch."""
+
+    def fetch() -> list:
+        try:
+            driver = chrome.launch(headless)
+        except EnvironmentError as error:
+            raise ConnectionError("[!!] Could not start webdriver: %s" % error)
+
+        try:
+            driver.get(url)
+            time.sleep(5)  # Cards are rendered by script after load
+            links = driver.execute_script(_CARDS_SCRIPT)
+        except WebDriverException as error:
+            raise ConnectionError("[!!] Directory failed: %s" % error)
+        finally:
+            driver.quit()
+
+        return [
+            {"login": login, "id": None, "broadcast id": None, "viewers": None}
+            for login in logins(links)
+        ]
+
+    return fetch
+
+
+class Directory:
+    """Live, drops enabled channels fetched at most once per ttl and handed out to streams.
+
+    Each claim gets the channel with the best score shared with the streams already on it,
+    so accounts spread across channels instead of all watching the first.
+    Channels that went offline or stopped dropping are left out until the next fetch.
+
+    Attributes:
+        ttl : float - Seconds a fetched directory is used for
+        retry : float - Seconds before fetching again after a failed fetch
+        _fetch : callable - Returns the directory as a list of channels
+        _reputations : Reputation_Store - How stable channels have been in past sessions
+        _channels : list - Channel dirs in rank order, each has login, id, broadcast id and viewers
+        _seen : dir - Login to when the channel was first fetched live, reset once it leaves the directory
+        _assigned : dir - Login to the number of streams watching it
+        _fetched : float - When the directory was last fetched, None if never
+        _lock : Lock - Use when changing channels or assignments
+        _fetch_lock : Lock - Held whilst fetching so only one stream fetches at a time
+        _fetches : int - Number of fetches made
+    """
+
+    def __init__(
+        self,
+        fetch: callable,
+        ttl: float = 300,
+        retry: float = 60,
+        reputations: reputation.Reputation_Store = None,
+    ) -> None:
+        self.ttl = ttl
+        self.retry = retry
+        self._fetch = fetch
+        self._reputations = reputations or reputation.reputations
+        self._channels = []
+        self._seen = {}
+        self._assigned = {}
+        self._fetched = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._fetches = 0
+
+    def refresh(self, force: bool = False) -> None:
+        """Fetch the directory if it is older than the ttl.
+
+        Args:
+            force : bool - Fetch even if the directory is fresh
+        """
+        with self._fetch_lock:
+            if not force and not self._stale():
+                return
+
+            self._fetches += 1
+
+            try:
+                channels = self._fetch()
+            except ConnectionError as error:
+                log.write(_logger, "[!] Directory fetch failed: %s" % error)
+
+                # Keep using the old directory for now
+                with self._lock:
+                    self._fetched = time.monotonic() - self.ttl + self.retry
+                return
+
+            with self._lock:
+                now = time.monotonic()
+                self._seen = {
+                    channel["login"]: self._seen.get(channel["login"], now)
+                    for channel in channels
+                }
+                self._channels = channels
+                self._fetched = now
+
+    def channels(self) -> list:
+        """The channels in rank order."""
+        self.refresh()
+
+        with self._lock:
+            return [dict(channel) for channel in self._channels]
+
+    def claim(self, exclude: list = None) -> dir:
+        """Get a channel to watch, it must be released once no longer watched.
+
+        Args:
+            exclude : list - Logins not to give out, e.g. ones that already failed this session
+
+        Returns:
+            A copy of the channel or None if there are none.
+        """
+        self.refresh()
+        exclude = exclude or []
+
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                (
+                    -self._score(channel, now)
+                    / (1 + self._assigned.get(channel["login"], 0)),
+                    rank,
+                    channel,
+                )
+                for rank, channel in enumerate(self._channels)
+                if channel["login"] not in exclude
+            ]
+
+            if not candidates:
+                return None
+
+            _, _, channel = min(candidates, key=lambda candidate: candidate[:2])
+            self._assigned[channel["login"]] = self._assigned.get(channel["login"], 0) + 1
+            return dict(channel)
+
+    def score(self, channel: dir) -> float:
+        """How good a channel is to watch, higher is better and unknown channels score 1."""
+        with self._lock:
+            return self._score(channel, time.monotonic())
+
+    def release(self, login: str) -> None:
+        """Stop counting a stream as watching a channel."""
+        with self._lock:
+            if self._assigned.get(login, 0) > 1:
+                self._assigned[login] -= 1
+            else:
+                self._assigned.pop(login, None)
+
+    def offline(self, login: str) -> None:
+        """Stop giving out a channel found offline or not dropping until the next fetch."""
+        with self._lock:
+            self._channels = [
+                channel for channel in self._channels if channel["login"] != login
+            ]
+
+    def stats(self) -> dir:
+        with self._lock:
+            return {
+                "fetches": self._fetches,
+                "channels": len(self._channels),
+                "assigned": dict(self._assigned),
+            }
+
+    def _score(self, channel: dir, now: float) -> float:
+        """Stability from past sessions, raised by viewers and by how long the channel has been seen live."""
+        viewers = channel["viewers"] or 0
+        uptime = now - self._seen.get(channel["login"], now)
+
+        return (
+            self._reputations.stability(channel["login"])
+            * 2
+            * (1 + math.log10(1 + viewers))
+            * (1 + min(uptime, 3600) / 7200)
+        )
+
+    def _stale(self) -> bool:
+        with self._lock:
+            return self._fetched == None or time.monotonic() - self._fetched >= self.ttl
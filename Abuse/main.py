@@ -1,10 +1,133 @@
 # Main program to build and run classes
+import functools
 from os import path
 import queue
 import sys
 import threading
+import account
+import campaigns
+import discovery
+import scheduler
+import sessions
 import twitch
-from utility import accounts
+import twitch_api
+from utility import (
+    accounts,
+    driver_pool,
+    log,
+    metrics,
+    rate_limit,
+    reputation,
+    request_filter,
+    storage,
+    tracing,
+    wait_budget,
+)
+
+_logger = log.get("main")
+
+# Change these flags to configure the run
+SHUTDOWN_ON_FINISH = False  # Should the system shutdown at the end
+HEADLESS = False  # Change this to hide/show the Twitch windows
+AUTO_CLAIM = True  # Might be a bug - don't auto claim whilst playing smite
+SHARED_BROWSER = False  # Run stream and inventory as two tabs in one browser per user
+DRIVER_POOL = 0  # No. of warm browsers kept to reuse between users, 0 to always launch new
+DRIVER_REUSES = 10  # No. of users a pooled browser is used for before being replaced
+INVENTORY_BACKEND = "browser"  # "browser" or "http" to check drops without a browser
+STREAM_BACKEND = "browser"  # "browser" or "http" to watch without a browser or video
+ASYNC_RUNTIME = True  # Run users as asyncio tasks instead of a thread per stream/inventory
+DISCOVERY = "http"  # "http" or "browser" to share one directory between all streams, None for each stream to browse it
+DISCOVERY_TTL = 300  # Seconds the shared directory is used before fetching it again
+# Drops campaigns to watch in preference order, each is a game and the directory tags to filter its streams by
+CAMPAIGNS = [campaigns.DEFAULT]
+WATCH_SESSIONS = False  # Warn in the background when stored cookies are about to expire or stop working
+METRICS_PORT = None  # Port to serve Prometheus metrics on localhost, None to not serve them, supervisor workers use the next ports up
+METRICS_FILE = None  # JSON file metrics are dumped to periodically, None to not dump them, supervisor workers add -<worker> to the name
+METRICS_INTERVAL = 60  # Seconds between metrics dumps
+BLOCKING_THREADS = 0  # No. of threads for selenium/http calls in the asyncio runtime, 0 for 2 per user up to 64
+# Should admins/users be alerted at end of program or users alerted when drops are claimable/claimed
+NOTIFICATIONS = {
+    "notify admins at end": False,
+    "notify user at end": False,
+    "notify user about claimable drops": False,
+}
+
+
+def build_pages(
+    user_account: account.Account,
+    headless: bool,
+    auto_claim: bool,
+    notifications: dir,
+    shared_browser: bool = False,
+    pool: driver_pool.Driver_Pool = None,
+    inventory_backend: str = "browser",
+    stream_backend: str = "browser",
+    directories: dir = None,
+    drop_campaigns: list = None,
+) -> tuple:
+    """Build the stream and inventory for a user account.
+
+    With several campaigns they share a schedule deciding which to watch from the inventory,
+    the default campaign alone needs no schedule. See Person for the settings.
+
+    Returns:
+        ([stream, inventory], whether to notify the user at the end)
+    """
+    # If you can and should send them messages, send them messages
+    if user_account.phone != None:
+        notify_on_claim = notifications["notify user about claimable drops"]
+        notify_at_end = notifications["notify user at end"]
+    else:
+        notify_on_claim = False
+        notify_at_end = False
+
+    drops = threading.Event()
+    session = twitch.Session(user_account) if shared_browser else None
+    if drop_campaigns and drop_campaigns != [campaigns.DEFAULT]:
+        schedule = campaigns.Campaign_Scheduler(drop_campaigns, directories)
+    else:
+        schedule = None
+
+    # Streams start on the default campaign
+    directory = (directories or {}).get(campaigns.DEFAULT["game"])
+
+    # The http backends need cookies, without them the browser must login first
+    if stream_backend == "http" and user_account.cookies != None:
+        stream = twitch_api.Stream(
+            user_account, drops, directory=directory, schedule=schedule
+        )
+    else:
+        stream = twitch.Stream(
+            user_account,
+            drops,
+            headless=headless,
+            session=session,
+            pool=pool,
+            directory=directory,
+            schedule=schedule,
+        )
+
+    if inventory_backend == "http" and user_account.cookies != None:
+        inv = twitch_api.Inventory(
+            user_account,
+            drops,
+            auto_claim=auto_claim,
+            notify_on_claim=notify_on_claim,
+            schedule=schedule,
+        )
+    else:
+        inv = twitch.Inventory(
+            user_account,
+            drops,
+            auto_claim=auto_claim,
+            notify_on_claim=notify_on_claim,
+            headless=headless,
+            session=session,
+            pool=pool,
+            schedule=schedule,
+        )
+
+    return [stream, inv], notify_at_end
 
 
 class Person(threading.Thread):
@@ -18,16 +141,41 @@ class Person(threading.Thread):
         _headless : bool - Should the selenium driver be headless
         _auto_claim : bool - Should drops be automatically claimed
         _notifications : dir - Various notification settings
+        _shared_browser : bool - Should stream and inventory share one browser as two tabs
+        _pool : Driver_Pool - Warm browsers shared by all people, None to always launch new browsers
+        _inventory_backend : str - "browser" to use twitch.Inventory or "http" to use twitch_api.Inventory
+        _stream_backend : str - "browser" to use twitch.Stream or "http" to use twitch_api.Stream
+        _directories : dir - Game to the channels shared by all streams, empty for each stream to browse the directory
+        _campaigns : list - Drops campaigns to watch in preference order
+        _finished : callable - Called with each user account once it is finished, may be None
     """
 
     def __init__(
-        self, people: queue.Queue, headless: bool, auto_claim: bool, notifications: dir
+        self,
+        people: queue.Queue,
+        headless: bool,
+        auto_claim: bool,
+        notifications: dir,
+        shared_browser: bool = False,
+        pool: driver_pool.Driver_Pool = None,
+        inventory_backend: str = "browser",
+        stream_backend: str = "browser",
+        directories: dir = None,
+        drop_campaigns: list = None,
+        finished: callable = None,
     ) -> None:
         threading.Thread.__init__(self)
         self._queue = people
         self._headless = headless
         self._auto_claim = auto_claim
         self._notifications = notifications
+        self._shared_browser = shared_browser
+        self._pool = pool
+        self._inventory_backend = inventory_backend
+        self._stream_backend = stream_backend
+        self._directories = directories
+        self._campaigns = drop_campaigns
+        self._finished = finished
 
         # https://github.com/twilio/twilio-java/issues/428#issuecomment-697868934
         if self._notifications["notify user at end"]:
@@ -42,90 +190,227 @@ class Person(threading.Thread):
         while True:
             user_account = self._queue.get()
 
-            print(user_account.username, "-", "[*] Threading.")
-
-            # If you can and should send them messages, send them messages
-            if user_account.phone != None:
-                notify_on_claim = self._notifications[
-                    "notify user about claimable drops"
-                ]
-                notify_at_end = self._notifications["notify user at end"]
-            else:
-                notify_on_claim = False
-                notify_at_end = False
-
-            drops = threading.Event()
-            stream = twitch.Stream(user_account, drops, headless=self._headless)
-            inv = twitch.Inventory(
-                user_account,
-                drops,
-                auto_claim=self._auto_claim,
-                notify_on_claim=notify_on_claim,
-                headless=self._headless,
-            )
-
-            stream.start()
-            inv.start()
-
-            # inv always ends first as it sets the drops event
-            inv.join()
-            stream.join()
-
-            print(user_account.username, "-", "[*] Finished.")
+            log.write(_logger, "[*] Threading.", user_account.username)
+
+            with tracing.tracer.span("Person.run", user_account.username, "main"):
+                (stream, inv), notify_at_end = build_pages(
+                    user_account,
+                    self._headless,
+                    self._auto_claim,
+                    self._notifications,
+                    self._shared_browser,
+                    self._pool,
+                    self._inventory_backend,
+                    self._stream_backend,
+                    self._directories,
+                    self._campaigns,
+                )
+
+                stream.start()
+                inv.start()
+
+                # inv always ends first as it sets the drops event
+                inv.join()
+                stream.join()
+
+            log.write(_logger, "[*] Finished.", user_account.username)
             if notify_at_end:
                 self._alerter.send("Your all finished", user=user_account)
 
+            if self._finished != None:
+                self._finished(user_account)
+
             self._queue.task_done()
 
 
-def run(threads: int = 0) -> None:
+def run(
+    threads: int = 0,
+    usernames: list = None,
+    finished: callable = None,
+    finalise: bool = True,
+    worker: int = None,
+    workers: int = None,
+) -> None:
     """Thread and queue people.
 
-    Pulls user accouts from storage and queues them up for Person.
+    Pulls user accouts from storage and queues them up for Person,
+    or schedules them all as asyncio tasks if ASYNC_RUNTIME.
 
     Args:
-        threads : Integer > 0 - No. of threads defaults to number of users
+        threads : Integer > 0 - No. of users processed at once defaults to number of users
+        usernames : list - Only process these users, defaults to all users
+        finished : callable - Called with each user account once it is finished
+        finalise : bool - Notify admins and shutdown at the end, off when another process does this
+        worker : int - Slot of this supervisor worker process, None when not run by the supervisor
+        workers : int - No. of supervisor worker processes the rate limit is split between
     """
-
-    SHUTDOWN_ON_FINISH = False  # Should the system shutdown at the end
-    HEADLESS = False  # Change this to hide/show the Twitch windows
-    AUTO_CLAIM = True  # Might be a bug - don't auto claim whilst playing smite
-    # Should admins/users be alerted at end of program or users alerted when drops are claimable/claimed
-    NOTIFICATIONS = {
-        "notify admins at end": False,
-        "notify user at end": False,
-        "notify user about claimable drops": False,
-    }
-
     # Setup queue
     people_queue = queue.Queue()
 
-    print("[*] Starting")
+    log.setup()
+    log.write(_logger, "[*] Starting")
+
+    # Twilio keys may need typing in, which has to happen here rather than mid run
+    if any(NOTIFICATIONS.values()):
+        from tell_me_done import dispatcher
+
+        dispatcher.connect()
+
+    wait_budget.budgets.load()
+    reputation.reputations.load()
+
+    if workers != None:
+        rate_limit.limiter.share(workers)
+
+    if worker != None:
+        port, file = metrics.worker_settings(METRICS_PORT, METRICS_FILE, worker)
+    else:
+        port, file = METRICS_PORT, METRICS_FILE
+
+    exporter = metrics.Exporter(metrics.registry, port, file, METRICS_INTERVAL)
+    exporter.start()
 
     user_accounts = accounts.get_accounts()
+    if usernames != None:
+        user_accounts = [
+            user_account
+            for user_account in user_accounts
+            if user_account.username in usernames
+        ]
     threads = len(user_accounts) if threads == 0 else threads
 
-    # Setup threads
-    for _ in range(threads):
-        t = Person(people_queue, HEADLESS, AUTO_CLAIM, NOTIFICATIONS)
-        # t.setDaemon(True)
-        t.daemon = True
-        t.start()
+    if WATCH_SESSIONS:
+        watcher = sessions.Session_Watcher(user_accounts)
+        watcher.start()
+    else:
+        watcher = None
+
+    # Launch browsers before they are needed
+    if DRIVER_POOL > 0:
+        pool = driver_pool.Driver_Pool(HEADLESS, DRIVER_POOL, DRIVER_REUSES)
+        pool.warm()
+    else:
+        pool = None
+
+    # One directory of channels per campaign for every stream
+    directories = {}
+    for campaign in CAMPAIGNS:
+        if DISCOVERY == "http":
+            fetch = discovery.http_fetcher(campaign=campaign)
+        elif DISCOVERY == "browser":
+            fetch = discovery.browser_fetcher(url=discovery.directory_url(campaign))
+        else:
+            break
+
+        directories[campaign["game"]] = discovery.Directory(fetch, DISCOVERY_TTL)
+
+    if ASYNC_RUNTIME:
+        if NOTIFICATIONS["notify user at end"]:
+            import tell_me_done
+
+            alerter = tell_me_done.Notifier()
+        else:
+            alerter = None
+
+        build = functools.partial(
+            build_pages,
+            headless=HEADLESS,
+            auto_claim=AUTO_CLAIM,
+            notifications=NOTIFICATIONS,
+            shared_browser=SHARED_BROWSER,
+            pool=pool,
+            inventory_backend=INVENTORY_BACKEND,
+            stream_backend=STREAM_BACKEND,
+            directories=directories,
+            drop_campaigns=CAMPAIGNS,
+        )
+        runtime = scheduler.Scheduler(
+            build,
+            alerter,
+            finished,
+            accounts=max(1, threads),
+            blocking=BLOCKING_THREADS
+            if BLOCKING_THREADS > 0
+            else max(1, min(64, 2 * threads)),
+        )
+        runtime.run(user_accounts)
+
+    else:
+        # Setup threads
+        for _ in range(threads):
+            t = Person(
+                people_queue,
+                HEADLESS,
+                AUTO_CLAIM,
+                NOTIFICATIONS,
+                SHARED_BROWSER,
+                pool,
+                INVENTORY_BACKEND,
+                STREAM_BACKEND,
+                directories,
+                CAMPAIGNS,
+                finished,
+            )
+            # t.setDaemon(True)
+            t.daemon = True
+            t.start()
+
+        # Add people to queue
+        for user_account in user_accounts:
+            people_queue.put(user_account)
+
+        # After queue processed notify admins and shutdown
+        people_queue.join()
+
+    log.write(_logger, "[*] Done")
 
-    # Add people to queue
-    for user_account in user_accounts:
-        people_queue.put(user_account)
+    if watcher != None:
+        watcher.close()
 
-    # After queue processed notify admins and shutdown
-    people_queue.join()
+    wait_budget.budgets.save()
+    reputation.reputations.save()
+    storage.writer().flush()  # Worker processes skip atexit
 
-    print("[*] Done")
+    if any(NOTIFICATIONS.values()):
+        from tell_me_done import dispatcher
 
+        dispatcher.flush(60)
+
+    log.write(_logger, "[*] Rate limit waits: %s" % rate_limit.limiter.report())
+
+    for game, directory in directories.items():
+        log.write(_logger, "[*] Directory %s: %s" % (game, directory.stats()))
+
+    if request_filter.ENABLED:
+        log.write(_logger, "[*] Requests: %s" % request_filter.filters.report())
+
+    if pool != None:
+        log.write(_logger, "[*] Driver pool: %s" % pool.report())
+        pool.close()
+
+    exporter.close()
+
+    trace = tracing.tracer.save()
+    if trace != None:
+        log.write(_logger, "[*] Trace: %s" % trace)
+
+    # Worker processes exit without atexit hooks, write everything queued first
+    log.flush()
+
+    if finalise:
+        finish()
+
+
+def finish() -> None:
+    """Notify admins and shutdown once every user has been processed."""
     if NOTIFICATIONS["notify admins at end"]:
-        from tell_me_done import sender
+        from tell_me_done import dispatcher, sender
+
+        dispatcher.connect()
 
         admin_alert = sender.Notifier()
         admin_alert.notify(message="All people processed", admin_only=True)
+        admin_alert.dispatch.flush(60)
 
     if SHUTDOWN_ON_FINISH:
         from utility import shutdown
@@ -136,6 +421,6 @@ def run(threads: int = 0) -> None:
 if __name__ == "__main__":
     # Check for args
     if len(sys.argv) > 1 and (threads := sys.argv[1]).isdigit():
-        run(threads)
+        run(int(threads))
     else:
         run()
@@ -0,0 +1,147 @@
+# Behaviour shared by the browser (twitch.py) and GraphQL (twitch_api.py) page backends
+import time
+from utility import log, metrics, reputation
+
+
+class Page:
+    """Runs a page as a setup then steps until finished.
+
+    Mixed into each backend's Twitch class, which provide _setup, _step, _finish, user and _logger.
+    """
+
+    def _run_steps(self) -> None:
+        """Setup then repeat steps until finished, sleeping between them."""
+        kind = metrics.page_kind(self)
+        metrics.PAGES_RUNNING.inc(page=kind)
+
+        try:
+            self._setup()
+
+            with metrics.PAGE_STEP_SECONDS.time(page=kind):
+                wait = self._step()
+            while wait != None:
+                time.sleep(wait)
+                with metrics.PAGE_STEP_SECONDS.time(page=kind):
+                    wait = self._step()
+
+            self._finish()
+        finally:
+            metrics.PAGES_RUNNING.dec(page=kind)
+
+    def _step(self) -> float:
+        """One pass of the page's work, split out so a scheduler can run pages without a thread each.
+
+        Returns:
+            Seconds until the next step or None when finished.
+        """
+        return None
+
+    def _log(self, message: str, **fields) -> None:
+        """Log a status line about this page's user account, see log.write."""
+        log.write(self._logger, message, self.user.username, **fields)
+
+
+class Channel_Watcher:
+    """Follows the campaign schedule and picks channels to watch, for both backends' streams.
+
+    Backends hold the channel being watched in their own form, the browser keeps the login
+    and the http backend the login and ids. They provide _fetch_candidates and may override
+    _from_directory and _channel_login to convert between the two.
+
+    Uses the stream's _schedule, _campaign, _directory, _channel, _joined, _candidates and _failed.
+    """
+
+    def _follow_schedule(self) -> bool:
+        """Switch to the campaign the schedule says to watch, leaving the current channel if it changed.
+
+        Returns:
+            Is there a campaign to watch.
+        """
+        if self._schedule == None:
+            return True
+
+        campaign = self._schedule.choose()
+        if campaign == None:
+            return False
+
+        if campaign != self._campaign:
+            self._log(
+                "[*] Switching to %s." % campaign["game"],
+                event="switching_campaign",
+                game=campaign["game"],
+            )
+            self._leave_channel()
+            self._use_campaign(campaign)
+            self._candidates = []
+            self._failed = []
+
+        return True
+
+    def _use_campaign(self, campaign: dir) -> None:
+        """Watch a campaign's channels from now on."""
+        self._campaign = campaign
+        self._directory = self._schedule.directory(campaign)
+
+    def _next_candidate(self):
+        """The best channel not yet failed this session, claimed from the shared directory or fetched.
+
+        Once every candidate has failed they are all tried again next time.
+
+        Returns:
+            The channel or None if there are none.
+
+        Raises:
+            ConnectionError - Fetching candidates failed, only raised by the http backend
+        """
+        if self._directory != None:
+            channel = self._directory.claim(self._failed)
+            if channel != None:
+                channel = self._from_directory(channel)
+        else:
+            if not self._candidates:
+                self._candidates = self._fetch_candidates()
+
+            channel = self._candidates.pop(0) if self._candidates else None
+
+        if channel == None:
+            self._failed = []
+
+        return channel
+
+    def _fetch_candidates(self) -> list:
+        """Channels in the campaign's directory not failed this session, most stable first."""
+        return []
+
+    def _from_directory(self, channel: dir):
+        """A channel claimed from the shared directory in the form the backend holds channels."""
+        return channel
+
+    def _channel_login(self, channel) -> str:
+        """Login of a channel in the form the backend holds channels."""
+        return channel["login"]
+
+    def _leave_channel(self, failed: bool = False) -> str:
+        """Stop watching the current channel, recording how it went and giving it back to the directory.
+
+        Args:
+            failed : bool - Did the channel go offline or stop dropping
+
+        Returns:
+            The login of the channel left, None if not watching one.
+        """
+        channel, self._channel = self._channel, None
+        if channel == None:
+            return None
+
+        left = self._channel_login(channel)
+        reputation.reputations.record(left, time.monotonic() - self._joined, failed)
+
+        if failed:
+            self._failed.append(left)
+
+        if self._directory != None:
+            self._directory.release(left)
+            if failed:
+                self._directory.offline(left)
+
+        return left
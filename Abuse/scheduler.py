@@ -0,0 +1,268 @@
+# Asyncio runtime driving every user account as a task
+import asyncio
+import concurrent.futures
+import math
+import traceback
+from utility import log, metrics, tracing
+
+_logger = log.get("scheduler")
+
+
+class Timer_Wheel:
+    """A single timer for every page's next step.
+
+    Hashed timing wheel - sleepers are put in the slot their deadline falls in,
+    deadlines further than one turn away wait a number of extra rounds.
+
+    Attributes:
+        tick : float - Seconds per slot, sleeps are rounded up to this
+        _slots : list - Each slot is a list of [rounds left, future]
+        _cursor : int - Slot the wheel is currently at
+        _task : Task - Turns the wheel
+    """
+
+    def __init__(self, tick: float = 1, slots: int = 600) -> None:
+        if tick <= 0 or slots < 1:
+            raise ValueError("[!!] tick and slots must be above 0")
+
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._cursor = 0
+        self._task = None
+
+    def start(self) -> None:
+        """Start turning, must be called from inside the event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._turn())
+
+    def stop(self) -> None:
+        """Stop turning and cancel all sleepers."""
+        if self._task != None:
+            self._task.cancel()
+            self._task = None
+
+        for slot in self._slots:
+            for _, future in slot:
+                future.cancel()
+            slot.clear()
+
+    def sleep(self, seconds: float) -> asyncio.Future:
+        """Get a future that is done after at least seconds.
+
+        Cancelling the future removes it from the wheel when its slot is next reached.
+        """
+        future = asyncio.get_running_loop().create_future()
+        ticks = max(1, math.ceil(seconds / self.tick))
+
+        slot = (self._cursor + ticks) % len(self._slots)
+        self._slots[slot].append([(ticks - 1) // len(self._slots), future])
+        return future
+
+    async def _turn(self) -> None:
+        """Move the wheel a slot every tick, waking sleepers that are due."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+
+        while True:
+            # Schedule against the start time so slow ticks do not drift
+            next_tick += self.tick
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            waiting = []
+
+            for entry in self._slots[self._cursor]:
+                if entry[1].done():
+                    continue
+                elif entry[0] == 0:
+                    entry[1].set_result(None)
+                else:
+                    entry[0] -= 1
+                    waiting.append(entry)
+
+            self._slots[self._cursor] = waiting
+
+
+class Scheduler:
+    """Runs every user account's stream and inventory as asyncio tasks instead of threads.
+
+    Blocking page work (selenium and http calls) runs in a bounded thread pool,
+    waits between steps are scheduled on a single Timer_Wheel.
+
+    Attributes:
+        _build : callable - Builds (pages, notify_at_end) for a user account
+        _alerter : Notifier - Sends the end of run message, None if not notifying
+        _finished : callable - Called with each user account once it is finished, may be None
+        _accounts : int - Most user accounts processed at once
+        _blocking : int - Threads for blocking page work
+        _timeout : float - Seconds a blocking call may take before it counts as stuck
+        _max_timeouts : int - Stuck calls allowed before a user account is abandoned
+        _executor : ThreadPoolExecutor - Runs blocking page work
+        _wheel : Timer_Wheel - Schedules every wait
+    """
+
+    def __init__(
+        self,
+        build: callable,
+        alerter=None,
+        finished: callable = None,
+        accounts: int = 1,
+        blocking: int = 8,
+        timeout: float = 900,
+        max_timeouts: int = 3,
+        tick: float = 1,
+    ) -> None:
+        if accounts < 1 or blocking < 1:
+            raise ValueError("[!!] accounts and blocking must be above 0")
+
+        self._build = build
+        self._alerter = alerter
+        self._finished = finished
+        self._accounts = accounts
+        self._blocking = blocking
+        self._timeout = timeout
+        self._max_timeouts = max_timeouts
+        self._executor = None
+        self._wheel = Timer_Wheel(tick)
+
+    def run(self, user_accounts: list) -> None:
+        """Process every user account, blocks until all are finished."""
+        asyncio.run(self.process(user_accounts))
+
+    async def process(self, user_accounts: list) -> None:
+        """Process every user account as a task."""
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._blocking, thread_name_prefix="blocking"
+        )
+        self._wheel.start()
+        limit = asyncio.Semaphore(self._accounts)
+
+        try:
+            await asyncio.gather(
+                *(self._account(user_account, limit) for user_account in user_accounts)
+            )
+        finally:
+            self._wheel.stop()
+            self._executor.shutdown(wait=False)
+
+    async def _account(self, user_account, limit: asyncio.Semaphore) -> None:
+        """Process a user account's pages together, if one fails the rest are cancelled."""
+        async with limit:
+            log.write(_logger, "[*] Scheduling.", user_account.username)
+
+            with tracing.tracer.span(
+                "Scheduler._account", user_account.username, "scheduler"
+            ):
+                pages, notify_at_end = self._build(user_account)
+                tasks = [asyncio.create_task(self._drive(page)) for page in pages]
+
+                done, pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_EXCEPTION
+                )
+
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+            for task in done:
+                if task.exception() != None:
+                    log.write(
+                        _logger,
+                        "[!!] Page failed: %r" % task.exception(),
+                        user_account.username,
+                        traceback="".join(traceback.format_exception(task.exception())),
+                    )
+
+            log.write(_logger, "[*] Finished.", user_account.username)
+            if notify_at_end and self._alerter != None:
+                await self._call(
+                    self._alerter.send, "Your all finished", user=user_account
+                )
+
+            if self._finished != None:
+                self._finished(user_account)
+
+    async def _drive(self, page) -> None:
+        """Setup then step a page until it is finished.
+
+        A page never has two blocking calls at once, a step that times out is waited on again
+        rather than stepping over it. Once a call is given up on the page is dropped without
+        finishing, its driver is still in use by the stuck call.
+        """
+        kind = metrics.page_kind(page)
+        metrics.PAGES_RUNNING.inc(page=kind)
+        loop = asyncio.get_running_loop()
+        running = None  # The page's blocking call in flight
+        abandoned = False
+
+        try:
+            running = self._submit(page._setup)
+            try:
+                await self._wait(running)
+            except asyncio.TimeoutError:
+                abandoned = True
+                log.write(_logger, "[!!] Setup stuck, page dropped.", page.user.username)
+                raise
+
+            timeouts = 0
+
+            while True:
+                running = self._submit(page._step)
+                start = loop.time()
+
+                while True:
+                    try:
+                        wait = await self._wait(running)
+                        break
+                    except asyncio.TimeoutError:
+                        timeouts += 1
+
+                        if timeouts >= self._max_timeouts:
+                            abandoned = True
+                            log.write(
+                                _logger, "[!!] Step stuck, page dropped.", page.user.username
+                            )
+                            raise
+
+                        log.write(_logger, "[!] Step timed out.", page.user.username)
+
+                metrics.PAGE_STEP_SECONDS.observe(loop.time() - start, page=kind)
+
+                if wait == None:
+                    break
+
+                await self._wheel.sleep(wait)
+        finally:
+            try:
+                # Cancelled mid call, the driver is in use until the call returns
+                if not abandoned and running != None and not running.done():
+                    await asyncio.wait({running}, timeout=self._timeout)
+
+                if running == None or running.done():
+                    await self._call(page._finish)
+                elif not abandoned:
+                    log.write(_logger, "[!!] Call stuck, page dropped.", page.user.username)
+            finally:
+                metrics.PAGES_RUNNING.dec(page=kind)
+
+    def _submit(self, function: callable, *args, **kwargs) -> asyncio.Future:
+        """Start blocking work in the pool."""
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: function(*args, **kwargs)
+        )
+
+    async def _wait(self, work: asyncio.Future):
+        """Wait for blocking work, giving up waiting after the timeout.
+
+        Raises:
+            TimeoutError - The work took longer than the timeout, it is left running and can be waited on again
+        """
+        # Shielded as cancelling would mark the work done whilst its thread carries on
+        return await asyncio.wait_for(asyncio.shield(work), self._timeout)
+
+    async def _call(self, function: callable, *args, **kwargs):
+        """Run blocking work in the pool, giving up waiting after the timeout.
+
+        Raises:
+            TimeoutError - The work took longer than the timeout, it is left running
+        """
+        return await self._wait(self._submit(function, *args, **kwargs))
@@ -0,0 +1,208 @@
+# Checks stored cookies still log in before a browser is launched and warns before they expire
+import threading
+import time
+import requests
+import account
+import twitch_api
+from utility import log
+
+_logger = log.get("sessions")
+
+VALIDATE_URL = "https://id.twitch.tv/oauth2/validate"
+MARGIN = 24 * 3600  # Seconds before cookies expire that the account is warned about
+INTERVAL = 3600  # Most seconds between checks for cookies about to expire
+
+
+def validate(user: account.Account, url: str = VALIDATE_URL, timeout: float = 10) -> dir:
+    """Check a user account's auth token with one request, no browser is needed.
+
+    Args:
+        user : Account - A user account object
+        url : str - Validation endpoint, may be pointed at a stub server
+        timeout : float - Seconds to wait for a response
+
+    Returns:
+        The token's details, expires_in is the seconds left or 0 if Twitch does not say.
+
+    Raises:
+        PermissionError - The account has no auth token or Twitch no longer accepts it
+        ConnectionError - The request failed
+    """
+    headers = {"Authorization": "OAuth " + twitch_api.Client(user).token()}
+
+    try:
+        response = twitch_api.http_session().get(url, headers=headers, timeout=timeout)
+    except requests.RequestException as error:
+        raise ConnectionError("[!!] Validation failed: %s" % error)
+
+    if response.status_code == 401:
+        raise PermissionError("[!!] %s's auth token is no longer valid" % user.username)
+
+    try:
+        response.raise_for_status()
+        return response.json()
+    except (requests.RequestException, ValueError) as error:
+        raise ConnectionError("[!!] Validation failed: %s" % error)
+
+
+def cookie_expiry(cookies: list) -> float:
+    """When the auth token cookie expires, None if it does not say."""
+    for cookie in cookies or []:
+        if cookie.get("name") == "auth-token" and cookie.get("expiry"):
+            return float(cookie["expiry"])
+
+    return None
+
+
+class Session_Validator:
+    """Remembers which auth tokens still log in, so each is only checked once in a while.
+
+    A check that fails to reach Twitch counts as valid, an outage should not force manual logins.
+
+    Attributes:
+        url : str - Validation endpoint
+        cache : float - Seconds a result is trusted
+        _results : dir - Auth token to (monotonic time checked, valid)
+        _lock : Lock - Use when changing results
+    """
+
+    def __init__(self, url: str = VALIDATE_URL, cache: float = 300) -> None:
+        self.url = url
+        self.cache = cache
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def valid(self, user: account.Account) -> bool:
+        """Do the account's stored cookies still log in, recording when they expire.
+
+        Returns:
+            False if there are no cookies or Twitch rejects them.
+        """
+        try:
+            token = twitch_api.Client(user).token()
+        except PermissionError:
+            return False
+
+        with self._lock:
+            checked = self._results.get(token)
+        if checked != None and time.monotonic() - checked[0] < self.cache:
+            return checked[1]
+
+        try:
+            details = validate(user, self.url)
+        except PermissionError:
+            valid = False
+        except ConnectionError as error:
+            log.write(_logger, "[!] Cookies not checked: %s" % error, user.username)
+            return True
+        else:
+            valid = True
+
+            if details.get("expires_in"):
+                expires = time.time() + details["expires_in"]
+            else:
+                expires = cookie_expiry(user.cookies)
+
+            if expires != user.expires:
+                user.record_expiry(expires)
+
+        with self._lock:
+            self._results[token] = (time.monotonic(), valid)
+
+        return valid
+
+    @staticmethod
+    def expiring(user: account.Account, margin: float = MARGIN, now: float = None) -> bool:
+        """Do the account's cookies expire within the margin, False if not known."""
+        now = time.time() if now == None else now
+        return user.expires != None and user.expires - now <= margin
+
+
+validator = Session_Validator()  # Shared by every page
+
+
+class Session_Watcher:
+    """Warns in the background when accounts' cookies are about to expire or have stopped working.
+
+    Passwords are cleared once an account has logged in, so new cookies can only come from
+    adding the account again, the warning gives time to do that before a run needs them.
+
+    Attributes:
+        users : list - User accounts watched
+        margin : float - Seconds before cookies expire that the account is warned about
+        interval : float - Most seconds between checks
+        _warned : dir - Username to the auth token last warned about, warned again once it changes
+        _stop : Event - Set to stop watching
+        _thread : Thread - Runs the checks, None until started
+    """
+
+    def __init__(
+        self, users: list, margin: float = MARGIN, interval: float = INTERVAL
+    ) -> None:
+        self.users = list(users)
+        self.margin = margin
+        self.interval = interval
+        self._warned = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="session watch", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread != None:
+            self._thread.join()
+            self._thread = None
+
+    def check(self, now: float = None) -> list:
+        """Warn about every account with cookies expiring soon or no longer valid.
+
+        Accounts without cookies have never logged in, each set of cookies is only warned about once.
+
+        Returns:
+            Usernames warned about.
+        """
+        warned = []
+
+        for user in self.users:
+            if self._stop.is_set():
+                break
+
+            try:
+                token = twitch_api.Client(user).token()
+            except PermissionError:
+                continue
+
+            if self._warned.get(user.username) == token:
+                continue
+
+            if not validator.valid(user):
+                message = "[!] Cookies no longer valid, add the account again to login."
+            elif validator.expiring(user, self.margin, now):
+                message = "[!] Cookies expire soon, add the account again to login."
+            else:
+                continue
+
+            self._warned[user.username] = token
+            log.write(_logger, message, user.username, expires=user.expires)
+            warned.append(user.username)
+
+        return warned
+
+    def next_check(self, now: float = None) -> float:
+        """Seconds until the soonest account is due, at most the interval."""
+        now = time.time() if now == None else now
+        due = [
+            user.expires - self.margin - now
+            for user in self.users
+            if user.expires != None and user.username not in self._warned
+        ]
+
+        return max(60, min(due + [self.interval]))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.next_check())
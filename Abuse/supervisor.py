@@ -0,0 +1,199 @@
+# Supervisor to run user accounts across several processes
+import multiprocessing
+import os
+import queue
+import sys
+import main
+from utility import accounts, log
+
+_logger = log.get("supervisor")
+
+CORES_PER_PROCESS = 2  # Cores given to each worker process, chrome needs some too
+
+
+def _work(
+    usernames: list,
+    threads: int,
+    events: multiprocessing.Queue,
+    worker: int,
+    workers: int,
+) -> None:
+    """Worker process entry point, runs main for a shard of users."""
+    main.run(
+        threads,
+        usernames=usernames,
+        finished=lambda user_account: events.put(user_account.username),
+        finalise=False,
+        worker=worker,
+        workers=workers,
+    )
+
+
+def partition(usernames: list, shards: int) -> list:
+    """Split usernames round robin into at most shards non empty lists."""
+    shards = max(1, min(shards, len(usernames)))
+    return [usernames[shard::shards] for shard in range(shards)]
+
+
+class Supervisor:
+    """Runs shards of user accounts in separate worker processes.
+
+    Workers that die are restarted with their unfinished users,
+    so one crashed process or leaked driver only affects its own shard.
+    Admins are notified once when every user is finished.
+
+    Attributes:
+        processes : int - No. of worker processes to start with
+        threads : int - No. of users processed at once in each worker, 0 for all of its users
+        max_restarts : int - Workers a user can be in that die before the user is given up on
+        _target : callable - Worker process entry point
+        _events : Queue - Usernames of finished users sent by workers
+        _workers : dir - Worker process to the usernames it has not finished
+        _slots : dir - Worker process to its slot, the lowest free when it started, so ports and files are reused
+        _failures : dir - Username to how many of its workers died
+        _total : int - No. of users being processed
+        _done : int - No. of users finished
+    """
+
+    def __init__(
+        self,
+        processes: int = 0,
+        threads: int = 0,
+        max_restarts: int = 3,
+        target: callable = _work,
+    ) -> None:
+        if processes <= 0:
+            processes = max(1, (os.cpu_count() or 1) // CORES_PER_PROCESS)
+
+        self.processes = processes
+        self.threads = threads
+        self.max_restarts = max_restarts
+        self._target = target
+        self._events = multiprocessing.Queue()
+        self._workers = {}
+        self._slots = {}
+        self._failures = {}
+        self._total = 0
+        self._done = 0
+
+    def run(self, usernames: list = None, finalise: bool = True) -> list:
+        """Process users until all are finished or given up on.
+
+        Args:
+            usernames : list - Users to process, defaults to all users
+            finalise : bool - Notify admins and shutdown at the end
+
+        Returns:
+            The usernames that were given up on.
+        """
+        if usernames == None:
+            usernames = [user_account.username for user_account in accounts.get_accounts()]
+
+        self._total = len(usernames)
+        self._done = 0
+        given_up = []
+
+        # Workers have no stdin, any Twilio keys missing are asked for before they start
+        if any(main.NOTIFICATIONS.values()):
+            from tell_me_done import data_interface
+
+            data_interface.get_keys()
+
+        log.write(
+            _logger,
+            "[*] Supervising %d users in %d processes" % (self._total, self.processes),
+        )
+
+        for shard in partition(usernames, self.processes):
+            self._start(shard)
+
+        while self._workers:
+            self._receive(timeout=1)
+
+            # Replace dead workers
+            for worker in [worker for worker in self._workers if not worker.is_alive()]:
+                worker.join()
+                self._receive()  # Count users it finished before dying
+                remaining = self._workers.pop(worker)
+                self._slots.pop(worker)
+
+                if not remaining:
+                    continue
+
+                log.write(
+                    _logger,
+                    "[!] Worker %d exited (%s) with %d users left"
+                    % (worker.pid, worker.exitcode, len(remaining)),
+                )
+
+                retry = []
+                for username in sorted(remaining):
+                    self._failures[username] = self._failures.get(username, 0) + 1
+
+                    if self._failures[username] > self.max_restarts:
+                        log.write(_logger, "[!!] Giving up.", username)
+                        given_up.append(username)
+                    else:
+                        retry.append(username)
+
+                # Split repeat failures so a bad user does not keep taking others down with it
+                shards = 2 if any(self._failures[name] > 1 for name in retry) else 1
+                for shard in partition(retry, shards):
+                    self._start(shard)
+
+        log.write(_logger, "[*] Supervisor done")
+
+        if finalise:
+            main.finish()
+
+        return given_up
+
+    def _start(self, usernames: list) -> None:
+        """Start a worker process for some users."""
+        if not usernames:
+            return
+
+        used = set(self._slots.values())
+        slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+        worker = multiprocessing.Process(
+            target=self._target,
+            args=(usernames, self.threads, self._events, slot, self.processes),
+        )
+        worker.daemon = True
+        worker.start()
+        self._workers[worker] = set(usernames)
+        self._slots[worker] = slot
+
+    def _receive(self, timeout: float = None) -> None:
+        """Count users workers have finished.
+
+        Args:
+            timeout : float - Seconds to wait for the first finished user, None to not wait
+        """
+        while True:
+            try:
+                if timeout != None:
+                    username = self._events.get(timeout=timeout)
+                    timeout = None
+                else:
+                    username = self._events.get_nowait()
+            except queue.Empty:
+                return
+
+            for remaining in self._workers.values():
+                if username in remaining:
+                    remaining.remove(username)
+                    self._done += 1
+                    log.write(
+                        _logger, "[*] %d/%d users finished" % (self._done, self._total)
+                    )
+                    break
+
+
+if __name__ == "__main__":
+    # Check for args
+    if len(sys.argv) > 1 and (processes := sys.argv[1]).isdigit():
+        Supervisor(int(processes)).run()
+    else:
+        Supervisor().run()
@@ -0,0 +1,346 @@
+# Sends messages in the background so callers never wait on the network
+import heapq
+import itertools
+import threading
+import time
+from tell_me_done import data_interface
+from utility import log
+
+_logger = log.get("tell_me_done.dispatcher")
+
+
+class Rate_Limited(Exception):
+    """The transport was told to slow down.
+
+    Attributes:
+        retry_after : float - Seconds to wait before sending again
+    """
+
+    def __init__(self, retry_after: float = 60) -> None:
+        super().__init__("[!] Rate limited for %ss" % retry_after)
+        self.retry_after = retry_after
+
+
+class Twilio_Transport:
+    """Sends SMS through one Twilio client.
+
+    Attributes:
+        number : str - Twilio phone number messages are sent from
+        client : Client - Twilio client
+    """
+
+    def __init__(self) -> None:
+        from twilio.rest import Client  # Only needed when actually texting
+
+        keys = data_interface.get_keys()
+        self.number = keys["TWILIO_PHONE_NUMBER"]
+        self.client = Client(keys["TWILIO_ACCOUNT_SID"], keys["TWILIO_AUTH_TOKEN"])
+
+    def send(self, to: str, body: str) -> None:
+        """Send a message.
+
+        Raises:
+            Rate_Limited - Twilio returned too many requests
+        """
+        try:
+            self.client.messages.create(body=body, from_=self.number, to=to)
+        except Exception as error:
+            if getattr(error, "status", None) == 429:
+                raise Rate_Limited() from error
+            raise
+
+
+class Stub_Transport:
+    """Records messages instead of sending them, for testing.
+
+    Attributes:
+        sent : list - (to, body) of every message sent
+        failures : int - No. of sends left that fail with ConnectionError
+        rate_limits : int - No. of sends left that are rate limited
+    """
+
+    def __init__(self, failures: int = 0, rate_limits: int = 0) -> None:
+        self.sent = []
+        self.failures = failures
+        self.rate_limits = rate_limits
+        self._lock = threading.Lock()
+
+    def send(self, to: str, body: str) -> None:
+        with self._lock:
+            if self.rate_limits > 0:
+                self.rate_limits -= 1
+                raise Rate_Limited(0.01)
+
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("[!] Stub send failed")
+
+            self.sent.append((to, body))
+
+
+class _Digest:
+    """Messages for one user sent together.
+
+    Attributes:
+        user : Account - Who the messages are for
+        messages : list - Messages in the order they were submitted
+        attempts : int - Failed sends so far
+    """
+
+    def __init__(self, user) -> None:
+        self.user = user
+        self.messages = []
+        self.attempts = 0
+
+    def body(self) -> str:
+        """The text to send, repeated messages are counted rather than repeated."""
+        counts = {}
+        for message in self.messages:
+            counts[message] = counts.get(message, 0) + 1
+
+        parts = [
+            message if count == 1 else "%s (x%d)" % (message, count)
+            for message, count in counts.items()
+        ]
+        return self.user.username + " " + "; ".join(parts)
+
+
+class Dispatcher:
+    """Background message sender shared by every page.
+
+    Messages for the same user within the window are coalesced into one digest,
+    a bounded pool of workers sends due digests, retrying failures with exponential backoff
+    and pausing every worker when the transport is rate limited.
+
+    Attributes:
+        window : float - Seconds a digest waits for more messages to the same user
+        retries : int - Failed sends allowed before a digest is dropped
+        backoff : float - Seconds before the first retry, doubled for each retry after
+        interval : float - Fewest seconds between sends, the transport's rate limit
+        size : int - Most digests waiting, submits past this are dropped
+        _transport : Twilio_Transport/Stub_Transport - Sends messages, built by connect or on first send if None
+        _heap : list - (due, order, digest) waiting to be sent
+        _open : dir - Username to their digest still taking messages
+        _order : count - Breaks ties between digests due at the same time
+        _condition : Condition - Use when changing the heap, notified when it changes
+        _paused_until : float - No sends before this monotonic time
+        _next_send : float - Earliest monotonic time of the next send
+        _sending : int - No. of digests being sent by workers
+        _workers : list - Worker threads
+        _closed : bool - Are workers stopping
+        _transport_lock : Lock - Use when building the transport
+    """
+
+    def __init__(
+        self,
+        transport=None,
+        workers: int = 2,
+        size: int = 1000,
+        window: float = 30,
+        retries: int = 3,
+        backoff: float = 2,
+        interval: float = 1,
+    ) -> None:
+        if workers < 1 or size < 1:
+            raise ValueError("[!!] workers and size must be above 0")
+
+        self.window = window
+        self.retries = retries
+        self.backoff = backoff
+        self.interval = interval
+        self.size = size
+        self._transport = transport
+        self._heap = []
+        self._open = {}
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._paused_until = 0
+        self._next_send = 0
+        self._sending = 0
+        self._closed = False
+        self._transport_lock = threading.Lock()
+        self._workers = []
+
+        for number in range(workers):
+            worker = threading.Thread(
+                target=self._work, name="notifier-%d" % number, daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def connect(self) -> None:
+        """Build the Twilio transport now if none was given.
+
+        Reading the Twilio keys may prompt on stdin, so call this from the main thread
+        before a run rather than leave it to a worker thread mid run.
+        """
+        with self._transport_lock:
+            if self._transport == None:
+                self._transport = Twilio_Transport()
+
+    def submit(self, message: str, user, window: float = None) -> bool:
+        """Queue a message for a user, never blocks on the network.
+
+        Args:
+            message : str - Message to send
+            user : Account - Who to send it to, must have a phone number
+            window : float - Seconds to wait for more messages, defaults to the dispatcher's window
+
+        Returns:
+            Was the message queued.
+        """
+        if not user.phone:
+            log.write(_logger, "[!] User has no phone number")
+            return False
+
+        window = self.window if window == None else window
+
+        with self._condition:
+            if self._closed:
+                return False
+
+            digest = self._open.get(user.username)
+
+            if digest != None:
+                digest.messages.append(message)
+                return True
+
+            if len(self._heap) >= self.size:
+                log.write(
+                    _logger, "[!] Notification queue full - dropped message.", user.username
+                )
+                return False
+
+            digest = _Digest(user)
+            digest.messages.append(message)
+            self._open[user.username] = digest
+            self._push(time.monotonic() + window, digest)
+
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Send everything queued now, ignoring the coalescing window.
+
+        Returns:
+            Was everything sent (or given up on) before the timeout.
+        """
+        deadline = None if timeout == None else time.monotonic() + timeout
+
+        with self._condition:
+            self._heap = [(0, order, digest) for _, order, digest in self._heap]
+            heapq.heapify(self._heap)
+            self._condition.notify_all()
+
+            while self._heap or self._sending:
+                remaining = None if deadline == None else deadline - time.monotonic()
+                if remaining != None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+        return True
+
+    def close(self, timeout: float = None) -> None:
+        """Flush then stop the workers."""
+        self.flush(timeout)
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _push(self, due: float, digest: _Digest) -> None:
+        heapq.heappush(self._heap, (due, next(self._order), digest))
+        self._condition.notify()
+
+    def _next(self) -> _Digest:
+        """Wait for a digest that is due and allowed to be sent, None when closed."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+
+                now = time.monotonic()
+                if self._heap:
+                    due = max(self._heap[0][0], self._paused_until, self._next_send)
+
+                    if due <= now:
+                        digest = heapq.heappop(self._heap)[2]
+                        if self._open.get(digest.user.username) is digest:
+                            del self._open[digest.user.username]
+
+                        self._next_send = now + self.interval
+                        self._sending += 1
+                        return digest
+
+                    self._condition.wait(due - now)
+                else:
+                    self._condition.wait()
+
+    def _work(self) -> None:
+        """Send digests until closed."""
+        while (digest := self._next()) != None:
+            try:
+                self._transport_send(digest)
+            except Rate_Limited as error:
+                log.write(
+                    _logger,
+                    "[!] Notifications rate limited for %ss" % error.retry_after,
+                )
+
+                with self._condition:
+                    self._paused_until = time.monotonic() + error.retry_after
+                    self._push(0, digest)  # Not the digest's fault, no attempt used
+            except Exception as error:
+                digest.attempts += 1
+
+                with self._condition:
+                    if digest.attempts > self.retries:
+                        log.write(
+                            _logger,
+                            "[!!] Failed to notify %s: %s" % (digest.user.username, error),
+                        )
+                    else:
+                        delay = self.backoff * 2 ** (digest.attempts - 1)
+                        self._push(time.monotonic() + delay, digest)
+            else:
+                log.write(_logger, "<< Message sent to %s" % digest.user.username)
+            finally:
+                with self._condition:
+                    self._sending -= 1
+                    self._condition.notify_all()
+
+    def _transport_send(self, digest: _Digest) -> None:
+        if self._transport == None:
+            self.connect()
+
+        self._transport.send(digest.user.phone, digest.body())
+
+
+_dispatcher = None
+_lock = threading.Lock()
+
+
+def shared() -> Dispatcher:
+    """The dispatcher shared by the whole process, started on first use."""
+    global _dispatcher
+
+    with _lock:
+        if _dispatcher == None:
+            _dispatcher = Dispatcher()
+
+    return _dispatcher
+
+
+def connect() -> Dispatcher:
+    """The shared dispatcher with its transport built, see Dispatcher.connect."""
+    dispatch = shared()
+    dispatch.connect()
+    return dispatch
+
+
+def flush(timeout: float = None) -> None:
+    """Send everything queued on the shared dispatcher, if it was ever used."""
+    if _dispatcher != None:
+        _dispatcher.flush(timeout)
@@ -1,24 +1,24 @@
 # Defines notifier class and deals with all sending messages
-from twilio.rest import Client
-from tell_me_done import data_interface
-from utility import accounts
+from tell_me_done import dispatcher
+from utility import accounts, log
+
+_logger = log.get("tell_me_done.sender")
 
 
 class Notifier:
     """
     Class that deals with sending messages and initialising recivier
+    Messages are queued on the shared dispatcher, so sending never waits on Twilio
         receive - Will the user be receiving messages : Boolean
         done_message - Message to send when done : String
         var_message - Message to send when new vars required : String
+        dispatch - Sends the messages, defaults to the shared dispatcher : Dispatcher
     """
 
-    def __init__(self, receive=False, done_message="Simulation finished!", var_message="Program requires some variables!"):
-        data_json = data_interface.get_keys()
-        self.twilio_number = data_json['TWILIO_PHONE_NUMBER']
+    def __init__(self, receive=False, done_message="Simulation finished!", var_message="Program requires some variables!", dispatch=None):
         self.done_message = done_message
         self.var_message = var_message
-        self.client = Client(
-            data_json['TWILIO_ACCOUNT_SID'], data_json['TWILIO_AUTH_TOKEN'])
+        self.dispatch = dispatch if dispatch is not None else dispatcher.shared()
 
     def notify(self, message=None, admin_only=False, done=False, need_vars=False):
         """
@@ -36,18 +36,20 @@ class Notifier:
         elif need_vars:
             message = self.var_message
         else:
-            print("[!] A message is required")
+            log.write(_logger, "[!] A message is required")
             return False
 
-        users = accounts.get_accounts()
+        if admin_only:
+            users = accounts.registry().admins()
+        else:
+            users = accounts.registry().accounts()
 
         if not users:
-            print("[!] No users matched")
+            log.write(_logger, "[!] No users matched")
             return False
 
         for user in users:
-            if not admin_only or (admin_only and user.admin):
-                self.send(message, user=user)
+            self.send(message, user=user)
 
         return True
 
@@ -60,32 +62,19 @@ class Notifier:
             message, phone_number, user -> Boolean
         """
         if user == None and phone_number == None:
-            print("[!] Must specify one")
+            log.write(_logger, "[!] Must specify one")
             return False
 
         if user is None:
-            users = accounts.get_accounts()
+            user = accounts.registry().by_phone(phone_number)
 
-            for user_account in users:
-                if user_account.phone_number == phone_number:
-                    user = user_account
-                    break
-            else:
-                print("[!] No matching user found")
+            if user is None:
+                log.write(_logger, "[!] No matching user found")
                 return False
 
         if not user.phone:
-            print("[!] User has no phone number")
+            log.write(_logger, "[!] User has no phone number")
             return False
 
-        print("<< Message sent to %s" %
-              (user.username if user.username is not None else user.phone))
-        if user.username is not None:
-            message = user.username + " " + message
-
-        self.client.messages.create(body=message,
-                                    from_=self.twilio_number,
-                                    to=user.phone
-                                    )
-
-        return True
+        log.write(_logger, "<< Message queued for %s" % user.username)
+        return self.dispatch.submit(message, user)
@@ -1,12 +1,11 @@
 # Objects to model Twitch screens
-from datetime import datetime
-from os import path
-import platform
+import contextlib
+import json
 import threading
 import time
+from urllib import parse
 from selenium import webdriver
 from selenium.webdriver.common import keys
-from selenium.webdriver.chrome import options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import (
@@ -15,10 +14,235 @@ from selenium.common.exceptions import (
     WebDriverException,
 )
 import account
-from utility import time_lock
+import campaigns
+import discovery
+import pages
+import sessions
+import twitch_api
+from utility import (
+    chrome,
+    driver_pool,
+    log,
+    metrics,
+    profiles,
+    progress,
+    rate_limit,
+    reputation,
+    request_filter,
+    snapshots,
+    tracing,
+    wait_budget,
+)
+
+BASE_URL = twitch_api.WWW_URL  # Site pages are loaded from, the benchmarks point it at a fake site
+PROBE_INTERVAL = 0.25  # Seconds between checks of the page whilst probing for elements
+
+# Every element looked for by name, so pages can also be classified offline from saved snapshots
+XPATHS = {
+    # Login
+    "username": "//input[@id='login-username']",
+    "password": "//input[@id='password-input']",
+    "login alert": "//div[contains(@class, 'server-message-alert')]//strong",
+    "verify": "//h4[contains(text(), 'Verify')]",
+    "auth": "//label[contains(text(), 'Token')]",
+    "robot": "//*[@id='FunCaptcha']",
+    # Stream
+    "live": "//div[@class='channel-info-content']//p[contains(text(), 'LIVE')]",
+    "drops": "//div[@class='channel-info-content']//a[@data-a-target='Drops Enabled']",
+    "error": "//p[contains(text(), 'Error')]",
+    "mature": "//button[@data-a-target='player-overlay-mature-accept']",
+    "chat collapse": "//div[@data-a-target='right-column-chat-bar']//button[@data-a-target='right-column__toggle-collapse-btn']",
+    "channel points": "//div[@class='claimable-bonus__icon tw-flex']",
+    "settings": "//button[@data-a-target='player-settings-button']",
+    "quality menu": "//button[@data-a-target='player-settings-menu-item-quality']",
+    "quality option": "//div[@data-a-target='player-settings-submenu-quality-option']//div[contains(text(), '%s')]",
+    # Inventory
+    "claim": "//div[@data-test-selector='DropsCampaignInProgressRewards-container']//button[@data-test-selector='DropsCampaignInProgressRewardPresentation-claim-button']",
+    "drops left": "//div[@data-test-selector='DropsCampaignInProgressRewards-container']//img[@class='inventory-drop-image inventory-opacity-2 tw-image']",
+    "claimed": "//h4[contains(text(), 'Claimed')]",
+    "in progress": "//p[contains(text(), 'In Progress')]",
+}
+_NAMES = {xpath: name for name, xpath in XPATHS.items()}  # Xpath to its name, for labelling snapshots
+
+# Evaluates named xpaths in the page until one matches or the deadline passes
+_PROBE_SCRIPT = """
+var xpaths = arguments[0];
+var deadline = Date.now() + arguments[1];
+var interval = arguments[2];
+var done = arguments[arguments.length - 1];
+
+function probe() {
+    var found = {};
+    var any = false;
+
+    for (var name in xpaths) {
+        var node = document.evaluate(
+            xpaths[name], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+        ).singleNodeValue;
+        found[name] = node !== null;
+        any = any || found[name];
+    }
+
+    if (any || Date.now() >= deadline) {
+        done(found);
+    } else {
+        setTimeout(probe, interval);
+    }
+}
+
+probe();
+"""
+
+# Reads the progress bar of each drop in the inventory as [name, percent]
+_PROGRESS_SCRIPT = """
+var bars = document.querySelectorAll(
+    "[data-test-selector='DropsCampaignInProgressRewards-container'] [role='progressbar']"
+);
+
+return Array.prototype.map.call(bars, function (bar, index) {
+    var reward = bar.closest("[data-test-selector='DropsCampaignInProgressRewardPresentation']");
+    var image = reward ? reward.querySelector("img") : null;
+    var name = (image && image.getAttribute("alt")) || bar.getAttribute("aria-label") || String(index);
+    var percent = parseFloat(bar.getAttribute("aria-valuenow"));
+    return [name, isNaN(percent) ? null : percent];
+});
+"""
+
+# Waits for the stream video to start and returns its height, null if it does not start in time
+_VIDEO_HEIGHT_SCRIPT = """
+var deadline = Date.now() + arguments[0];
+var done = arguments[arguments.length - 1];
+
+function check() {
+    var video = document.querySelector("video");
+
+    if (video && video.videoHeight > 0) {
+        done(video.videoHeight);
+    } else if (Date.now() >= deadline) {
+        done(null);
+    } else {
+        setTimeout(check, 250);
+    }
+}
+
+check();
+"""
+
+# Twitch's own local storage preferences, set before any page script runs so players start low quality and muted
+PLAYER_PREFERENCES = {
+    "video-quality": '{"default":"160p30"}',
+    "video-muted": '{"default":true}',
+    "volume": "0",
+    "chatPaneCollapsed": "true",
+}
+
+_PRESEED_SCRIPT = """
+(function (preferences, host) {
+    var domain = host.replace(/^www\\./, "");
+    if (location.hostname !== domain && !location.hostname.endsWith("." + domain)) {
+        return;
+    }
+
+    try {
+        for (var key in preferences) {
+            window.localStorage.setItem(key, preferences[key]);
+        }
+    } catch (error) {}
+})(%s, %s);
+"""
+
+WEBDRIVER_SECONDS = metrics.registry.histogram(
+    "twitch_webdriver_setup_seconds",
+    "Seconds to get a webdriver, from the pool or launched",
+    ["source"],
+)
+LOGIN_SECONDS = metrics.registry.histogram(
+    "twitch_login_seconds", "Seconds each login took", ["method", "result"]
+)
+ELEMENT_SECONDS = metrics.registry.histogram(
+    "twitch_element_wait_seconds",
+    "Seconds waited for an element, hit when found before the timeout",
+    ["page", "result"],
+)
+CLICKS = metrics.registry.counter(
+    "twitch_clicks_total", "Element clicks by outcome", ["result"]
+)
+
+
+class Session:
+    """Shares one browser between several Twitch pages of the same account.
+
+    Each page gets its own tab (window handle) in the browser so only one
+    chromedriver/Chrome process tree and one login is needed per account.
+    Pages must hold lock whilst using the driver as the browser can only focus one tab at a time.
+
+    Attributes:
+        user : Account - The user account the browser is logged in as
+        driver : WebDriver - The shared selenium chrome webdriver, None until a page starts it
+        lock : RLock - Held whilst a page is using the driver
+        generation : int - Incremented every time the browser is (re)started
+        _handles : list - Window handles currently owned by pages
+        _spare : str - Window handle opened with the browser and not yet owned by a page
+    """
+
+    def __init__(self, user: account.Account) -> None:
+        self.user = user
+        self.driver = None
+        self.lock = threading.RLock()
+        self.generation = 0
+        self._handles = []
+        self._spare = None
+
+    def replace(self, driver: webdriver.Chrome) -> None:
+        """Use a newly started browser, all tabs in the old browser are lost."""
+        self.driver = driver
+        self.generation += 1
+        self._handles = []
+        self._spare = driver.current_window_handle
+
+    def open_tab(self) -> str:
+        """Open a tab for a page.
+
+        Returns:
+            The window handle of the tab.
+        """
+        if self._spare != None:
+            handle = self._spare
+            self._spare = None
+        else:
+            known = set(self.driver.window_handles)
+            self.driver.execute_script("window.open('about:blank');")
+            handle = next(
+                handle for handle in self.driver.window_handles if handle not in known
+            )
+
+        self._handles.append(handle)
+        return handle
+
+    def close_tab(self, handle: str) -> bool:
+        """Close a page's tab.
+
+        The last tab is left open so the browser can be quit by the caller.
+
+        Returns:
+            Whether this was the last tab, meaning the browser is no longer used.
+        """
+        if handle in self._handles:
+            self._handles.remove(handle)
+
+        if self._handles:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except WebDriverException:
+                pass
+            return False
+
+        self.driver = None
+        return True
 
 
-class Twitch(threading.Thread):
+class Twitch(threading.Thread, pages.Page):
     """Models a Twitch page with various functions.
 
     Provides various ways to login to Twitch as well as interact with elemets via xpath.
@@ -27,19 +251,37 @@ class Twitch(threading.Thread):
         user : Account - A user account object
         _driver : WebDriver - The selenium chrome webdriver
         _headless : bool - Should selenium start headless if possible
-        _lock : Time_Lock - A lock to stop rapid interaction with Twitch
         _url : str - The url
+        _session : Session - Browser shared with other pages, None if this page has its own browser
+        _tab : str - Window handle of this page's tab in the shared browser
+        _generation : int - Generation of the shared browser the tab was opened in
+        _stepped : bool - Has a step been completed
+        _pool : Driver_Pool - Warm browsers to take from and give back, None to always launch a new browser
+        _profile : str - Request filter profile for this page's tab, None to not filter
+        _user_data : str - Chrome profile the browser was launched with, None if it has none
+        _logger : Logger - Status lines of this kind of page
     """
 
-    def __init__(self, user: account.Account, headless: bool = False) -> None:
+    def __init__(
+        self,
+        user: account.Account,
+        headless: bool = False,
+        session: Session = None,
+        pool: driver_pool.Driver_Pool = None,
+    ) -> None:
         threading.Thread.__init__(self)
         self.user = user
         self._driver = None
         self._headless = headless
-        self._lock = (
-            time_lock.Time_Lock()
-        )  # Make sure interaction has at least 2 second timeout
         self._url = None
+        self._session = session
+        self._tab = None
+        self._generation = 0
+        self._stepped = False
+        self._pool = pool
+        self._profile = None
+        self._user_data = None
+        self._logger = log.get(metrics.page_kind(self))
 
     def run(self) -> bool:
         # TODO : Maybe rename validate_account
@@ -50,27 +292,56 @@ class Twitch(threading.Thread):
         """
         self._setup_webdriver()
         valid = self._verify_account()
-        self._driver.quit()
+        self._release_driver()
         return valid
 
+    def _finish(self) -> None:
+        """Clean up once finished."""
+        if self._driver != None:
+            self._quit()
+
+    @tracing.traced()
     def _setup(self) -> None:
         """Setup Twitch page.
 
-        This involves loging in and seting up the selenium webdriver.
+        This involves loging in and seting up the selenium webdriver,
+        in a shared browser the first page does this and the rest just open a tab.
         """
-        print(self.user.username, "-", self._date_time(), "-", "[*] Twitch Starting.")
-
-        # If headless required, must ensure cookies exsist
-        if self.user.cookies == None and self._headless:
-            need_login = True
-        else:
-            need_login = False
+        self._log("[*] Twitch Starting.")
+
+        if self._session == None:
+            self._setup_browser()
+            self._filter_requests()
+            return
+
+        with self._session.lock:
+            self._tab = None
+
+            # Start the browser if this page is first or the browser it was using failed
+            if (
+                self._session.driver == None
+                or self._session.generation == self._generation
+            ):
+                self._driver = self._session.driver
+                self._setup_browser()
+                self._session.replace(self._driver)
+
+            self._driver = self._session.driver
+            self._generation = self._session.generation
+            self._tab = self._session.open_tab()
+            self._driver.switch_to.window(self._tab)
+            self._filter_requests()
+
+    def _setup_browser(self) -> None:
+        """Setup the selenium webdriver and login."""
+        # If headless required, must ensure cookies exsist and still work, checked without a browser
+        need_login = self._headless and not sessions.validator.valid(self.user)
 
         self._setup_webdriver(need_login)
 
         # Check successful login
         if not self._login():
-            print(self.user.username, "-", "[!!] Could not login.")
+            self._log("[!!] Could not login.")
             raise PermissionError
 
         if need_login:
@@ -80,6 +351,8 @@ class Twitch(threading.Thread):
         """Setup the selenium webdriver.
 
         Returning is pointless as an exceptio occurs if the driver is not setup.
+        With profiles enabled the account's own profile is used unless another browser has it,
+        which bypasses the pool as pooled browsers are shared between accounts.
 
         Args:
             cannot_headless : bool - Cannot be headless if manual login is required
@@ -90,44 +363,128 @@ class Twitch(threading.Thread):
         """
 
         if self._driver != None:
-            self._driver.quit()
+            self._release_driver()
+
+        # Need not headless for login
+        headless = self._headless and not cannot_headless
+        if self._headless and not headless:
+            self._log("[!] No cookie file - must login manually.")
 
-        # Find webdriver as the webdriver is stored differently on OS's
-        plat = platform.platform().lower()
+        user_data = None
+        if profiles.ENABLED:
+            user_data = profiles.profiles.acquire(self.user.username)
+            if user_data == None:
+                self._log("[!] Profile in use - injecting cookies.")
 
-        if plat.startswith("win"):
-            file_loc = path.join(
-                path.dirname(path.realpath(__file__)),
-                "resources",
-                "webdrivers",
-                "chromedriver.exe",
-            )
-        elif plat.startswith("lin"):
-            file_loc = "/usr/lib/chromium-browser/chromedriver"
+        try:
+            if user_data != None:
+                with WEBDRIVER_SECONDS.time(source="profile"):
+                    self._driver = chrome.launch(headless, user_data)
+            elif self._pool != None and self._pool.headless == headless:
+                with WEBDRIVER_SECONDS.time(source="pool"):
+                    self._driver = self._pool.acquire()
+            else:
+                with WEBDRIVER_SECONDS.time(source="launch"):
+                    self._driver = chrome.launch(headless)
+        except EnvironmentError:
+            self._log("[!!] Could not start webdriver.")
+            raise
+        finally:
+            if user_data != None and self._driver == None:
+                profiles.profiles.release(self.user.username)
+
+        self._user_data = user_data
+
+    def _release_driver(self) -> None:
+        """Quit the driver or return it to the pool for another user account."""
+        self._count_requests()
+
+        if self._user_data != None:
+            # Chrome must have exited before another browser can use the profile
+            try:
+                self._driver.quit()
+            finally:
+                profiles.profiles.release(self.user.username)
+                self._user_data = None
+        elif self._pool != None:
+            self._pool.release(self._driver)
         else:
-            print(self.user.username, "-", "[!!] Platform not supported.")
-            raise EnvironmentError
+            self._driver.quit()
 
-        if not path.isfile(file_loc):
-            print(self.user.username, "-", "[!!] Chromium webdriver does not exsist!")
-            raise FileNotFoundError
+        self._driver = None
 
-        # Setup webdriver
-        chrome_options = options.Options()
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--mute-audio")
+    def _filter_requests(self) -> None:
+        """Block requests this page's tab does not need, must be focused on the tab."""
+        if request_filter.ENABLED and self._profile != None:
+            request_filter.filters.apply(self._driver, self._profile)
 
-        # Need not headless for login
-        if not cannot_headless and self._headless:
-            chrome_options.add_argument("--headless")
-        elif self._headless:
-            print(self.user.username, "-", "[!] No cookie file - must login manually.")
+    def _count_requests(self) -> None:
+        """Count filtered requests so far, keeps the browser's performance log from growing."""
+        if request_filter.ENABLED and self._driver != None:
+            request_filter.filters.collect(self._driver)
 
-        self._driver = webdriver.Chrome(
-            executable_path=file_loc, chrome_options=chrome_options
-        )
+    def _wait_turn(self, priority: str = "navigation") -> None:
+        """Wait until the shared rate limit allows this page to interact with Twitch.
+
+        Call before _focus, waiting whilst focused would hold up the other tab of a shared browser.
+
+        Args:
+            priority : str - "login", "navigation" or "health", see rate_limit.PRIORITIES
+        """
+        rate_limit.limiter.acquire(self.user.username, priority=priority)
+
+    @contextlib.contextmanager
+    def _focus(self) -> contextlib.AbstractContextManager:
+        """Get exclusive use of the driver focused on this page's tab.
+
+        Only needed for a shared browser, if another page restarted the browser a new tab is opened
+        before taking the lock, as setting up waits its turn. The lock is released even if focusing
+        fails, so the other tab is not stuck waiting.
+
+        Returns:
+            A context manager to hold whilst using the driver.
+        """
+        if self._session == None:
+            yield
+            return
+
+        while True:
+            # Whilst setting up there is no tab to focus
+            if self._tab != None and self._generation != self._session.generation:
+                self._setup()
 
+            self._session.lock.acquire()
+            if self._tab == None or self._generation == self._session.generation:
+                break
+
+            # Restarted again whilst waiting for the lock
+            self._session.lock.release()
+
+        try:
+            if self._tab != None:
+                self._driver.switch_to.window(self._tab)
+
+            yield
+        finally:
+            self._session.lock.release()
+
+    def _quit(self) -> None:
+        """Quit the driver, in a shared browser only once the last tab is closed."""
+        wait_budget.budgets.save()
+
+        if self._session == None:
+            self._release_driver()
+            return
+
+        with self._session.lock:
+            # Tab was already lost if another page restarted the browser
+            if self._generation != self._session.generation:
+                return
+
+            if self._session.close_tab(self._tab):
+                self._release_driver()
+
+    @tracing.traced()
     def _login(self) -> bool:  # TODO : Handle no cookies and no password better
         """Login to Twitch.
 
@@ -186,45 +543,45 @@ class Twitch(threading.Thread):
 
         # Check for internet
         try:
-            self._lock.acquire()
-            self._driver.get("https://www.Twitch.tv/login")
-            self._lock.release()
+            self._wait_turn("login")
+            self._driver.get(BASE_URL + "/login")
         except WebDriverException:
             raise WebDriverException("[!!] Do you have internet?")
 
         # Enter username
-        username_element = self._find_element_xpath("//input[@id='login-username']")
-        self._lock.acquire()
+        username_element = self._find_element_xpath(XPATHS["username"])
+        self._wait_turn("login")
         username_element.send_keys(self.user.username)
-        self._lock.release()
 
         # Enter password
-        password_element = self._find_element_xpath("//input[@id='password-input']")
-        self._lock.acquire()
+        password_element = self._find_element_xpath(XPATHS["password"])
+        self._wait_turn("login")
         password_element.send_keys(self.user.password)
         password_element.send_keys(keys.Keys.RETURN)
-        self._lock.release()
 
         if check_robot and self._check_not_robot():
-            print(
-                "[!!] Robot checks are in force - could not verify \n  try changing your ip"
+            self._log(
+                "[!!] Robot checks are in force - could not verify, try changing your ip",
+                event="robot_checks",
             )
             raise LookupError
 
-        alert_window = self._find_element_xpath(
-            "//div[contains(@class, 'server-message-alert')]//strong"
-        )
+        alert_window = self._find_element_xpath(XPATHS["login alert"])
 
         return alert_window == None
 
+    @tracing.traced()
     def _login_by_Twitch(self) -> bool:
         """Login to Twitch through the Twitch login page.
 
         Returns:
             The success of the login.
         """
+        start = time.monotonic()
+
         if not self._verify_account(False):
-            print("[!!] Unable to login with username, password")
+            self._log("[!!] Unable to login with username, password")
+            LOGIN_SECONDS.observe(time.monotonic() - start, method="password", result="failed")
             return False
 
         # Checks for various traps - sometimes in different orders so verifies no checks still remain
@@ -234,31 +591,47 @@ class Twitch(threading.Thread):
             checks = False
             while self._check_auth():
                 checks = True
-                print(self.user.username, "-", "[!] Auth verification required.")
+                self._log("[!] Auth verification required.")
                 time.sleep(10)
 
             while self._check_not_robot():
                 checks = True
-                print(self.user.username, "-", "[!] Robot verification required.")
+                self._log("[!] Robot verification required.")
                 time.sleep(10)
 
             while self._check_need_verify():
                 checks = True
-                print(self.user.username, "-", "[!] New login verification required.")
+                self._log("[!] New login verification required.")
                 time.sleep(10)
 
         self.user.login(self._driver.get_cookies())
+        LOGIN_SECONDS.observe(time.monotonic() - start, method="password", result="ok")
         return True
 
-    def _login_by_cookies(self) -> bool:  # TODO : Check cookies are good
+    @tracing.traced()
+    def _login_by_cookies(self) -> bool:
         """Login to Twitch by using cookies stored in the account.
 
+        Cookies Twitch no longer accepts are caught before the browser loads anything,
+        they would otherwise look logged in until a page fails minutes later.
+
         Returns:
             The success of the login.
         """
-        self._lock.acquire()
-        self._driver.get("https://www.Twitch.tv")
-        self._lock.release()
+        start = time.monotonic()
+
+        if not sessions.validator.valid(self.user):
+            self._log("[!] Cookies no longer valid.")
+            LOGIN_SECONDS.observe(time.monotonic() - start, method="cookies", result="invalid")
+            return False
+
+        # A profile still logged in from the last run needs no page loads
+        if self._user_data != None and self._profile_logged_in():
+            LOGIN_SECONDS.observe(time.monotonic() - start, method="profile", result="ok")
+            return True
+
+        self._wait_turn("login")
+        self._driver.get(BASE_URL)
 
         cookies = self.user.cookies
 
@@ -267,40 +640,64 @@ class Twitch(threading.Thread):
                 self._driver.add_cookie(cookie)
         except:
             # TODO : Maybe clear user cookies
-            print("[!!] Cookie error.")
+            self._log("[!!] Cookie error.")
+            LOGIN_SECONDS.observe(time.monotonic() - start, method="cookies", result="failed")
             return False
 
-        self._lock.acquire()
+        self._wait_turn("login")
         self._driver.refresh()
-        self._lock.release()
+        LOGIN_SECONDS.observe(time.monotonic() - start, method="cookies", result="ok")
         return True
 
+    def _profile_logged_in(self) -> bool:
+        """Does the browser's profile already hold the account's auth token, read without loading a page."""
+        try:
+            cookies = self._driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+            token = twitch_api.Client(self.user).token()
+        except (AttributeError, KeyError, PermissionError, WebDriverException):
+            return False
+
+        return any(
+            cookie.get("name") == "auth-token" and cookie.get("value") == token
+            for cookie in cookies
+        )
+
     def _check_need_verify(self) -> bool:
         """Check need to verify new login."""
-        if self._find_element_xpath("//h4[contains(text(), 'Verify')]") != None:
+        if self._find_element_xpath(XPATHS["verify"]) != None:
             return True
 
         return False
 
     def _check_auth(self) -> bool:
         """Check need to enter user authentication."""
-        if self._find_element_xpath("//label[contains(text(), 'Token')]") != None:
+        if self._find_element_xpath(XPATHS["auth"]) != None:
             return True
 
         return False
 
     def _check_not_robot(self) -> bool:
         """Check need to verify not a robot :3"""
-        # Wait 10 seconds incase page isn't fully loaded
-        try:
-            WebDriverWait(self._driver, 10).until(
-                lambda d: d.find_element_by_id("FunCaptcha")
-            )  # not tested
-        except TimeoutException:
-            return False
-
-        return True
-
+        # Wait incase page isn't fully loaded
+        with self._focus():
+            try:
+                page = self._page()
+                start = time.time()
+                WebDriverWait(
+                    self._driver, wait_budget.budgets.timeout(page, XPATHS["robot"])
+                ).until(
+                    lambda d: d.find_element_by_xpath(XPATHS["robot"])
+                )  # not tested
+                wait_budget.budgets.record(page, XPATHS["robot"], time.time() - start)
+                robot = True
+            except TimeoutException:
+                robot = False
+
+            self._record({"robot": robot})
+
+        return robot
+
+    @tracing.traced()
     def _find_element_xpath(self, xpath: str) -> WebElement:
         """Find and return element by xpath.
 
@@ -310,27 +707,148 @@ class Twitch(threading.Thread):
         Returns:
             The interactable web element.
         """
-        # Wait 10 seconds incase page isn't fully loaded
-        try:
-            element = WebDriverWait(self._driver, 10).until(
-                lambda d: d.find_element_by_xpath(xpath)
-            )
-        except TimeoutException:
-            element = None
-        except WebDriverException:
-            element = None
-            print(
-                self.user.username,
-                "-",
-                self._date_time(),
-                "-",
-                "[!] Somethign funny happened with the webdriver.",
-            )
+        # Wait incase page isn't fully loaded, for as long as the element usually takes
+        with self._focus():
+            try:
+                page = self._page()
+                start = time.time()
+                element = WebDriverWait(
+                    self._driver, wait_budget.budgets.timeout(page, xpath)
+                ).until(lambda d: d.find_element_by_xpath(xpath))
+                wait_budget.budgets.record(page, xpath, time.time() - start)
+                ELEMENT_SECONDS.observe(time.time() - start, page=page, result="hit")
+            except TimeoutException:
+                element = None
+                ELEMENT_SECONDS.observe(time.time() - start, page=page, result="timeout")
+            except WebDriverException:
+                self._log("[!] Somethign funny happened with the webdriver.")
 
-            self._setup()
+                self._setup()
+                return None
+
+            if xpath in _NAMES:
+                self._record({_NAMES[xpath]: element != None})
 
         return element
 
+    def _probe_xpaths(self, xpaths: dir, timeout: float = None) -> dir:
+        """Check which of several elements exist in one round trip.
+
+        Waits inside the page until any element exists or timeout,
+        so absent elements share one wait instead of waiting for each.
+
+        Args:
+            xpaths : dir - Name to xpath of each element
+            timeout : float - Seconds to wait for any element, defaults to the longest learned wait
+
+        Returns:
+            Name to whether the element exists.
+        """
+        found = dict.fromkeys(xpaths, False)
+
+        with self._focus():
+            try:
+                page = self._page()
+
+                if timeout == None:
+                    timeout = max(
+                        wait_budget.budgets.timeout(page, xpath)
+                        for xpath in xpaths.values()
+                    )
+
+                start = time.time()
+                self._driver.set_script_timeout(timeout + 5)
+                found.update(
+                    self._driver.execute_async_script(
+                        _PROBE_SCRIPT,
+                        xpaths,
+                        int(timeout * 1000),
+                        int(PROBE_INTERVAL * 1000),
+                    )
+                )
+
+                for name, xpath in xpaths.items():
+                    if found[name]:
+                        wait_budget.budgets.record(page, xpath, time.time() - start)
+            except TimeoutException:
+                pass
+            except WebDriverException:
+                self._log("[!] Somethign funny happened with the webdriver.")
+
+                self._setup()
+                return found
+
+            self._record({name: found[name] for name in xpaths if name in XPATHS})
+
+        return found
+
+    def _classify(self, names: list) -> dir:
+        """Check which of several elements exist from one copy of the page, without waiting for any.
+
+        Only for pages that have had time to load, e.g. a stream watched since the last step.
+
+        Args:
+            names : list - Names of the elements in XPATHS
+
+        Returns:
+            Name to whether the element exists, None if the page could not be read or parsed.
+        """
+        if not snapshots.available():
+            return None
+
+        with self._focus():
+            try:
+                page = self._page()
+                source = self._driver.page_source
+            except WebDriverException:
+                return None
+
+            found = snapshots.evaluate(source, {name: XPATHS[name] for name in names})
+            self._record(found, page, source)
+
+        return found
+
+    def _record(self, found: dir, page: str = None, source: str = None) -> None:
+        """Save the page as a snapshot labelled with what was found, if recording.
+
+        Must be focused on the page's tab.
+
+        Args:
+            found : dir - Name in XPATHS to whether the element was found
+            page : str - Kind of page, read from the driver if not given
+            source : str - HTML of the page, read from the driver if not given
+        """
+        if not snapshots.RECORD or not found:
+            return
+
+        try:
+            page = page or self._page()
+            if not snapshots.recorder.wanted(page, found):
+                return
+
+            snapshots.recorder.record(
+                page,
+                found,
+                source or self._driver.page_source,
+                self._driver.current_url,
+            )
+        except (OSError, WebDriverException):
+            self._log("[!] Snapshot not saved.")
+
+    def _page(self) -> str:
+        """Get the kind of page loaded, elements are timed separately for each kind."""
+        url = parse.urlparse(self._driver.current_url)
+        section = url.path.strip("/").split("/")[0]
+
+        if not url.scheme.startswith("http"):
+            return "blank"
+        elif section in ("directory", "drops", "login"):
+            return section
+        elif section == "":
+            return "home"
+        else:
+            return "channel"
+
     def _click_element_xpath(self, xpath: str) -> bool:
         """Find and click element by xpath.
 
@@ -340,32 +858,27 @@ class Twitch(threading.Thread):
         Returns:
             Was the click successful.
         """
-        element = self._find_element_xpath(xpath)
+        self._wait_turn()
 
-        if element != None:
-            self._lock.acquire()
+        # Element belongs to this page's tab so hold focus until clicked
+        with self._focus():
+            element = self._find_element_xpath(xpath)
 
-            try:
-                element.click()
-            except ElementNotInteractableException:
-                self._lock.release()
-                return False
+            if element != None:
+                try:
+                    element.click()
+                except ElementNotInteractableException:
+                    CLICKS.inc(result="not interactable")
+                    return False
 
-            self._lock.release()
-            return True
+                CLICKS.inc(result="clicked")
+                return True
 
+        CLICKS.inc(result="missing")
         return False
 
-    @staticmethod
-    def _date_time(file_friendly: bool = False) -> str:
-        """Static method to get the datetime in a readable format."""
-        if not file_friendly:
-            return datetime.now().strftime("%H:%M:%S")
-        else:
-            return datetime.now().strftime("%H-%M-%S")
-
 
-class Stream(Twitch):
+class Stream(Twitch, pages.Channel_Watcher):
     """Models a Twitch stream page with various functions.
 
     Provides various ways to of interacting with the stream to increase performance and find streams.
@@ -375,6 +888,15 @@ class Stream(Twitch):
         _chat : bool Should chat be left on
         _drops : Event - Are drops still available, indefinite execution if empty
         _url : str - URL for directory of droppable streams
+        _preseeded : bool - Are player preferences set before every page load in this tab
+        _directory : Directory - Shared directory to get channels from, None to browse the directory
+        _channel : str - Login of the channel being watched, None if not watching one
+        _joined : float - When the current channel was joined
+        _attempts : int - Candidates tried each time a new stream is needed
+        _candidates : list - Logins scraped from the directory page still to try, unused with a shared directory
+        _failed : list - Logins that went offline or stopped dropping this session
+        _schedule : Campaign_Scheduler - Picks the campaign to watch, None to always watch the default campaign
+        _campaign : dir - Game and directory tags of the campaign being watched
     """
 
     def __init__(
@@ -383,11 +905,25 @@ class Stream(Twitch):
         drops_available: threading.Event = None,
         headless: bool = True,
         chat_on: bool = False,
+        session: Session = None,
+        pool: driver_pool.Driver_Pool = None,
+        directory=None,
+        schedule=None,
     ) -> None:
-        Twitch.__init__(self, user, headless)
+        Twitch.__init__(self, user, headless, session, pool)
         self._chat = chat_on
         self._drops = drops_available
-        self._url = "https://www.Twitch.tv/directory/game/SMITE/tags/c2542d6d-cd10-4532-919b-3d19f30a768b"
+        self._schedule = schedule
+        self._campaign = campaigns.DEFAULT
+        self._url = discovery.directory_url(self._campaign, BASE_URL)
+        self._profile = "stream with chat" if chat_on else "stream"
+        self._preseeded = False
+        self._directory = directory
+        self._channel = None
+        self._joined = None
+        self._attempts = 3
+        self._candidates = []
+        self._failed = []
 
     def run(self) -> None:
         """Automate finding and watching droppable streams.
@@ -395,108 +931,209 @@ class Stream(Twitch):
         Twitch setup,
         then while drops are available dearch the _url for droppabale streams and Optimise streams.
         """
-        self._setup()
+        self._run_steps()
 
-        while not self._drops.is_set() if self._drops != None else True:
-            # If no stream find and optimise stream
-            if not self._check_stream_alive():
-                if self._find_stream():
-                    self._optimise_stream()
-            else:
-                print(
-                    self.user.username,
-                    "-",
-                    self._date_time(),
-                    "-",
-                    "[*] Stream Running.",
-                )
-                if self._chat:
-                    self._claim_channel_points()
-
-            time.sleep(600)
-
-            if self._check_error():
-                print(
-                    self.user.username,
-                    "-",
-                    self._date_time(),
-                    "-",
-                    "[!] Network error.",
-                )
-                self._setup()
+    def _step(self) -> float:
+        """See base class."""
+        self._count_requests()
+
+        # Check the stream survived the wait, one copy of the loaded page saves waiting for absent elements
+        state = self._classify(["error", "live", "drops"]) if self._stepped else None
+
+        if self._stepped and (self._check_error() if state == None else state["error"]):
+            self._log("[!] Network error.")
+            self._setup()
+            state = None
+
+        if self._drops != None and self._drops.is_set():
+            return None
 
-        print(self.user.username, "-", self._date_time(), "-", "[*] Quitting stream.")
-        self._driver.quit()
+        # Nothing to watch until the inventory shows more drops
+        if not self._follow_schedule():
+            self._stepped = True
+            return 600
+
+        # Only a badge found is trusted, not finding one is checked by waiting for them
+        alive = (
+            state != None and self._channel != None and (state["live"] or state["drops"])
+        )
+
+        # If no stream find and optimise stream
+        if not alive and not self._check_stream_alive():
+            if self._find_stream():
+                self._optimise_stream()
+        else:
+            self._log("[*] Stream Running.")
+            if self._chat:
+                self._claim_channel_points()
+
+        self._stepped = True
+        return 600
+
+    def _finish(self) -> None:
+        """See base class."""
+        self._log("[*] Quitting stream.")
+        self._leave_channel()
+        Twitch._finish(self)
 
     def _setup(self) -> None:
         """See base class."""
         Twitch._setup(self)
-        print(self.user.username, "-", self._date_time(), "-", "[*] Stream Starting.")
+        self._log("[*] Stream Starting.")
+
+        with self._focus():
+            self._preseed_player()
+
+    def _preseed_player(self) -> None:
+        """Set player preferences in local storage before every page load, so streams start optimised."""
+        preferences = dict(PLAYER_PREFERENCES)
+        if self._chat:
+            del preferences["chatPaneCollapsed"]
+
+        host = parse.urlparse(BASE_URL).hostname
+
+        try:
+            self._driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument",
+                {"source": _PRESEED_SCRIPT % (json.dumps(preferences), json.dumps(host))},
+            )
+        except (AttributeError, WebDriverException):
+            self._log("[!] Could not preseed player.")
+            self._preseeded = False
+        else:
+            self._preseeded = True
+
+    def _check_low_quality(self, timeout: float = 10) -> bool:
+        """Check the stream video started at 360p or lower.
 
+        Args:
+            timeout : float - Seconds to wait for the video to start
+        """
+        with self._focus():
+            try:
+                self._driver.set_script_timeout(timeout + 5)
+                height = self._driver.execute_async_script(
+                    _VIDEO_HEIGHT_SCRIPT, int(timeout * 1000)
+                )
+            except WebDriverException:
+                return False
+
+        return height != None and height <= 360
+
+    @tracing.traced()
     def _optimise_stream(self) -> None:
         """Optimise current stream to lower resources.
 
-        Does this by configuring stream quality and chat settings.
+        Does this by configuring stream quality and chat settings,
+        these are usually already set by the preseeded preferences so the menus are only used if they did not work.
         """
-        self._click_element_xpath(
-            "//button[@data-a-target='player-overlay-mature-accept']"
-        )  # Accept mature stream
-        self._lower_quality()
+        self._click_element_xpath(XPATHS["mature"])  # Accept mature stream
+
+        if not (self._preseeded and self._check_low_quality()):
+            self._log("[*] Lowering quality through the menu.")
+            self._lower_quality()
 
         if not self._chat:
-            # Turn chat off
-            self._click_element_xpath(
-                "//div[@data-a-target='right-column-chat-bar']//button[@data-a-target='right-column__toggle-collapse-btn']"
-            )
+            # Turn chat off, the button is gone if chat is already collapsed
+            self._click_element_xpath(XPATHS["chat collapse"])
 
+    @tracing.traced()
     def _find_stream(self) -> bool:
-        """Find and goto a new stream.
+        """Find and goto a new stream, going straight on to the next candidate if one is not live and dropping.
 
         Returns:
             Whether a new stream has been entered.
         """
-        self._lock.acquire()
-        self._driver.get(self._url)
-        self._lock.release()
+        start = time.monotonic()
+        self._leave_channel()
+
+        for _ in range(self._attempts):
+            login = self._next_candidate()
+            if login == None:
+                break
+
+            self._join_channel(login)
+            if self._check_stream_alive():
+                seconds = time.monotonic() - start
+                self._log(
+                    "[*] New stream found: %s/%s" % (BASE_URL, login),
+                    duration=seconds,
+                    channel=login,
+                )
+                metrics.FIND_STREAM_SECONDS.observe(
+                    seconds, backend="browser", result="found"
+                )
+                return True
 
-        # Click on first valid stream
-        if not self._click_element_xpath(
-            "//div[@data-target='directory-first-item']//a[@data-a-target='preview-card-title-link']"
-        ):
-            print(
-                self.user.username,
-                "-",
-                self._date_time(),
-                "-",
-                "[!] New stream not found.",
-            )
-            return False
+        seconds = time.monotonic() - start
+        self._log("[!] New stream not found.", duration=seconds)
+        metrics.FIND_STREAM_SECONDS.observe(
+            seconds, backend="browser", result="not found"
+        )
+        return False
 
-        print(self.user.username, "-", self._date_time(), "-", "[*] New stream found.")
-        print("    - %s" % self._driver.current_url)
-        return True
+    def _use_campaign(self, campaign: dir) -> None:
+        """See base class, also browses the campaign's directory page."""
+        pages.Channel_Watcher._use_campaign(self, campaign)
+        self._url = discovery.directory_url(campaign, BASE_URL)
+
+    def _fetch_candidates(self) -> list:
+        """See base class, logins scraped from the directory page."""
+        self._wait_turn()
+        with self._focus():
+            self._driver.get(self._url)
+
+            try:
+                links = WebDriverWait(self._driver, 10).until(
+                    lambda driver: driver.execute_script(discovery._CARDS_SCRIPT)
+                )
+            except (TimeoutException, WebDriverException):
+                return []
+
+        candidates = [
+            login for login in discovery.logins(links) if login not in self._failed
+        ]
+        # Sorting is stable so equally stable channels keep the directory's order
+        return sorted(
+            candidates, key=lambda login: -reputation.reputations.stability(login)
+        )
+
+    def _from_directory(self, channel: dir) -> str:
+        """See base class, the browser only needs the login."""
+        return channel["login"]
 
+    def _channel_login(self, channel: str) -> str:
+        """See base class."""
+        return channel
+
+    def _join_channel(self, login: str) -> None:
+        """Go to a channel's stream."""
+        self._channel = login
+        self._joined = time.monotonic()
+
+        self._wait_turn()
+        with self._focus():
+            self._driver.get(BASE_URL + "/" + login)
+
+    @tracing.traced()
     def _check_stream_alive(self) -> bool:
-        """Check if current stream is still live and dropping."""
+        """Check if current stream is still live and dropping, leaving it if not."""
         # Check stream live and dropping, some streams (smitegame) go 'offline' meaning no drops but still live
-        if not (
-            self._find_element_xpath(
-                "//div[@class='channel-info-content']//p[contains(text(), 'LIVE')]"
-            )
-            or self._find_element_xpath(
-                "//div[@class='channel-info-content']//a[@data-a-target='Drops Enabled']"
-            )
-        ):
-            print(
-                self.user.username, "-", self._date_time(), "-", "[!] Stream offline."
-            )
+        found = self._probe_xpaths(
+            {name: XPATHS[name] for name in ("live", "drops")}
+        )
+
+        if not any(found.values()):
+            self._log("[!] Stream offline.")
+            self._leave_channel(failed=True)
             return False
 
         return True
 
+    @tracing.traced()
     def _claim_channel_points(self) -> None:
         """Claim channel points."""
-        self._click_element_xpath("//div[@class='claimable-bonus__icon tw-flex']")
+        self._click_element_xpath(XPATHS["channel points"])
 
     def _lower_quality(self, quality: str = None) -> None:
         """Lower quality of stream.
@@ -504,30 +1141,29 @@ class Stream(Twitch):
         Tries to set to desired quality otherwise will go with the lowest option available.
         """
         # Menu button
-        self._click_element_xpath("//button[@data-a-target='player-settings-button']")
+        self._click_element_xpath(XPATHS["settings"])
 
         # Dropdown button
-        self._click_element_xpath(
-            "//button[@data-a-target='player-settings-menu-item-quality']"
-        )
+        self._click_element_xpath(XPATHS["quality menu"])
 
-        # Trying lowest quality buttons
+        # Trying lowest quality buttons, all options appear at once so probe them together
         if quality == None:
-            for quality_setting in ["160p", "360p", "480p", "720p", "Auto"]:
-                if self._click_element_xpath(
-                    "//div[@data-a-target='player-settings-submenu-quality-option']//div[contains(text(), '%s')]"
-                    % quality_setting
-                ):
+            options = {
+                quality_setting: XPATHS["quality option"] % quality_setting
+                for quality_setting in ["160p", "360p", "480p", "720p", "Auto"]
+            }
+            found = self._probe_xpaths(options)
+
+            for quality_setting, xpath in options.items():
+                if found[quality_setting] and self._click_element_xpath(xpath):
                     break
         else:
-            self._click_element_xpath(
-                "//div[@data-a-target='player-settings-submenu-quality-option']//div[contains(text(), '%s')]"
-                % quality
-            )
+            self._click_element_xpath(XPATHS["quality option"] % quality)
 
+    @tracing.traced()
     def _check_error(self) -> bool:
         """Check for an error inside te player."""
-        return None != self._find_element_xpath("//p[contains(text(), 'Error')]")
+        return None != self._find_element_xpath(XPATHS["error"])
 
 
 class Inventory(Twitch):
@@ -540,6 +1176,8 @@ class Inventory(Twitch):
         _claim : bool - Should drops be automatically claimed
         _notify_on_claim : bool - Should username be texted on drop claim/claimable
         _drops : Event - Are drops still available, will be set when inventory is empty, indefinite execution if empty
+        _progress : Progress_Tracker - Progress history of drops used to schedule the next check
+        _schedule : Campaign_Scheduler - Told the campaigns in progress after each check, may be None
     """
 
     def __init__(
@@ -550,13 +1188,19 @@ class Inventory(Twitch):
         auto_claim: bool = True,
         notify_on_claim: bool = False,
         notify_no_avilable: bool = False,
+        session: Session = None,
+        pool: driver_pool.Driver_Pool = None,
+        schedule=None,
     ) -> None:
-        Twitch.__init__(self, user, headless)
+        Twitch.__init__(self, user, headless, session, pool)
         self._drops = drops_available
-        self._url = "https://www.Twitch.tv/drops/inventory"
+        self._url = BASE_URL + "/drops/inventory"
+        self._profile = "inventory"
         self._claim = auto_claim
         self._notify_claim = notify_on_claim  # TODO : not used
         self._notify_available = notify_no_avilable
+        self._progress = progress.Progress_Tracker()
+        self._schedule = schedule
 
         # Setup Twilio if notifying
         if self._notify_claim or self._notify_available:
@@ -565,50 +1209,75 @@ class Inventory(Twitch):
             self.notifyer = sender.Notifier()
 
     def run(self) -> None:
-        """Automate checking and claiming drops."""
-        self._setup()
+        """Automate checking and claiming drops.
 
-        while self._check_drops_available():
-            self._claim_drop()
+        Checks again just after the next drop is predicted to be earned.
+        """
+        self._run_steps()
 
-            print(
-                self.user.username, "-", self._date_time(), "-", "[*] Drops processed."
+    def _step(self) -> float:
+        """See base class."""
+        self._count_requests()
+
+        # Reload the inventory after the wait
+        if self._stepped:
+            start = time.monotonic()
+            self._wait_turn("health")
+            with self._focus():
+                self._driver.refresh()
+
+            error = self._check_error()
+            metrics.INVENTORY_REFRESH_SECONDS.observe(
+                time.monotonic() - start,
+                backend="browser",
+                result="error" if error else "ok",
             )
 
-            time.sleep(600)
+            if error:
+                self._log("[!] Network error.")
+                self._setup()
 
-            self._lock.acquire()
-            self._driver.refresh()
-            self._lock.release()
+        # Once the refresh is seen to have loaded, one copy of the page says if drops are left
+        state = None
+        if self._stepped and not error:
+            state = self._classify(["drops left"])
 
-            if self._check_error():
-                print(
-                    self.user.username,
-                    "-",
-                    self._date_time(),
-                    "-",
-                    "[!] Network error.",
-                )
-                self._setup()
+        self._update_schedule()
+
+        if not self._check_drops_available(state):
+            return None
+
+        # Only found elements are trusted, a claim button the copy missed is still waited for
+        self._claim_drop()
+
+        self._progress.update(self._read_progress())
+        wait = self._progress.next_check()
 
-        print(
-            self.user.username, "-", self._date_time(), "-", "[*] Quitting inventory."
+        self._log(
+            "[*] Drops processed, next check in %ds." % wait,
+            event="drops_processed",
+            next_check=wait,
         )
 
-        self._driver.quit()
+        self._stepped = True
+        return wait
+
+    def _finish(self) -> None:
+        """See base class."""
+        self._log("[*] Quitting inventory.")
+        Twitch._finish(self)
 
     def _setup(self) -> None:
         """See base class."""
         Twitch._setup(self)
 
-        print(
-            self.user.username, "-", self._date_time(), "-", "[*] Inventory Starting."
-        )
+        self._log("[*] Inventory Starting.")
 
-        self._lock.acquire()
-        self._driver.get(self._url)
-        self._lock.release()
+        self._wait_turn()
+        with self._focus():
+            self._driver.get(self._url)
 
+    @tracing.traced()
     def _claim_drop(self) -> bool:
         """Attempt to claim a drop in the inventory.
 
@@ -616,12 +1285,10 @@ class Inventory(Twitch):
         will notify the user if needed then claim dependant on _auto_claim.
         Will pause if the user needs to collect maually."""
         element = self._find_element_xpath(
-            "//div[@data-test-selector='DropsCampaignInProgressRewards-container']//button[@data-test-selector='DropsCampaignInProgressRewardPresentation-claim-button']"
+            XPATHS["claim"]
         )
         if element != None:
-            print(
-                self.user.username, "-", self._date_time(), "-", "[*] Drop claimable."
-            )
+            self._log("[*] Drop claimable.")
 
             # Notify drop claimable
             if self._notify_claim:
@@ -630,61 +1297,96 @@ class Inventory(Twitch):
             # Claim drop
             if self._claim:
                 self._click_element_xpath(
-                    "//div[@data-test-selector='DropsCampaignInProgressRewards-container']//button[@data-test-selector='DropsCampaignInProgressRewardPresentation-claim-button']"
-                )
-                print(
-                    self.user.username, "-", self._date_time(), "-", "[+] Drop claimed."
+                    XPATHS["claim"]
                 )
+                self._log("[+] Drop claimed.")
 
             # Wait for drop to be claimed
             else:
                 while self._find_element_xpath(
-                    "//div[@data-test-selector='DropsCampaignInProgressRewards-container']//button[@data-test-selector='DropsCampaignInProgressRewardPresentation-claim-button']"
+                    XPATHS["claim"]
                 ):
-                    print(
-                        self.user.username,
-                        "-",
-                        self._date_time(),
-                        "-",
-                        "[!] Not claimed yet.",
-                    )
+                    self._log("[!] Not claimed yet.")
                     time.sleep(60)
 
-                    self._lock.acquire()
-                    self._driver.refresh()
-                    self._lock.release()
+                    self._wait_turn("health")
+                    with self._focus():
+                        self._driver.refresh()
 
             return True
 
         return False
 
-    def _check_drops_available(self) -> bool:
-        """Check if there are any drops left."""
+    def _read_progress(self) -> dir:
+        """Read the percentage of each drop in progress.
+
+        Returns:
+            Drop name to percent complete.
+        """
+        with self._focus():
+            try:
+                bars = self._driver.execute_script(_PROGRESS_SCRIPT)
+            except WebDriverException:
+                return {}
+
+        return {name: percent for name, percent in bars if percent != None}
+
+    def _update_schedule(self) -> None:
+        """Tell the schedule the campaigns in progress.
+
+        The page does not show how many minutes each drop needs or when campaigns end,
+        so the inventory is also queried through the API with the logged in cookies.
+        """
+        if self._schedule == None:
+            return
+
+        try:
+            data = twitch_api.Client(self.user).query(
+                "Inventory", twitch_api.INVENTORY_QUERY, priority="health"
+            )
+            self._schedule.update(
+                data["currentUser"]["inventory"]["dropCampaignsInProgress"] or []
+            )
+        except (ConnectionError, PermissionError, KeyError, TypeError):
+            self._log("[!] Campaigns not read.")
+
+    def _check_drops_available(self, found: dir = None) -> bool:
+        """Check if there are any drops left, including campaigns the schedule has yet to try.
+
+        Args:
+            found : dir - Whether the drops left image exists if already known, only being found is trusted
+        """
         if self._drops == None:
             return True
 
+        # Without the API the drops left image is all there is to go on
+        if (
+            self._schedule != None
+            and self._schedule.answered()
+            and not self._schedule.done()
+        ):
+            return True
+
+        if found != None and found["drops left"]:
+            return True
+
         if (
             self._find_element_xpath(
-                "//div[@data-test-selector='DropsCampaignInProgressRewards-container']//img[@class='inventory-drop-image inventory-opacity-2 tw-image']"
+                XPATHS["drops left"]
             )
             == None
         ):
-            print(
-                self.user.username,
-                "-",
-                self._date_time(),
-                "-",
-                "[*] No more drops left.",
-            )
+            self._log("[*] No more drops left.")
 
             self._drops.set()
             return False
         else:
             return True
 
+    @tracing.traced()
     def _check_error(self) -> bool:
         """Check for an network error where screen is not loaded."""
-        return not (
-            self._find_element_xpath("//h4[contains(text(), 'Claimed')]")
-            or self._find_element_xpath("//p[contains(text(), 'In Progress')]")
+        found = self._probe_xpaths(
+            {name: XPATHS[name] for name in ("claimed", "in progress")}
         )
+        return not any(found.values())
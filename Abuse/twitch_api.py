@@ -0,0 +1,722 @@
+# Browserless access to Twitch through its GraphQL API
+import base64
+import http.cookiejar
+import json
+import re
+import threading
+import time
+import requests
+from requests import adapters
+import account
+import pages
+from utility import log, metrics, progress, rate_limit, reputation, tracing
+
+GQL_URL = "https://gql.twitch.tv/gql"
+WWW_URL = "https://www.twitch.tv"
+CLIENT_ID = "kimne78kx3ncx6brgo4mv6wki5h1ko"  # Client ID used by the Twitch website
+
+# Same directory twitch.Stream browses
+GAME = "SMITE"
+DROPS_TAG = "c2542d6d-cd10-4532-919b-3d19f30a768b"
+
+CURRENT_USER_QUERY = """
+query CurrentUser {
+  currentUser { id login }
+}
+"""
+
+DIRECTORY_QUERY = """
+query DirectoryPage_Game($name: String!, $options: GameStreamOptions, $limit: Int) {
+  game(name: $name) {
+    streams(first: $limit, options: $options) {
+      edges {
+        node {
+          id
+          viewersCount
+          broadcaster { id login }
+        }
+      }
+    }
+  }
+}
+"""
+
+CHANNEL_STREAM_QUERY = """
+query ChannelStream($login: String!) {
+  user(login: $login) {
+    id
+    stream { id }
+  }
+}
+"""
+
+INVENTORY_QUERY = """
+query Inventory {
+  currentUser {
+    id
+    inventory {
+      dropCampaignsInProgress {
+        id
+        name
+        endAt
+        game { name }
+        timeBasedDrops {
+          id
+          name
+          requiredMinutesWatched
+          self { currentMinutesWatched isClaimed dropInstanceID }
+        }
+      }
+    }
+  }
+}
+"""
+
+CLAIM_MUTATION = """
+mutation DropsPage_ClaimDropRewards($input: ClaimDropRewardsInput!) {
+  claimDropRewards(input: $input) { status }
+}
+"""
+
+# Pooled http session shared by every user account - auth is sent per request so no cookies are kept
+_http = None
+_http_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Get the pooled http session shared by all clients."""
+    global _http
+
+    with _http_lock:
+        if _http == None:
+            _http = requests.Session()
+            _http.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64)
+            _http.mount("https://", adapter)
+            _http.mount("http://", adapter)
+
+    return _http
+
+
+class Client:
+    """GraphQL client acting as a user account.
+
+    Authenticates with the auth token from the cookies stored in the account.
+
+    Attributes:
+        user : Account - A user account object, None to query anonymously
+        url : str - GraphQL endpoint, may be pointed at a stub server
+        timeout : float - Seconds to wait for a response
+    """
+
+    def __init__(
+        self, user: account.Account, url: str = GQL_URL, timeout: float = 30
+    ) -> None:
+        self.user = user
+        self.url = url
+        self.timeout = timeout
+
+    def token(self) -> str:
+        """Get the auth token from the account's cookies.
+
+        Raises:
+            PermissionError - The account has no auth token cookie
+        """
+        for cookie in self.user.cookies or []:
+            if cookie.get("name") == "auth-token":
+                return cookie["value"]
+
+        raise PermissionError("[!!] %s has no auth token" % self.user.username)
+
+    def query(
+        self,
+        operation: str,
+        query: str,
+        variables: dir = None,
+        priority: str = "navigation",
+    ) -> dir:
+        """Run a GraphQL query or mutation once the shared rate limit allows it.
+
+        Args:
+            operation : str - Operation name
+            query : str - GraphQL document
+            variables : dir - Variables for the document
+            priority : str - "login", "navigation" or "health", see rate_limit.PRIORITIES
+
+        Returns:
+            The data of the response.
+
+        Raises:
+            PermissionError - The account has no auth token cookie
+            ConnectionError - The request failed or Twitch returned errors
+        """
+        headers = {"Client-Id": CLIENT_ID}
+        if self.user != None:
+            headers["Authorization"] = "OAuth " + self.token()
+
+        body = {"operationName": operation, "query": query, "variables": variables or {}}
+
+        rate_limit.limiter.acquire(
+            self.user.username if self.user != None else None,
+            rate_limit.GQL_HOST,
+            priority,
+        )
+
+        try:
+            response = http_session().post(
+                self.url, json=body, headers=headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as error:
+            raise ConnectionError("[!!] %s failed: %s" % (operation, error))
+
+        if data.get("errors") or data.get("data") == None:
+            raise ConnectionError(
+                "[!!] %s failed: %s" % (operation, data.get("errors"))
+            )
+
+        return data["data"]
+
+
+class Twitch(threading.Thread, pages.Page):
+    """Models Twitch through the GraphQL API, no browser required.
+
+    Counterpart of twitch.Twitch which needs the user account to already have cookies.
+
+    Attributes:
+        user : Account - A user account object
+        _client : Client - GraphQL client for the user
+        _url : str - GraphQL endpoint
+        _stepped : bool - Has a step been completed
+        _logger : Logger - Status lines of this kind of page
+    """
+
+    def __init__(self, user: account.Account, url: str = GQL_URL) -> None:
+        threading.Thread.__init__(self)
+        self.user = user
+        self._client = None
+        self._url = url
+        self._stepped = False
+        self._logger = log.get(metrics.page_kind(self))
+
+    def _finish(self) -> None:
+        """Clean up once finished."""
+        pass
+
+    @tracing.traced()
+    def _setup(self) -> None:
+        """Setup the GraphQL client.
+
+        Raises:
+            PermissionError - The account has no cookies to authenticate with
+        """
+        # Check if cookies have just been added by another thread
+        if self.user.cookies == None:
+            with self.user.lock:
+                self.user.load()
+
+            if self.user.cookies == None:
+                self._log("[!!] No cookies to login with.")
+                raise PermissionError
+
+        self._client = Client(self.user, self._url)
+
+
+class Stream(Twitch, pages.Channel_Watcher):
+    """Keeps a Twitch stream watched through minute-watched heartbeats, no video is played.
+
+    Drop in replacement for twitch.Stream.
+    See base class for additional details.
+
+    Attributes:
+        _drops : Event - Are drops still available, indefinite execution if empty
+        _www_url : str - Twitch website, channel pages are loaded from here to find where to send heartbeats
+        _user_id : str - Twitch ID of the user
+        _channel : dir - Login, ID and broadcast ID of the channel being watched, None if no stream
+        _joined : float - When the current channel was joined
+        _attempts : int - Candidates tried each time a new stream is needed
+        _candidates : list - Queried channels still to try, unused with a shared directory
+        _failed : list - Logins that went offline this session
+        _schedule : Campaign_Scheduler - Picks the campaign to watch, None to always watch the default campaign
+        _campaign : dir - Game and directory tags of the campaign being watched
+        _spade_url : str - Where to send heartbeats for the current channel
+        _error : bool - Did the last heartbeat fail
+        _interval : float - Seconds between checking the stream is alive
+        _heartbeat : float - Seconds between heartbeats
+        _beats_left : int - Heartbeats left before checking the stream is alive
+        _directory : Directory - Shared directory to get channels from, None to query the directory
+    """
+
+    def __init__(
+        self,
+        user: account.Account,
+        drops_available: threading.Event = None,
+        url: str = GQL_URL,
+        www_url: str = WWW_URL,
+        directory=None,
+        schedule=None,
+    ) -> None:
+        Twitch.__init__(self, user, url)
+        self._drops = drops_available
+        self._directory = directory
+        self._schedule = schedule
+        self._campaign = {"game": GAME, "tags": [DROPS_TAG]}
+        self._www_url = www_url
+        self._user_id = None
+        self._channel = None
+        self._joined = None
+        self._attempts = 3
+        self._candidates = []
+        self._failed = []
+        self._spade_url = None
+        self._error = False
+        self._interval = 600
+        self._heartbeat = 60
+        self._beats_left = 0
+
+    def run(self) -> None:
+        """Automate finding and watching droppable streams.
+
+        Setup,
+        then while drops are available find a droppable stream and send heartbeats for it.
+        """
+        self._run_steps()
+
+    def _step(self) -> float:
+        """See base class, a step is one heartbeat."""
+        if self._drops_done():
+            return None
+
+        if self._beats_left == 0:
+            if self._stepped and self._check_error():
+                self._log("[!] Network error.")
+                self._setup()
+
+            # Nothing to watch until the inventory shows more drops
+            if not self._follow_schedule():
+                self._stepped = True
+                return self._interval
+
+            # If no stream find stream
+            if not self._check_stream_alive():
+                if not self._find_stream():
+                    self._stepped = True
+                    return self._interval
+            else:
+                self._log("[*] Stream Running.")
+
+            # Heartbeat until the next check
+            self._beats_left = max(1, int(self._interval // self._heartbeat))
+
+        self._beats_left -= 1
+        if not self._send_watch():
+            self._beats_left = 0
+
+        self._stepped = True
+        return self._heartbeat
+
+    def _finish(self) -> None:
+        """See base class."""
+        self._log("[*] Quitting stream.")
+        self._leave_channel()
+
+    def _setup(self) -> None:
+        """See base class, also finds the user's Twitch ID."""
+        Twitch._setup(self)
+        self._log("[*] Stream Starting.")
+
+        self._error = False
+        try:
+            self._user_id = self._client.query("CurrentUser", CURRENT_USER_QUERY)[
+                "currentUser"
+            ]["id"]
+        except (ConnectionError, KeyError, TypeError):
+            self._error = True
+
+    def _drops_done(self) -> bool:
+        """Have all drops been processed."""
+        return self._drops.is_set() if self._drops != None else False
+
+    @tracing.traced()
+    def _find_stream(self) -> bool:
+        """Find a new stream, going straight on to the next candidate if one is not live.
+
+        Returns:
+            Whether a new stream has been entered.
+        """
+        start = time.monotonic()
+        self._leave_channel()
+        self._spade_url = None
+
+        for _ in range(self._attempts):
+            try:
+                channel = self._next_candidate()
+            except (ConnectionError, IndexError, KeyError, TypeError):
+                break
+
+            if channel == None:
+                break
+
+            self._join_channel(channel)
+
+            # Browser scraped directories only have the login, the check fills in the ids
+            if channel["id"] == None or channel["broadcast id"] == None:
+                if not self._check_stream_alive():
+                    continue
+
+            self._spade_url = self._find_spade_url(channel["login"])
+            if self._spade_url == None:
+                self._leave_channel()
+                break
+
+            seconds = time.monotonic() - start
+            self._log(
+                "[*] New stream found: %s/%s" % (self._www_url, channel["login"]),
+                duration=seconds,
+                channel=channel["login"],
+            )
+            metrics.FIND_STREAM_SECONDS.observe(seconds, backend="http", result="found")
+            return True
+
+        seconds = time.monotonic() - start
+        self._log("[!] New stream not found.", duration=seconds)
+        metrics.FIND_STREAM_SECONDS.observe(seconds, backend="http", result="not found")
+        return False
+
+    def _fetch_candidates(self, limit: int = 10) -> list:
+        """See base class, queried from the directory.
+
+        Raises:
+            ConnectionError - The query failed
+        """
+        edges = self._client.query(
+            "DirectoryPage_Game",
+            DIRECTORY_QUERY,
+            {
+                "name": self._campaign["game"],
+                "options": {"tags": self._campaign["tags"], "sort": "RELEVANCE"},
+                "limit": limit,
+            },
+        )["game"]["streams"]["edges"]
+
+        channels = [
+            {
+                "login": edge["node"]["broadcaster"]["login"],
+                "id": edge["node"]["broadcaster"]["id"],
+                "broadcast id": edge["node"]["id"],
+            }
+            for edge in edges
+            if edge["node"]["broadcaster"]["login"] not in self._failed
+        ]
+        # Sorting is stable so equally stable channels keep the directory's order
+        return sorted(
+            channels,
+            key=lambda channel: -reputation.reputations.stability(channel["login"]),
+        )
+
+    def _join_channel(self, channel: dir) -> None:
+        """Start watching a channel."""
+        self._channel = channel
+        self._joined = time.monotonic()
+
+    def _find_spade_url(self, login: str) -> str:
+        """Find where the website sends heartbeats from the channel page.
+
+        Returns:
+            The url or None if not found.
+        """
+        rate_limit.limiter.acquire(self.user.username)
+
+        try:
+            response = http_session().get(
+                "%s/%s" % (self._www_url, login), timeout=self._client.timeout
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+
+        found = re.search(r'"spade_?url"\s*:\s*"([^"]+)"', response.text, re.IGNORECASE)
+        return found.group(1) if found else None
+
+    @tracing.traced()
+    def _check_stream_alive(self) -> bool:
+        """Check if current stream is still live, leaving it if not."""
+        if self._channel == None:
+            return False
+
+        try:
+            user = self._client.query(
+                "ChannelStream",
+                CHANNEL_STREAM_QUERY,
+                {"login": self._channel["login"]},
+                priority="health",
+            )["user"]
+            stream = user["stream"]
+        except (ConnectionError, KeyError, TypeError):
+            stream = None
+
+        if stream == None:
+            self._log("[!] Stream offline.")
+            self._leave_channel(failed=True)
+            return False
+
+        self._channel["id"] = user["id"]
+        self._channel["broadcast id"] = stream["id"]
+        return True
+
+    def _send_watch(self) -> bool:
+        """Send a minute-watched heartbeat for the current stream.
+
+        Returns:
+            Was the heartbeat accepted.
+        """
+        event = [
+            {
+                "event": "minute-watched",
+                "properties": {
+                    "channel_id": self._channel["id"],
+                    "broadcast_id": self._channel["broadcast id"],
+                    "channel": self._channel["login"],
+                    "user_id": self._user_id,
+                    "player": "site",
+                    "live": True,
+                },
+            }
+        ]
+        data = base64.b64encode(json.dumps(event, separators=(",", ":")).encode())
+
+        rate_limit.limiter.acquire(self.user.username, rate_limit.SPADE_HOST, "health")
+
+        try:
+            response = http_session().post(
+                self._spade_url,
+                data={"data": data.decode()},
+                timeout=self._client.timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            self._error = True
+            return False
+
+        self._error = False
+        return True
+
+    def _check_error(self) -> bool:
+        """Check if the last heartbeat failed."""
+        return self._error
+
+
+class Inventory(Twitch):
+    """Models a Twitch inventory through the GraphQL API.
+
+    Drop in replacement for twitch.Inventory.
+    See base class for additional details.
+
+    Attributes:
+        _claim : bool - Should drops be automatically claimed
+        _notify_on_claim : bool - Should username be texted on drop claim/claimable
+        _drops : Event - Are drops still available, will be set when inventory is empty, indefinite execution if empty
+        _campaigns : list - Campaigns in progress from the last refresh, None if it failed
+        _progress : Progress_Tracker - Progress history of drops used to schedule the next refresh
+        _schedule : Campaign_Scheduler - Told the campaigns in progress after each refresh, may be None
+    """
+
+    def __init__(
+        self,
+        user: account.Account,
+        drops_available: threading.Event = None,
+        auto_claim: bool = True,
+        notify_on_claim: bool = False,
+        notify_no_avilable: bool = False,
+        url: str = GQL_URL,
+        schedule=None,
+    ) -> None:
+        Twitch.__init__(self, user, url)
+        self._drops = drops_available
+        self._claim = auto_claim
+        self._notify_claim = notify_on_claim
+        self._notify_available = notify_no_avilable
+        self._campaigns = None
+        self._progress = progress.Progress_Tracker()
+        self._schedule = schedule
+
+        # Setup Twilio if notifying
+        if self._notify_claim or self._notify_available:
+            from tell_me_done import sender
+
+            self.notifyer = sender.Notifier()
+
+    def run(self) -> None:
+        """Automate checking and claiming drops.
+
+        Checks again just after the next drop is predicted to be earned.
+        """
+        self._run_steps()
+
+    def _step(self) -> float:
+        """See base class."""
+        # Reload the inventory after the wait
+        if self._stepped:
+            self._refresh()
+
+            if self._check_error():
+                self._log("[!] Network error.")
+                self._setup()
+
+        if not self._check_drops_available():
+            return None
+
+        self._claim_drop()
+
+        self._progress.update(self._read_progress())
+        wait = self._progress.next_check()
+
+        self._log(
+            "[*] Drops processed, next check in %ds." % wait,
+            event="drops_processed",
+            next_check=wait,
+        )
+
+        self._stepped = True
+        return wait
+
+    def _finish(self) -> None:
+        """See base class."""
+        self._log("[*] Quitting inventory.")
+
+    def _setup(self) -> None:
+        """See base class, also loads the inventory."""
+        self._log("[*] Inventory Starting.")
+        Twitch._setup(self)
+        self._refresh()
+
+    @tracing.traced()
+    def _refresh(self) -> bool:
+        """Reload the campaigns in progress.
+
+        Returns:
+            Was the inventory loaded.
+        """
+        start = time.monotonic()
+
+        try:
+            data = self._client.query("Inventory", INVENTORY_QUERY, priority="health")
+            inventory = data["currentUser"]["inventory"]
+            self._campaigns = inventory["dropCampaignsInProgress"] or []
+        except (ConnectionError, KeyError, TypeError):
+            self._campaigns = None
+            metrics.INVENTORY_REFRESH_SECONDS.observe(
+                time.monotonic() - start, backend="http", result="error"
+            )
+            return False
+
+        metrics.INVENTORY_REFRESH_SECONDS.observe(
+            time.monotonic() - start, backend="http", result="ok"
+        )
+
+        if self._schedule != None:
+            self._schedule.update(self._campaigns)
+
+        return True
+
+    def _time_based_drops(self) -> list:
+        """All drops from the last refresh."""
+        return [
+            drop
+            for campaign in self._campaigns or []
+            for drop in campaign.get("timeBasedDrops") or []
+        ]
+
+    def _read_progress(self) -> dir:
+        """Percentage of each drop still being earned.
+
+        Returns:
+            Drop ID to percent complete.
+        """
+        return {
+            drop["id"]: 100
+            * drop["self"]["currentMinutesWatched"]
+            / max(1, drop["requiredMinutesWatched"])
+            for drop in self._time_based_drops()
+            if drop.get("self") and not drop["self"]["isClaimed"]
+        }
+
+    def _claimable_drops(self) -> list:
+        """Drops which have been earned but not claimed."""
+        return [
+            drop
+            for drop in self._time_based_drops()
+            if drop.get("self")
+            and not drop["self"]["isClaimed"]
+            and drop["self"].get("dropInstanceID")
+            and drop["self"]["currentMinutesWatched"] >= drop["requiredMinutesWatched"]
+        ]
+
+    @tracing.traced()
+    def _claim_drop(self) -> bool:
+        """Attempt to claim the drops in the inventory.
+
+        Will notify the user if needed then claim dependant on _auto_claim.
+        Will pause if the user needs to collect maually."""
+        claimable = self._claimable_drops()
+
+        if not claimable:
+            return False
+
+        self._log("[*] Drop claimable.")
+
+        # Notify drop claimable
+        if self._notify_claim:
+            self.notifyer.send("Drop is claimable", user=self.user)
+
+        # Claim drop
+        if self._claim:
+            for drop in claimable:
+                try:
+                    self._client.query(
+                        "DropsPage_ClaimDropRewards",
+                        CLAIM_MUTATION,
+                        {"input": {"dropInstanceID": drop["self"]["dropInstanceID"]}},
+                    )
+                except ConnectionError:
+                    self._log("[!] Drop not claimed.")
+                    continue
+
+                drop["self"]["isClaimed"] = True
+                self._log("[+] Drop claimed.")
+
+        # Wait for drop to be claimed
+        else:
+            while self._claimable_drops():
+                self._log("[!] Not claimed yet.")
+                time.sleep(60)
+                self._refresh()
+
+        return True
+
+    def _check_drops_available(self) -> bool:
+        """Check if there are any drops left."""
+        if self._drops == None or self._campaigns == None:
+            return True
+
+        # Earned drops count as left until they are claimed
+        if self._schedule != None:
+            left = not self._schedule.done() or self._claimable_drops()
+        else:
+            left = any(
+                drop.get("self") == None or not drop["self"]["isClaimed"]
+                for drop in self._time_based_drops()
+            )
+
+        if not left:
+            self._log("[*] No more drops left.")
+
+            self._drops.set()
+            return False
+        else:
+            return True
+
+    def _check_error(self) -> bool:
+        """Check if the last refresh failed."""
+        return self._campaigns == None
@@ -1,7 +1,145 @@
 # Functionallity for working with groups of Account's
-import os
+import threading
+import time
 import account
-from os import path
+from utility import log, storage
+
+_logger = log.get("utility.accounts")
+
+
+class Registry:
+    """Every stored account loaded once and indexed.
+
+    Refreshing only reloads accounts whose stored version (file mtime) changed,
+    the same Account object is kept for a user so locks and cookies are shared.
+
+    Attributes:
+        interval : float - Seconds a refresh is skipped for after the last one
+        _store : Json_Store/Sqlite_Store - Where accounts are stored, None for the shared store
+        _accounts : dir - Username to account
+        _phones : dir - Phone number to account
+        _admins : dir - Username to admin account
+        _versions : dir - Username to stored version when last loaded
+        _refreshed : float - When the last refresh was, None if never
+        _lock : RLock - Use when changing the indexes
+    """
+
+    def __init__(self, store=None, interval: float = 5) -> None:
+        self.interval = interval
+        self._store = store
+        self._accounts = {}
+        self._phones = {}
+        self._admins = {}
+        self._versions = {}
+        self._refreshed = None
+        self._lock = threading.RLock()
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload changed accounts and drop deleted ones.
+
+        Args:
+            force : bool - Refresh even if the last refresh was recent
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._refreshed != None
+                and now - self._refreshed < self.interval
+            ):
+                return
+
+            store = self._store if self._store != None else storage.store()
+            writer = None if self._store != None else storage.writer()
+            versions = store.versions()
+
+            if self._refreshed == None:
+                changed = store.load_all()
+            else:
+                changed = {}
+                for username, version in versions.items():
+                    if self._versions.get(username) != version:
+                        try:
+                            changed[username] = store.load(username)
+                        except FileNotFoundError:
+                            versions.pop(username)  # Deleted since listing
+
+            for username in list(self._accounts):
+                if username not in versions:
+                    self._remove(username)
+
+            for username, data in changed.items():
+                # Buffered saves are newer than what is stored
+                if writer != None and (pending := writer.get(username)) != None:
+                    data = pending
+
+                self._add(username, data)
+
+            self._versions = versions
+            self._refreshed = now
+
+    def get(self, username: str) -> account.Account:
+        """The account for a username, None if there is not one."""
+        self.refresh()
+        return self._accounts.get(username)
+
+    def by_phone(self, phone: str) -> account.Account:
+        """The account for a phone number, None if there is not one."""
+        self.refresh()
+        return self._phones.get(phone)
+
+    def admins(self) -> list:
+        self.refresh()
+        with self._lock:
+            return list(self._admins.values())
+
+    def accounts(self) -> list:
+        self.refresh()
+        with self._lock:
+            return list(self._accounts.values())
+
+    def __contains__(self, username: str) -> bool:
+        return self.get(username) != None
+
+    def _add(self, username: str, data: dir) -> None:
+        """Add or update an account and its indexes."""
+        self._remove(username, keep=True)
+
+        user = self._accounts.get(username)
+        if user == None:
+            user = account.Account(username)
+            self._accounts[username] = user
+
+        user._fill(data)
+
+        if user.phone:
+            self._phones[user.phone] = user
+        if user.admin:
+            self._admins[username] = user
+
+    def _remove(self, username: str, keep: bool = False) -> None:
+        """Remove an account from the indexes.
+
+        Args:
+            keep : bool - Keep the account object to be updated in place
+        """
+        user = self._accounts.get(username)
+        if user == None:
+            return
+
+        if self._phones.get(user.phone) is user:
+            del self._phones[user.phone]
+        self._admins.pop(username, None)
+
+        if not keep:
+            del self._accounts[username]
+
+
+_registry = Registry()  # Shared by the whole process
+
+
+def registry() -> Registry:
+    return _registry
 
 
 def get_accounts() -> list:
@@ -10,30 +148,9 @@ def get_accounts() -> list:
     Returns:
         A collection of account objects.
     """
-    accounts = []
-    folder = path.join(
-        path.dirname(path.realpath(__file__)), "..", "resources", "users"
-    )
-
-    if not path.isdir(folder):
-        print("[!!] No users")
-        raise FileNotFoundError
-
-    folder = os.listdir(folder)
-
-    if not folder:
-        print("[*] No users")
-        return []
-
-    for account_name in folder:
-        try:
-            username = account_name.removesuffix(".json")
-        except AttributeError:
-            print("[!] Python version does not support removesuffix - be careful")
-            username = account_name[:-5]
-
-        user = account.Account(username)
-        user.load()
-        accounts.append(user)
+    accounts = _registry.accounts()
+
+    if not accounts:
+        log.write(_logger, "[*] No users")
 
     return accounts
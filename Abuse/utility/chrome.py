@@ -0,0 +1,73 @@
+# Functionallity for finding and launching the chrome webdriver
+from os import path
+import platform
+from selenium import webdriver
+from selenium.webdriver.chrome import options
+from utility import log, profiles, request_filter
+
+_logger = log.get("utility.chrome")
+
+
+def driver_location() -> str:
+    """Find the chrome webdriver as it is stored differently on OS's.
+
+    Returns:
+        The file location of the webdriver.
+
+    Raises:
+        EnvironmentError - The platform is not supported
+        FileNotFoundError - The webdriver cannot be found
+    """
+    plat = platform.platform().lower()
+
+    if plat.startswith("win"):
+        file_loc = path.join(
+            path.dirname(path.realpath(__file__)),
+            "..",
+            "resources",
+            "webdrivers",
+            "chromedriver.exe",
+        )
+    elif plat.startswith("lin"):
+        file_loc = "/usr/lib/chromium-browser/chromedriver"
+    else:
+        log.write(_logger, "[!!] Platform not supported.")
+        raise EnvironmentError
+
+    if not path.isfile(file_loc):
+        log.write(_logger, "[!!] Chromium webdriver does not exsist!")
+        raise FileNotFoundError
+
+    return file_loc
+
+
+def launch(headless: bool, user_data: str = None) -> webdriver.Chrome:
+    """Launch a new chrome webdriver.
+
+    Args:
+        headless : bool - Should the browser be hidden
+        user_data : str - Profile directory to keep cookies, storage and cache in, None for a new one
+
+    Raises:
+        EnvironmentError - The platform is not supported
+        FileNotFoundError - The webdriver cannot be found
+    """
+    file_loc = driver_location()
+
+    chrome_options = options.Options()
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--mute-audio")
+
+    if headless:
+        chrome_options.add_argument("--headless")
+
+    if user_data != None:
+        chrome_options.add_argument("--user-data-dir=%s" % path.abspath(user_data))
+        chrome_options.add_argument("--disk-cache-size=%d" % (profiles.CACHE_MB * 1024 * 1024))
+
+    # Network events to count filtered requests
+    if request_filter.ENABLED:
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    return webdriver.Chrome(executable_path=file_loc, chrome_options=chrome_options)
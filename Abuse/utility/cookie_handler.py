@@ -1,6 +1,9 @@
 # Methods for saving and retrieving cookies - unused
 import json
 from os import path
+from utility import log
+
+_logger = log.get("utility.cookie_handler")
 
 
 def save_cookies(cookies, file_loc):
@@ -23,7 +26,7 @@ def load_cookies(file_loc):
 
     # Verification file exsists
     if not path.isfile(file_loc):
-        print("[!!] No cookies file")
+        log.write(_logger, "[!!] No cookies file")
         raise FileNotFoundError
 
     with open(file_loc, "r") as file:
@@ -0,0 +1,254 @@
+# Pool of launched webdrivers reused between user accounts
+import threading
+import time
+from selenium.common.exceptions import WebDriverException
+from utility import chrome, log
+
+_logger = log.get("utility.driver_pool")
+
+# Origins whose storage must not leak between user accounts
+_ORIGINS = [
+    "https://www.twitch.tv",
+    "https://twitch.tv",
+    "https://gql.twitch.tv",
+    "https://id.twitch.tv",
+    "https://passport.twitch.tv",
+]
+
+
+class Driver_Pool:
+    """Keeps launched browsers warm so the next user account can skip Chrome startup.
+
+    Browsers are reset between user accounts by clearing cookies and storage,
+    a browser is quit and replaced once it has been used max_uses times.
+
+    Attributes:
+        headless : bool - Are the pooled browsers headless
+        size : int - Number of warm browsers to keep ready
+        max_uses : int - Number of user accounts a browser is used for before being replaced
+        _launcher : callable - Launches a new webdriver given headless
+        _idle : list - Warm webdrivers ready to be handed out
+        _uses : dir - Number of times each pooled webdriver has been handed out
+        _reset_seconds : dir - How long each idle webdriver took to reset
+        _lock : Lock - Use when changing the pool
+        _stats : dir - Launch and reuse counts and total seconds
+        _closed : bool - Has the pool been closed
+    """
+
+    def __init__(
+        self,
+        headless: bool,
+        size: int = 1,
+        max_uses: int = 10,
+        launcher: callable = chrome.launch,
+    ) -> None:
+        if size < 0 or max_uses < 1:
+            raise ValueError("[!!] size must be above 0 and max_uses above 1")
+
+        self.headless = headless
+        self.size = size
+        self.max_uses = max_uses
+        self._launcher = launcher
+        self._idle = []
+        self._uses = {}
+        self._reset_seconds = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "launches": 0,
+            "launch seconds": 0.0,
+            "reuses": 0,
+            "reuse seconds": 0.0,
+        }
+        self._closed = False
+
+    def warm(self, wait: bool = False) -> None:
+        """Launch browsers in the background until size are ready.
+
+        Args:
+            wait : bool - Block until the browsers are launched
+        """
+        with self._lock:
+            needed = self.size - len(self._idle)
+
+        launchers = []
+        for _ in range(needed):
+            t = threading.Thread(target=self._warm_one)
+            t.daemon = True
+            t.start()
+            launchers.append(t)
+
+        if wait:
+            for t in launchers:
+                t.join()
+
+    def acquire(self):
+        """Get a webdriver, warm if one is ready otherwise newly launched.
+
+        Returns:
+            A webdriver on about:blank with no cookies.
+        """
+        start = time.time()
+
+        with self._lock:
+            driver = self._idle.pop() if self._idle else None
+
+            if driver != None:
+                self._uses[driver] += 1
+                self._stats["reuses"] += 1
+                self._stats["reuse seconds"] += (
+                    self._reset_seconds.pop(driver, 0.0) + time.time() - start
+                )
+                return driver
+
+        driver = self._launch()
+
+        with self._lock:
+            self._uses[driver] = 1
+        return driver
+
+    def release(self, driver) -> None:
+        """Return a webdriver to the pool.
+
+        The webdriver is reset for the next user account or quit if it is worn out or broken.
+        """
+        with self._lock:
+            uses = self._uses.get(driver)
+            keep = (
+                not self._closed
+                and uses != None
+                and uses < self.max_uses
+                and len(self._idle) < self.size
+            )
+
+            if not keep:
+                self._uses.pop(driver, None)
+
+        if keep:
+            start = time.time()
+
+            try:
+                self._reset(driver)
+            except WebDriverException:
+                keep = False
+            else:
+                with self._lock:
+                    self._reset_seconds[driver] = time.time() - start
+                    self._idle.append(driver)
+
+        if not keep:
+            with self._lock:
+                self._uses.pop(driver, None)
+
+            self._quit(driver)
+
+            # Replace worn out browsers
+            if uses != None and not self._closed:
+                self.warm()
+
+    def close(self) -> None:
+        """Quit all idle webdrivers, handed out webdrivers are quit once released."""
+        with self._lock:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+
+            for driver in idle:
+                self._uses.pop(driver, None)
+                self._reset_seconds.pop(driver, None)
+
+        for driver in idle:
+            self._quit(driver)
+
+    def stats(self) -> dir:
+        """Get launch and reuse counts and average seconds.
+
+        Reuse time includes resetting the browser so can be compared to launch time directly.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats["average launch seconds"] = (
+            stats["launch seconds"] / stats["launches"] if stats["launches"] else 0.0
+        )
+        stats["average reuse seconds"] = (
+            stats["reuse seconds"] / stats["reuses"] if stats["reuses"] else 0.0
+        )
+        stats["seconds saved"] = stats["reuses"] * (
+            stats["average launch seconds"] - stats["average reuse seconds"]
+        )
+        return stats
+
+    def report(self) -> str:
+        """Human readable summary of stats."""
+        stats = self.stats()
+        return "Launched %d (avg %.2fs), reused %d (avg %.2fs), saved ~%.1fs" % (
+            stats["launches"],
+            stats["average launch seconds"],
+            stats["reuses"],
+            stats["average reuse seconds"],
+            stats["seconds saved"],
+        )
+
+    def _warm_one(self) -> None:
+        """Launch a browser straight into the idle list."""
+        try:
+            driver = self._launch()
+        except (EnvironmentError, WebDriverException):
+            log.write(_logger, "[!] Could not warm browser.")
+            return
+
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._uses[driver] = 0
+                self._idle.append(driver)
+                return
+
+        self._quit(driver)
+
+    def _launch(self):
+        """Launch a new webdriver and record how long it took."""
+        start = time.time()
+        driver = self._launcher(self.headless)
+
+        with self._lock:
+            self._stats["launches"] += 1
+            self._stats["launch seconds"] += time.time() - start
+
+        return driver
+
+    @staticmethod
+    def _reset(driver) -> None:
+        """Remove all trace of the last user account, the http cache is kept warm."""
+        handles = driver.window_handles
+
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+
+        # Storage can only be cleared through devtools without loading each origin
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+
+            for origin in _ORIGINS:
+                driver.execute_cdp_cmd(
+                    "Storage.clearDataForOrigin",
+                    {"origin": origin, "storageTypes": "all"},
+                )
+        except AttributeError:
+            driver.execute_script(
+                "window.localStorage.clear(); window.sessionStorage.clear();"
+            )
+
+        driver.get("about:blank")
+
+    @staticmethod
+    def _quit(driver) -> None:
+        """Quit a webdriver which may already be broken."""
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
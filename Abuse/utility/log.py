@@ -0,0 +1,206 @@
+# Status lines of every component, written off the calling thread by one background writer
+import atexit
+from datetime import datetime
+import json
+import logging
+from logging import handlers
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from os import path
+
+DIRECTORY = path.join(
+    path.dirname(path.realpath(__file__)), "..", "resources", "logs"
+)  # Where JSON lines logs are written, None to only write to the console
+LEVEL = "INFO"  # Level of every component not in LEVELS
+LEVELS = {}  # Component to level, e.g. {"twitch.Inventory": "WARNING", "discovery": "DEBUG"}
+CONSOLE = True  # Should status lines also be written to the console
+MAX_BYTES = 10 * 1024 * 1024  # Size a log file is rotated at
+BACKUPS = 5  # No. of rotated log files kept
+
+# Status line prefixes to levels
+_PREFIXES = {
+    "[*]": logging.INFO,
+    "[+]": logging.INFO,
+    "<<": logging.INFO,
+    "[!]": logging.WARNING,
+    "[!!]": logging.ERROR,
+}
+_PREFIX = re.compile(r"^(\[\*\]|\[\+\]|\[!!\]|\[!\]|<<)\s*")
+
+_handler = handlers.QueueHandler(queue.SimpleQueue())
+_root = logging.getLogger("drops")
+_root.propagate = False
+_root.addHandler(_handler)
+_listener = None
+_pid = None  # Process the writer was started in, a forked worker must start its own
+_lock = threading.Lock()
+
+
+class Json_Formatter(logging.Formatter):
+    """One JSON object per line with time, level, account, component, event, duration and message."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = dict(getattr(record, "structured", {}))
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "component": _component(record),
+            "account": fields.pop("account", None),
+            "event": fields.pop("event", None),
+            "message": _PREFIX.sub("", record.getMessage()),
+            "thread": record.threadName,
+        }
+
+        if fields.get("duration") == None:
+            fields.pop("duration", None)
+        data.update(fields)
+
+        return json.dumps(data, default=str)
+
+
+class Console_Formatter(logging.Formatter):
+    """The status line as it was always printed, "account - time - message" for pages."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        account = getattr(record, "structured", {}).get("account")
+
+        if account == None:
+            return record.getMessage()
+
+        return "%s - %s - %s" % (
+            account,
+            datetime.fromtimestamp(record.created).strftime("%H:%M:%S"),
+            record.getMessage(),
+        )
+
+
+def _component(record: logging.LogRecord) -> str:
+    return record.name[len("drops.") :] if record.name.startswith("drops.") else record.name
+
+
+def _file_name() -> str:
+    """Each process writes its own file, rotating one file from several processes loses lines."""
+    process = multiprocessing.current_process().name
+    return "drops.jsonl" if process == "MainProcess" else "drops-%s.jsonl" % process
+
+
+def setup(
+    directory: str = DIRECTORY,
+    level: str = LEVEL,
+    levels: dir = LEVELS,
+    console: bool = CONSOLE,
+    max_bytes: int = MAX_BYTES,
+    backups: int = BACKUPS,
+) -> None:
+    """Start the background writer, replacing the one already running.
+
+    Args:
+        directory : str - Where the JSON lines file is written, None to not write one
+        level : str - Level of every component not in levels
+        levels : dir - Component to level
+        console : bool - Should status lines also be written to the console
+        max_bytes : int - Size a log file is rotated at
+        backups : int - No. of rotated log files kept
+    """
+    global _listener, _pid
+
+    outputs = []
+    if directory != None:
+        os.makedirs(directory, exist_ok=True)
+        output = handlers.RotatingFileHandler(
+            path.join(directory, _file_name()),
+            maxBytes=max_bytes,
+            backupCount=backups,
+            encoding="utf-8",
+        )
+        output.setFormatter(Json_Formatter())
+        outputs.append(output)
+
+    if console:
+        output = logging.StreamHandler()
+        output.setFormatter(Console_Formatter())
+        outputs.append(output)
+
+    _root.setLevel(level)
+    for component, component_level in levels.items():
+        get(component).setLevel(component_level)
+
+    with _lock:
+        if _listener != None and _pid == os.getpid():
+            _listener.stop()
+            for output in _listener.handlers:
+                output.close()
+        elif _listener != None:
+            # The parent's writer thread was not forked, start again with an empty queue
+            _handler.queue = queue.SimpleQueue()
+
+        _listener = handlers.QueueListener(
+            _handler.queue, *outputs, respect_handler_level=True
+        )
+        _listener.start()
+        _pid = os.getpid()
+
+
+def flush() -> None:
+    """Wait until everything queued so far is written."""
+    with _lock:
+        if _listener != None and _pid == os.getpid():
+            _listener.stop()
+            _listener.start()
+
+
+def shutdown() -> None:
+    """Write everything queued then stop the background writer."""
+    global _listener
+
+    with _lock:
+        if _listener != None and _pid == os.getpid():
+            _listener.stop()
+            for output in _listener.handlers:
+                output.close()
+        _listener = None
+
+
+def get(component: str) -> logging.Logger:
+    """Logger of a component, e.g. "twitch.Stream"."""
+    return logging.getLogger("drops." + component)
+
+
+def write(
+    logger: logging.Logger,
+    message: str,
+    account: str = None,
+    event: str = None,
+    duration: float = None,
+    **fields
+) -> None:
+    """Log a status line, its level comes from the [*], [+], [!] or [!!] prefix.
+
+    Args:
+        logger : Logger - The component's logger
+        message : str - Status line
+        account : str - Username the line is about, None if not about one
+        event : str - Name to filter on, defaults to the message's words up to any colon
+        duration : float - Seconds the work took, None if not timed
+        fields - Extra attributes for the JSON line
+    """
+    found = _PREFIX.match(message)
+    level = _PREFIXES[found.group(1)] if found else logging.INFO
+
+    if not logger.isEnabledFor(level):
+        return
+
+    if event == None:
+        text = _PREFIX.sub("", message).split(":")[0]
+        event = "_".join(re.findall(r"[a-z]+", text.lower())) or None
+
+    fields.update(account=account, event=event, duration=duration)
+    logger.log(level, message, extra={"structured": fields})
+
+
+# Console only until setup, so lines are never lost before main configures logging
+setup(directory=None)
+atexit.register(shutdown)
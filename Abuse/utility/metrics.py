@@ -0,0 +1,392 @@
+# Counters, gauges and latency histograms for where the time goes
+import bisect
+import contextlib
+import http.server
+import json
+import os
+import threading
+import time
+from utility import log
+
+_logger = log.get("utility.metrics")
+
+# Upper bounds in seconds, from element lookups up to browser launches and logins
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_text(names: tuple, values: tuple) -> str:
+    """Prometheus label set, empty if there are no labels."""
+    if not names:
+        return ""
+
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append('%s="%s"' % (name, value))
+
+    return "{%s}" % ",".join(pairs)
+
+
+class Metric:
+    """Values of one metric for each combination of labels.
+
+    Attributes:
+        name : str - Prometheus name
+        help : str - What is measured
+        labels : tuple - Label names every value is given
+        kind : str - Prometheus type
+        _values : dir - Label values to the value
+        _lock : Lock - Use when changing values
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: list = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> list:
+        """Copy of every value as (label values, value)."""
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in self._values.items()]
+
+    def render(self) -> list:
+        """Prometheus text lines."""
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+        for key, value in sorted(self.samples()):
+            lines.append("%s%s %s" % (self.name, _label_text(self.labels, key), value))
+        return lines
+
+    def snapshot(self) -> dir:
+        """JSON friendly copy of the metric."""
+        return {
+            "type": self.kind,
+            "help": self.help,
+            "samples": [
+                {"labels": dict(zip(self.labels, key)), "value": value}
+                for key, value in self.samples()
+            ],
+        }
+
+    def _key(self, labels: dir) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                "[!!] %s needs labels %s, got %s" % (self.name, self.labels, tuple(labels))
+            )
+
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(Metric):
+    """Only goes up, e.g. lookups that timed out."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("[!!] Counters only go up")
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Goes up and down, e.g. pages running."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Counts observations into buckets, e.g. seconds to launch a browser.
+
+    Attributes:
+        buckets : tuple - Upper bounds, each observation is counted in the first it fits
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: list = (), buckets: tuple = BUCKETS
+    ) -> None:
+        Metric.__init__(self, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+
+            entry = self._values[key]
+            entry["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the with block."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def render(self) -> list:
+        """See base class, buckets are cumulative."""
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+        names = self.labels + ("le",)
+
+        for key, entry in sorted(self.samples(), key=lambda sample: sample[0]):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), entry["counts"]):
+                total += count
+                lines.append(
+                    "%s_bucket%s %d" % (self.name, _label_text(names, key + (bound,)), total)
+                )
+
+            lines.append("%s_sum%s %s" % (self.name, _label_text(self.labels, key), entry["sum"]))
+            lines.append("%s_count%s %d" % (self.name, _label_text(self.labels, key), entry["count"]))
+
+        return lines
+
+    def snapshot(self) -> dir:
+        """See base class, buckets are per bound rather than cumulative."""
+        snapshot = Metric.snapshot(self)
+        for sample in snapshot["samples"]:
+            entry = sample["value"]
+            sample["value"] = {
+                "count": entry["count"],
+                "sum": entry["sum"],
+                "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], entry["counts"])),
+            }
+        return snapshot
+
+    @staticmethod
+    def _copy(value):
+        return {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+
+
+class Registry:
+    """Every metric, each name is registered once and shared by whoever asks for it.
+
+    Attributes:
+        _metrics : dir - Name to metric in registration order
+        _lock : Lock - Use when registering
+    """
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: list = ()) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: list = ()) -> Gauge:
+        return self._register(Gauge, name, help, labels)
+
+    def histogram(
+        self, name: str, help: str, labels: list = (), buckets: tuple = BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        return "".join(line + "\n" for metric in metrics for line in metric.render())
+
+    def snapshot(self) -> dir:
+        """Every metric as JSON friendly dirs."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def dump(self, file: str) -> None:
+        """Write a snapshot to a JSON file, replaced in one go so readers never see half a dump."""
+        data = {"time": time.time(), "metrics": self.snapshot()}
+
+        with open(file + ".tmp", "w") as temporary:
+            json.dump(data, temporary, indent=1)
+        os.replace(file + ".tmp", file)
+
+    def _register(self, kind: type, name: str, help: str, labels: list, *args) -> Metric:
+        """Get the metric with the name, creating it the first time.
+
+        Raises:
+            ValueError - The name is already used by a different kind of metric or labels
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+
+            if metric == None:
+                metric = kind(name, help, labels, *args)
+                self._metrics[name] = metric
+            elif type(metric) != kind or metric.labels != tuple(labels):
+                raise ValueError("[!!] %s is already registered differently" % name)
+
+            return metric
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        raw = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+def worker_settings(port: int, file: str, worker: int) -> tuple:
+    """Port and dump file for one of several worker processes, so they do not clash.
+
+    Worker n serves on port + n and dumps to the file with -n before its extension.
+
+    Returns:
+        (port or None, file or None)
+    """
+    if port != None and port != 0:
+        port += worker
+
+    if file != None:
+        root, extension = os.path.splitext(file)
+        file = "%s-%d%s" % (root, worker, extension)
+
+    return port, file
+
+
+class Exporter:
+    """Serves metrics for Prometheus on localhost and dumps them to a JSON file periodically.
+
+    Attributes:
+        registry : Registry - Metrics exported
+        port : int - Port metrics are served on, None if not serving, 0 picks a free port
+        file : str - JSON file metrics are dumped to, None if not dumping
+        interval : float - Seconds between dumps
+        _server : ThreadingHTTPServer - Serves the metrics, None until started
+        _stop : Event - Set to stop dumping
+        _threads : list - Serving and dumping threads
+    """
+
+    def __init__(
+        self,
+        registry: Registry,
+        port: int = None,
+        file: str = None,
+        interval: float = 60,
+        host: str = "127.0.0.1",
+    ) -> None:
+        self.registry = registry
+        self.port = port
+        self.file = file
+        self.interval = interval
+        self._host = host
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        """Start serving and dumping in the background, a port already in use is only logged."""
+        if self.port != None:
+            try:
+                self._server = http.server.ThreadingHTTPServer(
+                    (self._host, self.port), _Handler
+                )
+            except OSError as error:
+                log.write(_logger, "[!] Metrics not served on port %d: %s" % (self.port, error))
+                self.port = None
+
+        if self._server != None:
+            self._server.daemon_threads = True
+            self._server.registry = self.registry
+            self.port = self._server.server_address[1]
+            self._threads.append(
+                threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+            )
+            log.write(
+                _logger, "[*] Metrics on http://%s:%d/metrics" % (self._host, self.port)
+            )
+
+        if self.file != None:
+            self._threads.append(threading.Thread(target=self._dump, name="metrics dump", daemon=True))
+
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        """Stop serving, dumping one last time."""
+        self._stop.set()
+
+        if self._server != None:
+            self._server.shutdown()
+            self._server.server_close()
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self.file != None:
+            self.registry.dump(self.file)
+
+    def _dump(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.dump(self.file)
+            except OSError as error:
+                log.write(_logger, "[!] Metrics not dumped: %s" % error)
+
+
+registry = Registry()  # Shared by everything measured
+
+# Shared by both page backends and the asyncio runtime
+PAGE_STEP_SECONDS = registry.histogram(
+    "page_step_seconds", "Seconds each step of a page took", ["page"]
+)
+PAGES_RUNNING = registry.gauge(
+    "pages_running", "Pages between setup and finish", ["page"]
+)
+FIND_STREAM_SECONDS = registry.histogram(
+    "twitch_find_stream_seconds", "Seconds to find a new stream", ["backend", "result"]
+)
+INVENTORY_REFRESH_SECONDS = registry.histogram(
+    "twitch_inventory_refresh_seconds", "Seconds to reload the inventory", ["backend", "result"]
+)
+
+
+def page_kind(page) -> str:
+    """Label for a page, its backend module and class, e.g. twitch.Stream."""
+    return "%s.%s" % (type(page).__module__, type(page).__name__)
@@ -0,0 +1,153 @@
+# Persistent Chrome profiles per user account, so restarts reuse the login, http cache and storage
+import os
+import shutil
+import threading
+from os import path
+from utility import log
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_logger = log.get("utility.profiles")
+
+ENABLED = False  # Launch each user account's browser with its own profile instead of injecting cookies
+MAX_MB = 500  # Profiles above this have their caches cleared before launching, then are wiped
+CACHE_MB = 200  # Most Chrome keeps in a profile's http cache
+
+# Safe to remove whilst Chrome is not running, relative to the profile
+CACHE_DIRS = [
+    path.join("Default", "Cache"),
+    path.join("Default", "Code Cache"),
+    path.join("Default", "GPUCache"),
+    path.join("Default", "Service Worker", "CacheStorage"),
+    path.join("Default", "Service Worker", "ScriptCache"),
+    "GrShaderCache",
+    "ShaderCache",
+]
+
+
+def size(directory: str) -> int:
+    """Bytes used by all files under a directory, 0 if it does not exist."""
+    total = 0
+
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += path.getsize(path.join(root, name))
+            except OSError:
+                pass  # Removed whilst walking
+
+    return total
+
+
+class Profile_Store:
+    """Hands out one Chrome user data directory per user account.
+
+    A profile can only be used by one browser at a time, a lock file beside it is held
+    whilst the browser runs so other pages and processes fall back to cookie injection
+    instead of corrupting it. The operating system drops the lock if the process dies.
+
+    Attributes:
+        directory : str - Where profiles are kept, one folder and lock file per username
+        max_bytes : int - Size a profile is trimmed below before launching
+        _held : dir - Username to the open lock file of each profile in use by this process
+        _lock : Lock - Use when changing held
+    """
+
+    def __init__(
+        self,
+        directory: str = path.join(
+            path.dirname(path.realpath(__file__)), "..", "resources", "profiles"
+        ),
+        max_bytes: int = MAX_MB * 1024 * 1024,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def path(self, username: str) -> str:
+        return path.join(self.directory, username)
+
+    def acquire(self, username: str) -> str:
+        """Lock a user account's profile for a browser, trimming it first.
+
+        Returns:
+            The profile directory, None if another browser is using it.
+        """
+        with self._lock:
+            if username in self._held:
+                return None
+
+            os.makedirs(self.directory, exist_ok=True)
+            file = open(path.join(self.directory, username + ".lock"), "a+")
+
+            try:
+                if fcntl != None:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                file.close()
+                return None
+
+            self._held[username] = file
+
+        self.trim(username)
+        return self.path(username)
+
+    def release(self, username: str) -> None:
+        """Unlock a profile once its browser has quit."""
+        with self._lock:
+            file = self._held.pop(username, None)
+
+        if file == None:
+            return
+
+        try:
+            if fcntl != None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            file.close()
+
+    def trim(self, username: str) -> int:
+        """Keep a locked profile under max_bytes, clearing caches then the whole profile.
+
+        A wiped profile is logged in again from the account's cookies.
+
+        Returns:
+            Bytes the profile uses afterwards.
+        """
+        profile = self.path(username)
+        used = size(profile)
+        if used <= self.max_bytes:
+            return used
+
+        for cache in CACHE_DIRS:
+            shutil.rmtree(path.join(profile, cache), ignore_errors=True)
+
+        cleared = size(profile)
+        log.write(
+            _logger,
+            "[*] Profile caches cleared, %.0fMB to %.0fMB."
+            % (used / 1024 / 1024, cleared / 1024 / 1024),
+            username,
+        )
+        if cleared <= self.max_bytes:
+            return cleared
+
+        shutil.rmtree(profile, ignore_errors=True)
+        log.write(_logger, "[!] Profile still too large, wiped.", username)
+        return size(profile)
+
+
+profiles = Profile_Store()  # Shared by every page
@@ -0,0 +1,105 @@
+# Predicts when drops will be earned
+import collections
+import threading
+import time
+
+
+class Progress_Tracker:
+    """Keeps a short history of each drop's progress to schedule the next inventory check.
+
+    The next check is just after the soonest predicted completion,
+    bounded so drops far away are not checked often and sudden progress is not missed for long.
+
+    Attributes:
+        minimum : float - Fewest seconds between checks
+        maximum : float - Most seconds between checks
+        default : float - Seconds between checks when no completion can be predicted
+        slack : float - Seconds after the predicted completion to check
+        _history : dir - Drop name to recent (time, percent) samples
+        _lock : Lock - Use when changing the history
+    """
+
+    def __init__(
+        self,
+        minimum: float = 60,
+        maximum: float = 1800,
+        default: float = 600,
+        slack: float = 30,
+        samples: int = 5,
+    ) -> None:
+        if not 0 <= minimum <= default <= maximum:
+            raise ValueError("[!!] Must have 0 <= minimum <= default <= maximum")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.default = default
+        self.slack = slack
+        self._samples = samples
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def update(self, progress: dir, when: float = None) -> None:
+        """Record the progress of every drop in progress.
+
+        Drops not included are forgotten as they have been claimed or have ended.
+
+        Args:
+            progress : dir - Drop name to percent complete
+            when : float - Time of the reading, defaults to now
+        """
+        when = time.time() if when == None else when
+
+        with self._lock:
+            for name in list(self._history):
+                if name not in progress:
+                    del self._history[name]
+
+            for name, percent in progress.items():
+                if name not in self._history:
+                    self._history[name] = collections.deque(maxlen=self._samples)
+
+                # Progress going backwards means a new drop has the same name
+                history = self._history[name]
+                if history and percent < history[-1][1]:
+                    history.clear()
+
+                history.append((when, percent))
+
+    def eta(self, name: str, now: float = None) -> float:
+        """Predict seconds until a drop is complete.
+
+        Returns:
+            The seconds or None if it cannot be predicted yet.
+        """
+        now = time.time() if now == None else now
+
+        with self._lock:
+            history = list(self._history.get(name, []))
+
+        if len(history) < 2:
+            return None
+
+        (first_time, first_percent), (last_time, last_percent) = history[0], history[-1]
+
+        if last_percent >= 100:
+            return 0.0
+
+        if last_time <= first_time or last_percent <= first_percent:
+            return None
+
+        rate = (last_percent - first_percent) / (last_time - first_time)
+        return max(0.0, (100 - last_percent) / rate - (now - last_time))
+
+    def next_check(self, now: float = None) -> float:
+        """Seconds to wait before checking the inventory again."""
+        now = time.time() if now == None else now
+
+        with self._lock:
+            names = list(self._history)
+
+        etas = [eta for eta in (self.eta(name, now) for name in names) if eta != None]
+
+        if not etas:
+            return self.default
+
+        return min(self.maximum, max(self.minimum, min(etas) + self.slack))
@@ -0,0 +1,276 @@
+# Shared limit on how fast Twitch is interacted with
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+HOST = "twitch.tv"  # Host every browser interaction and page load counts against
+GQL_HOST = "gql.twitch.tv"  # GraphQL queries of the http backends
+SPADE_HOST = "spade"  # Minute-watched heartbeats, sent to whichever url the channel page gives
+
+# Interactions per second and at once for hosts not limited by host_rate and host_burst,
+# heartbeats are one a minute per account so need far more than page loads
+HOSTS = {GQL_HOST: (20, 40), SPADE_HOST: (50, 100)}
+
+# Lower is served first when waiting for the host
+PRIORITIES = {"login": 0, "navigation": 1, "health": 2}
+
+
+class Token_Bucket:
+    """Allows rate actions per second on average with bursts of up to capacity.
+
+    Not thread safe, used under the Rate_Limiter's lock.
+
+    Attributes:
+        rate : float - Tokens added per second
+        capacity : float - Most tokens held
+        tokens : float - Tokens available, negative when reserved ahead
+        _updated : float - Monotonic time tokens were last added
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        if rate <= 0 or capacity < 1:
+            raise ValueError("[!!] rate must be above 0 and capacity at least 1")
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token if there is one.
+
+        Returns:
+            0 if taken, otherwise the seconds until one is available.
+        """
+        self.refill(now)
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """Take a token even if it is not there yet.
+
+        Returns:
+            The seconds until the reserved token is available.
+        """
+        self.refill(now)
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class Rate_Limiter:
+    """Thread safe and asyncio capable limit on interactions, shared by every page.
+
+    Each account is paced by its own bucket (with jitter so accounts do not act in lockstep),
+    then every interaction waits for the host's bucket, waiters are let through by priority
+    so logins are not stuck behind a queue of health checks.
+
+    Attributes:
+        host_rate : float - Interactions per second allowed per host
+        host_burst : float - Interactions allowed at once per host
+        account_rate : float - Interactions per second allowed per account
+        account_burst : float - Interactions allowed at once per account
+        jitter : float - Most extra random wait, as a fraction of an account's interval
+        hosts : dict - Host to its own (rate, burst), others use host_rate and host_burst
+        _hosts : dir - Host to Token_Bucket
+        _accounts : dir - Account to Token_Bucket
+        _waiting : dir - Host to heap of (priority, order) waiting for it
+        _order : count - Keeps waiters of the same priority first come first served
+        _condition : Condition - Use when changing buckets or waiters, notified when one is let through
+        _stats : dir - Priority to count, seconds waited and most seconds waited
+    """
+
+    def __init__(
+        self,
+        host_rate: float = 1,
+        host_burst: float = 5,
+        account_rate: float = 0.5,
+        account_burst: float = 1,
+        jitter: float = 0.25,
+        hosts: dict = None,
+    ) -> None:
+        if jitter < 0:
+            raise ValueError("[!!] jitter must be above 0")
+
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.jitter = jitter
+        self.hosts = dict(HOSTS if hosts == None else hosts)
+        self._hosts = {}
+        self._accounts = {}
+        self._waiting = {}
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {
+            priority: {"count": 0, "seconds": 0.0, "max seconds": 0.0}
+            for priority in PRIORITIES
+        }
+
+    def acquire(
+        self, account: str = None, host: str = HOST, priority: str = "navigation"
+    ) -> float:
+        """Wait until an interaction is allowed, only the calling thread sleeps.
+
+        Args:
+            account : str - Account interacting, None to only limit by host
+            host : str - Host being interacted with
+            priority : str - One of PRIORITIES
+
+        Returns:
+            Seconds waited.
+        """
+        start = time.monotonic()
+        time.sleep(self._pace(account))
+
+        ticket = self._enqueue(host, priority)
+        with self._condition:
+            while (wait := self._admit(host, ticket)) != 0:
+                self._condition.wait(wait)
+
+        return self._record(priority, start)
+
+    async def acquire_async(
+        self, account: str = None, host: str = HOST, priority: str = "navigation"
+    ) -> float:
+        """Same as acquire but sleeps the task not the thread."""
+        start = time.monotonic()
+        await asyncio.sleep(self._pace(account))
+
+        ticket = self._enqueue(host, priority)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._admit(host, ticket)
+
+                if wait == 0:
+                    break
+
+                # Cannot wait on the condition without blocking the loop, poll instead
+                await asyncio.sleep(min(wait, 0.05) if wait != None else 0.05)
+        except asyncio.CancelledError:
+            self._dequeue(host, ticket)
+            raise
+
+        return self._record(priority, start)
+
+    def share(self, processes: int) -> None:
+        """Split the host budget evenly with other processes, each has its own limiter.
+
+        Args:
+            processes : int - No. of processes sharing the host, including this one
+        """
+        if processes < 1:
+            raise ValueError("[!!] processes must be at least 1")
+
+        with self._condition:
+            self.host_rate /= processes
+            self.host_burst = max(1, self.host_burst / processes)
+            self.hosts = {
+                host: (rate / processes, max(1, burst / processes))
+                for host, (rate, burst) in self.hosts.items()
+            }
+            self._hosts = {}
+
+    def stats(self) -> dir:
+        """Copy of the wait stats for each priority."""
+        with self._condition:
+            stats = {priority: dict(stats) for priority, stats in self._stats.items()}
+
+        for priority in stats.values():
+            priority["average seconds"] = (
+                priority["seconds"] / priority["count"] if priority["count"] else 0.0
+            )
+
+        return stats
+
+    def report(self) -> str:
+        """Human readable summary of stats."""
+        return ", ".join(
+            "%s %d (avg %.2fs, max %.2fs)"
+            % (priority, stats["count"], stats["average seconds"], stats["max seconds"])
+            for priority, stats in self.stats().items()
+        )
+
+    def _pace(self, account: str) -> float:
+        """Reserve the account's next interaction, returns the seconds to wait for it."""
+        if account == None:
+            return 0.0
+
+        with self._condition:
+            if account not in self._accounts:
+                self._accounts[account] = Token_Bucket(
+                    self.account_rate, self.account_burst
+                )
+            wait = self._accounts[account].reserve(time.monotonic())
+
+        if wait == 0:
+            return 0.0
+
+        return wait + random.uniform(0, self.jitter / self.account_rate)
+
+    def _enqueue(self, host: str, priority: str) -> tuple:
+        if priority not in PRIORITIES:
+            raise ValueError("[!!] Unknown priority %s" % priority)
+
+        ticket = (PRIORITIES[priority], next(self._order))
+
+        with self._condition:
+            heapq.heappush(self._waiting.setdefault(host, []), ticket)
+
+        return ticket
+
+    def _dequeue(self, host: str, ticket: tuple) -> None:
+        with self._condition:
+            waiting = self._waiting[host]
+            if ticket in waiting:
+                waiting.remove(ticket)
+                heapq.heapify(waiting)
+                self._condition.notify_all()
+
+    def _admit(self, host: str, ticket: tuple) -> float:
+        """Let a waiter through if it is first in line and the host has a token, must hold the condition.
+
+        Returns:
+            0 if let through, the seconds until a token is available if first in line, otherwise None.
+        """
+        waiting = self._waiting[host]
+        if waiting[0] != ticket:
+            return None
+
+        if host not in self._hosts:
+            self._hosts[host] = Token_Bucket(
+                *self.hosts.get(host, (self.host_rate, self.host_burst))
+            )
+
+        wait = self._hosts[host].take(time.monotonic())
+        if wait == 0:
+            heapq.heappop(waiting)
+            self._condition.notify_all()
+
+        return wait
+
+    def _record(self, priority: str, start: float) -> float:
+        waited = time.monotonic() - start
+
+        with self._condition:
+            stats = self._stats[priority]
+            stats["count"] += 1
+            stats["seconds"] += waited
+            stats["max seconds"] = max(stats["max seconds"], waited)
+
+        return waited
+
+
+limiter = Rate_Limiter()  # Shared by all Twitch pages in this process, supervisor workers split its host budget
@@ -0,0 +1,121 @@
+# Remembers which channels were good to watch
+import collections
+import json
+import os
+import tempfile
+import threading
+from os import path
+from utility import log
+
+_logger = log.get("utility.reputation")
+
+
+class Reputation_Store:
+    """Recent watch sessions of each channel, used to rank channels by how stable they are.
+
+    A session is bad if the channel went offline or stopped dropping within the grace period,
+    stability is the share of good sessions with one good and one bad session assumed
+    so unknown channels sit in the middle.
+
+    Attributes:
+        grace : float - Seconds a channel must last for a failure not to count against it
+        samples : int - Number of recent sessions kept per channel
+        _sessions : dir - Channel login to recent sessions as [seconds watched, failed]
+        _file : str - Where sessions are saved
+        _lock : Lock - Use when changing sessions
+        _changed : bool - Are there unsaved sessions
+    """
+
+    def __init__(
+        self,
+        file: str = path.join(
+            path.dirname(path.realpath(__file__)),
+            "..",
+            "resources",
+            "channel_reputation.json",
+        ),
+        grace: float = 1800,
+        samples: int = 20,
+    ) -> None:
+        self.grace = grace
+        self.samples = samples
+        self._sessions = {}
+        self._file = file
+        self._lock = threading.Lock()
+        self._changed = False
+
+    def record(self, login: str, seconds: float, failed: bool) -> None:
+        """Record a finished watch session.
+
+        Args:
+            login : str - Channel watched
+            seconds : float - How long it was watched
+            failed : bool - Did it end because the channel went offline or stopped dropping
+        """
+        with self._lock:
+            if login not in self._sessions:
+                self._sessions[login] = collections.deque(maxlen=self.samples)
+
+            self._sessions[login].append([seconds, failed])
+            self._changed = True
+
+    def stability(self, login: str) -> float:
+        """Share of recent sessions that were good, 0 - 1."""
+        with self._lock:
+            sessions = list(self._sessions.get(login, []))
+
+        good = sum(
+            1 for seconds, failed in sessions if not failed or seconds >= self.grace
+        )
+        return (good + 1) / (len(sessions) + 2)
+
+    def load(self) -> None:
+        """Load saved sessions, nothing is known if never saved or the file is unreadable."""
+        if not path.isfile(self._file):
+            return
+
+        try:
+            with open(self._file, "r") as file:
+                data = json.load(file)
+
+            sessions = {
+                login: collections.deque(sessions, maxlen=self.samples)
+                for login, sessions in data.items()
+            }
+        except (OSError, ValueError, AttributeError, TypeError) as error:
+            log.write(
+                _logger, "[!] Channel reputations not loaded, starting fresh: %s" % error
+            )
+            return
+
+        with self._lock:
+            self._sessions = sessions
+            self._changed = False
+
+    def save(self) -> None:
+        """Save sessions if they have changed.
+
+        Replaced in one go, streams and worker processes save the same file.
+        """
+        with self._lock:
+            if not self._changed:
+                return
+
+            data = {login: list(sessions) for login, sessions in self._sessions.items()}
+
+            folder = path.dirname(path.abspath(self._file))
+            os.makedirs(folder, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=folder, suffix=".tmp")
+
+            try:
+                with os.fdopen(descriptor, "w") as file:
+                    json.dump(data, file)
+                os.replace(temporary, self._file)
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+            self._changed = False
+
+
+reputations = Reputation_Store()  # Shared by all streams
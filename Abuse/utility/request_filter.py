@@ -0,0 +1,194 @@
+# Blocks requests Twitch pages do not need through the Chrome DevTools Protocol
+import fnmatch
+import json
+import threading
+from selenium.common.exceptions import WebDriverException
+from utility import log
+
+_logger = log.get("utility.request_filter")
+
+ENABLED = False  # Block ads, images, fonts and chat on Twitch pages to save bandwidth and memory
+
+# Never needed on any page
+_COMMON = [
+    # Ads and tracking
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*googletagservices.com*",
+    "*google-analytics.com*",
+    "*amazon-adsystem.com*",
+    "*imasdk.googleapis.com*",
+    "*scorecardresearch.com*",
+    "*comscore.com*",
+    "*branch.io*",
+    "*sentry.io*",
+    "*countess.twitch.tv*",
+    "*cdn.segment.com*",
+    "*ads.twitch.tv*",
+    # Fonts
+    "*.woff*",
+    "*.ttf*",
+    # Images
+    "*static-cdn.jtvnw.net/jtv_user_pictures/*",
+    "*static-cdn.jtvnw.net/ttv-boxart/*",
+    "*static-cdn.jtvnw.net/previews-ttv/*",
+    "*static-cdn.jtvnw.net/cf_vods/*",
+    "*static-cdn.jtvnw.net/user-default-pictures*",
+]
+
+# Chat, collapsed anyway unless chat is on
+_CHAT = [
+    "wss://irc-ws.chat.twitch.tv*",
+    "*static-cdn.jtvnw.net/emoticons/*",
+    "*static-cdn.jtvnw.net/badges/*",
+    "*cdn.betterttv.net*",
+    "*cdn.frankerfacez.com*",
+]
+
+# Recommendations and extensions
+_EXTENSIONS = [
+    "*extension-files.twitch.tv*",
+    "*ext-twitch.tv*",
+]
+
+# Profile name to url patterns blocked with Network.setBlockedURLs ("*" is a wildcard)
+PROFILES = {
+    "directory": _COMMON,
+    "inventory": _COMMON
+    + [
+        "*static-cdn.jtvnw.net/twitch-quests-assets/*",
+        "*static-cdn.jtvnw.net/twitch-drops-assets-prod/*",
+    ],
+    "stream": _COMMON + _CHAT + _EXTENSIONS,
+    # Chat must connect for it to be shown and channel points claimed
+    "stream with chat": _COMMON + _EXTENSIONS,
+}
+
+# Must never be blocked or drops stop progressing, checked against every profile
+ALLOWED = [
+    "https://www.twitch.tv/drops/inventory",
+    "https://gql.twitch.tv/gql",
+    "https://spade.twitch.tv/track",
+    "https://usher.ttvnw.net/api/channel/hls/streamer.m3u8",
+    "https://video-weaver.lhr03.hls.ttvnw.net/v1/playlist/abc.m3u8",
+    "https://video-edge-c2a4b8.lhr03.abs.hls.ttvnw.net/v1/segment/abc.ts",
+    "wss://pubsub-edge.twitch.tv/v1",
+    "https://passport.twitch.tv/login",
+    "https://id.twitch.tv/oauth2/validate",
+    "https://static.twitchcdn.net/assets/core-abc.js",
+]
+
+
+def blocked(url: str, profile: str) -> bool:
+    """Would a profile block a url."""
+    return any(fnmatch.fnmatchcase(url, pattern) for pattern in PROFILES[profile])
+
+
+class Request_Filter:
+    """Applies blocking profiles to tabs and counts what was blocked.
+
+    Counts come from Chrome's performance log so the browser must be launched with it,
+    blocked requests are never downloaded so their bytes are estimated
+    from the average size of allowed requests of the same type.
+
+    Attributes:
+        _types : dir - Request id to resource type, for requests not yet finished
+        _requests : dir - Resource type to allowed requests finished
+        _bytes : dir - Resource type to bytes received for allowed requests
+        _blocked : dir - Resource type to blocked requests
+        _lock : Lock - Use when changing counts
+    """
+
+    def __init__(self) -> None:
+        self._types = {}
+        self._requests = {}
+        self._bytes = {}
+        self._blocked = {}
+        self._lock = threading.Lock()
+
+    def apply(self, driver, profile: str) -> bool:
+        """Block a profile's urls in the driver's current tab.
+
+        Returns:
+            Was the profile applied.
+        """
+        if profile not in PROFILES:
+            raise ValueError("[!!] Unknown request filter profile %s" % profile)
+
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": PROFILES[profile]})
+        except WebDriverException:
+            log.write(_logger, "[!] Could not filter requests.")
+            return False
+
+        return True
+
+    def clear(self, driver) -> None:
+        """Stop blocking urls in the driver's current tab."""
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+
+    def collect(self, driver) -> None:
+        """Count the requests in the driver's performance log since the last collect."""
+        try:
+            entries = driver.get_log("performance")
+        except WebDriverException:
+            return  # Launched without the performance log
+
+        with self._lock:
+            for entry in entries:
+                message = json.loads(entry["message"])["message"]
+                method, params = message["method"], message.get("params", {})
+                request = params.get("requestId")
+
+                if method == "Network.requestWillBeSent":
+                    self._types[request] = params.get("type", "Other")
+
+                elif method == "Network.responseReceived":
+                    self._types[request] = params.get("type", "Other")
+
+                elif method == "Network.loadingFinished":
+                    kind = self._types.pop(request, "Other")
+                    self._requests[kind] = self._requests.get(kind, 0) + 1
+                    self._bytes[kind] = self._bytes.get(kind, 0) + params.get(
+                        "encodedDataLength", 0
+                    )
+
+                elif method == "Network.loadingFailed":
+                    kind = self._types.pop(request, params.get("type", "Other"))
+
+                    if (
+                        params.get("blockedReason") != None
+                        or params.get("errorText") == "net::ERR_BLOCKED_BY_CLIENT"
+                    ):
+                        self._blocked[kind] = self._blocked.get(kind, 0) + 1
+
+    def stats(self) -> dir:
+        """Allowed and blocked request counts and bytes."""
+        with self._lock:
+            blocked_bytes = sum(
+                count * self._bytes.get(kind, 0) / self._requests[kind]
+                for kind, count in self._blocked.items()
+                if self._requests.get(kind)
+            )
+
+            return {
+                "requests": sum(self._requests.values()),
+                "bytes": sum(self._bytes.values()),
+                "blocked requests": sum(self._blocked.values()),
+                "blocked bytes (estimated)": int(blocked_bytes),
+                "blocked by type": dict(self._blocked),
+            }
+
+    def report(self) -> str:
+        """Human readable summary of stats."""
+        stats = self.stats()
+        return "Allowed %d (%.1fMB), blocked %d (~%.1fMB)" % (
+            stats["requests"],
+            stats["bytes"] / 1e6,
+            stats["blocked requests"],
+            stats["blocked bytes (estimated)"] / 1e6,
+        )
+
+
+filters = Request_Filter()  # Shared by all Twitch pages
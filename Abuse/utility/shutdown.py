@@ -2,11 +2,14 @@
 import os
 import platform
 import subprocess
+from utility import log
+
+_logger = log.get("utility.shutdown")
 
 
 def shutdown():
     """Shutdown system based on OS."""
-    print("[*] Shutting down.")
+    log.write(_logger, "[*] Shutting down.")
     plat = platform.platform().lower()
 
     if plat.startswith("linux"):
@@ -16,4 +19,4 @@ def shutdown():
         os.system("shutdown /s /t 1")
 
     else:
-        print("[!] System not supported fro shutdown")
+        log.write(_logger, "[!] System not supported fro shutdown")
@@ -0,0 +1,170 @@
+# Saves page sources with what was detected in them and replays detection on them without a browser
+import json
+import os
+import threading
+import time
+from os import path
+
+RECORD = False  # Should page sources be saved whenever elements are looked for, to replay later
+LIMIT = 50  # Most snapshots kept for each page kind and set of elements found
+
+_parser = None  # lxml.html once imported, False if it is not installed
+
+
+def available() -> bool:
+    """Can page sources be parsed, needs lxml."""
+    global _parser
+
+    if _parser == None:
+        try:
+            from lxml import html  # Only needed to classify pages locally
+
+            _parser = html
+        except ImportError:
+            _parser = False
+
+    return _parser != False
+
+
+def evaluate(source: str, xpaths: dir) -> dir:
+    """Check which of several elements exist in a page source.
+
+    Args:
+        source : str - HTML of the page
+        xpaths : dir - Name to xpath of each element
+
+    Returns:
+        Name to whether the element exists.
+
+    Raises:
+        ImportError - lxml is not installed
+    """
+    if not available():
+        raise ImportError("[!!] lxml is needed to parse page sources")
+
+    tree = _parser.document_fromstring(source or "<html></html>")
+    return {name: len(tree.xpath(xpath)) > 0 for name, xpath in xpaths.items()}
+
+
+def label(found: dir) -> str:
+    """Short name for what was found, e.g. "drops+live"."""
+    return "+".join(sorted(name for name, exists in found.items() if exists)) or "none"
+
+
+class Snapshot_Recorder:
+    """Saves page sources labelled with which elements were found in them.
+
+    Each snapshot is an HTML file, an index line per snapshot records its page kind, url and labels.
+    Only the first few snapshots of each page kind and label are kept so long runs do not fill the disk.
+
+    Attributes:
+        directory : str - Where snapshots and their index are saved
+        limit : int - Most snapshots kept for each page kind and label
+        _counts : dir - (page kind, label) to snapshots saved, loaded from the index on first use
+        _lock : Lock - Use when saving
+    """
+
+    def __init__(
+        self,
+        directory: str = path.join(
+            path.dirname(path.realpath(__file__)), "..", "resources", "snapshots"
+        ),
+        limit: int = LIMIT,
+    ) -> None:
+        self.directory = directory
+        self.limit = limit
+        self._counts = None
+        self._lock = threading.Lock()
+
+    def wanted(self, page: str, found: dir) -> bool:
+        """Is there room for another snapshot of the page kind with these labels."""
+        with self._lock:
+            self._load_counts()
+            return self._counts.get((page, label(found)), 0) < self.limit
+
+    def record(self, page: str, found: dir, source: str, url: str = None) -> str:
+        """Save a page source with which elements were found in it.
+
+        Args:
+            page : str - Kind of page, e.g. "channel"
+            found : dir - Name to whether the element was found
+            source : str - HTML of the page
+            url : str - Where the page was loaded from
+
+        Returns:
+            The file saved to, None if there are enough snapshots like it.
+        """
+        key = (page, label(found))
+
+        with self._lock:
+            self._load_counts()
+            if self._counts.get(key, 0) >= self.limit:
+                return None
+
+            name = path.join(page, "%d-%s.html" % (time.time_ns(), key[1]))
+            os.makedirs(path.join(self.directory, page), exist_ok=True)
+
+            with open(path.join(self.directory, name), "w", encoding="utf-8") as file:
+                file.write(source)
+
+            with open(path.join(self.directory, "index.jsonl"), "a") as index:
+                entry = {"file": name, "page": page, "url": url, "found": found}
+                index.write(json.dumps(entry) + "\n")
+
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+        return path.join(self.directory, name)
+
+    def snapshots(self) -> list:
+        """Every saved snapshot's index entry, oldest first."""
+        file = path.join(self.directory, "index.jsonl")
+        if not path.isfile(file):
+            return []
+
+        with open(file, "r") as index:
+            return [json.loads(line) for line in index if line.strip()]
+
+    def source(self, snapshot: dir) -> str:
+        """HTML of a saved snapshot."""
+        with open(path.join(self.directory, snapshot["file"]), "r", encoding="utf-8") as file:
+            return file.read()
+
+    def replay(self, xpaths: dir) -> list:
+        """Evaluate xpaths against every snapshot, comparing with what was found when recorded.
+
+        Only elements with an xpath and a recorded result are compared.
+
+        Args:
+            xpaths : dir - Name to xpath of each element, e.g. twitch.XPATHS
+
+        Returns:
+            (file, name, recorded, replayed) of each disagreement.
+        """
+        disagreements = []
+
+        for snapshot in self.snapshots():
+            names = {
+                name: xpaths[name] for name in snapshot["found"] if name in xpaths
+            }
+            replayed = evaluate(self.source(snapshot), names)
+
+            for name, exists in replayed.items():
+                if exists != snapshot["found"][name]:
+                    disagreements.append(
+                        (snapshot["file"], name, snapshot["found"][name], exists)
+                    )
+
+        return disagreements
+
+    def _load_counts(self) -> None:
+        """Count snapshots already saved, the lock must be held."""
+        if self._counts != None:
+            return
+
+        self._counts = {}
+        for snapshot in self.snapshots():
+            key = (snapshot["page"], label(snapshot["found"]))
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+
+recorder = Snapshot_Recorder()  # Shared by every page
@@ -0,0 +1,382 @@
+# Persistent storage backends for user accounts
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from os import path
+from utility import log
+
+_logger = log.get("utility.storage")
+
+# Change these flags to configure storage
+BACKEND = "json"  # "json" for a file per user or "sqlite" for one indexed file
+FLUSH_DELAY = 5  # Seconds buffered cookie updates wait before being written together
+
+_resources = path.join(path.dirname(path.realpath(__file__)), "..", "resources")
+
+
+class Json_Store:
+    """A json file per user account, the original storage layout.
+
+    Files are written to a temporary file and swapped in so a crash never leaves half a file.
+
+    Attributes:
+        folder : str - Directory holding <username>.json files
+        _lock : Lock - Use when writing files
+    """
+
+    def __init__(self, folder: str = path.join(_resources, "users")) -> None:
+        self.folder = folder
+        self._lock = threading.Lock()
+
+    def usernames(self) -> list:
+        """Return every stored username."""
+        if not path.isdir(self.folder):
+            return []
+
+        return [
+            name[:-5]
+            for name in os.listdir(self.folder)
+            if name.endswith(".json")
+        ]
+
+    def exists(self, username: str) -> bool:
+        return path.isfile(self._path(username))
+
+    def versions(self) -> dir:
+        """Username to a value that changes whenever the user is saved, the file's mtime."""
+        if not path.isdir(self.folder):
+            return {}
+
+        with os.scandir(self.folder) as entries:
+            return {
+                entry.name[:-5]: entry.stat().st_mtime_ns
+                for entry in entries
+                if entry.name.endswith(".json")
+            }
+
+    def load(self, username: str) -> dir:
+        """Load a user's data.
+
+        Raises:
+            FileNotFoundError - If the user account is not stored
+        """
+        with open(self._path(username), "r") as file:
+            return json.load(file)
+
+    def load_all(self) -> dir:
+        """Load every user's data, username to data."""
+        return {username: self.load(username) for username in self.usernames()}
+
+    def save(self, username: str, data: dir) -> None:
+        self.save_many({username: data})
+
+    def save_many(self, users: dir) -> None:
+        """Save several users' data, username to data."""
+        with self._lock:
+            if not path.isdir(self.folder):
+                os.makedirs(self.folder)
+
+            for username, data in users.items():
+                descriptor, temporary = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+
+                try:
+                    with os.fdopen(descriptor, "w") as file:
+                        json.dump(data, file)
+                    os.replace(temporary, self._path(username))
+                except BaseException:
+                    os.remove(temporary)
+                    raise
+
+    def delete(self, username: str) -> None:
+        """Delete a user's data.
+
+        Raises:
+            FileNotFoundError - If the user account is not stored
+        """
+        with self._lock:
+            os.remove(self._path(username))
+
+    def close(self) -> None:
+        pass
+
+    def _path(self, username: str) -> str:
+        return path.join(self.folder, username + ".json")
+
+
+class Sqlite_Store:
+    """Every user account in one indexed sqlite file.
+
+    Loading all users is a single query and batches of saves are a single transaction.
+
+    Attributes:
+        file : str - Database file
+        _connection : Connection - Shared between threads, only used under the lock
+        _lock : Lock - Use when using the connection
+    """
+
+    def __init__(self, file: str = path.join(_resources, "users.db")) -> None:
+        self.file = file
+        self._lock = threading.Lock()
+
+        if not path.isdir(path.dirname(file)):
+            os.makedirs(path.dirname(file))
+
+        self._connection = sqlite3.connect(file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "username TEXT PRIMARY KEY, password TEXT, phone TEXT, admin INTEGER, cookies TEXT, updated INTEGER,"
+            " expires REAL)"
+        )
+
+        # Databases from before change detection and cookie expiry
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(users)")]
+        if "updated" not in columns:
+            self._connection.execute("ALTER TABLE users ADD COLUMN updated INTEGER")
+        if "expires" not in columns:
+            self._connection.execute("ALTER TABLE users ADD COLUMN expires REAL")
+
+        self._connection.commit()
+
+    def usernames(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT username FROM users")]
+
+    def exists(self, username: str) -> bool:
+        with self._lock:
+            return (
+                self._connection.execute(
+                    "SELECT 1 FROM users WHERE username = ?", (username,)
+                ).fetchone()
+                != None
+            )
+
+    def versions(self) -> dir:
+        """Username to a value that changes whenever the user is saved, the time it was saved."""
+        with self._lock:
+            return dict(
+                self._connection.execute("SELECT username, updated FROM users").fetchall()
+            )
+
+    def load(self, username: str) -> dir:
+        """Load a user's data.
+
+        Raises:
+            FileNotFoundError - If the user account is not stored
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT username, password, phone, admin, cookies, expires FROM users WHERE username = ?",
+                (username,),
+            ).fetchone()
+
+        if row == None:
+            raise FileNotFoundError(username)
+
+        return self._data(row)
+
+    def load_all(self) -> dir:
+        """Load every user's data, username to data."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT username, password, phone, admin, cookies, expires FROM users"
+            ).fetchall()
+
+        return {row[0]: self._data(row) for row in rows}
+
+    def save(self, username: str, data: dir) -> None:
+        self.save_many({username: data})
+
+    def save_many(self, users: dir) -> None:
+        """Save several users' data in one transaction, username to data."""
+        updated = time.time_ns()
+        rows = [
+            (
+                username,
+                data["password"],
+                data["phone"],
+                None if data["admin"] == None else int(data["admin"]),
+                json.dumps(data["cookies"]),
+                updated,
+                data.get("expires"),
+            )
+            for username, data in users.items()
+        ]
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO users (username, password, phone, admin, cookies, updated, expires)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def delete(self, username: str) -> None:
+        """Delete a user's data.
+
+        Raises:
+            FileNotFoundError - If the user account is not stored
+        """
+        with self._lock, self._connection:
+            deleted = self._connection.execute(
+                "DELETE FROM users WHERE username = ?", (username,)
+            ).rowcount
+
+        if not deleted:
+            raise FileNotFoundError(username)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _data(row: tuple) -> dir:
+        return {
+            "password": row[1],
+            "phone": row[2],
+            "admin": None if row[3] == None else bool(row[3]),
+            "cookies": json.loads(row[4]),
+            "expires": row[5],
+        }
+
+
+class Write_Behind:
+    """Buffers saves and writes them together after a delay.
+
+    A burst of cookie refreshes becomes one batched write,
+    reads check the buffer first so they never see stale data.
+
+    Attributes:
+        delay : float - Seconds the first buffered save waits before flushing
+        _store : Json_Store/Sqlite_Store - Where saves are written
+        _pending : dir - Username to data not yet written
+        _lock : Lock - Use when changing pending
+        _timer : Timer - Flushes pending, None if nothing is pending
+    """
+
+    def __init__(self, store, delay: float = FLUSH_DELAY) -> None:
+        self.delay = delay
+        self._store = store
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def put(self, username: str, data: dir) -> None:
+        """Buffer a save, flushing is scheduled if not already."""
+        with self._lock:
+            self._pending[username] = data
+            self._schedule()
+
+    def get(self, username: str) -> dir:
+        """Buffered data for a user, None if nothing is buffered."""
+        with self._lock:
+            return self._pending.get(username)
+
+    def pending(self) -> dir:
+        """Copy of all buffered data, username to data."""
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self, username: str) -> None:
+        """Drop a user's buffered save."""
+        with self._lock:
+            self._pending.pop(username, None)
+
+    def flush(self) -> bool:
+        """Write every buffered save now, a failed write is buffered again and retried later.
+
+        Returns:
+            Was everything written.
+        """
+        with self._lock:
+            if self._timer != None:
+                self._timer.cancel()
+                self._timer = None
+
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return True
+
+        try:
+            self._store.save_many(pending)
+        except (OSError, sqlite3.Error) as error:
+            log.write(_logger, "[!] Saves not written, retrying: %s" % error)
+
+            with self._lock:
+                # Saves buffered since are newer
+                pending.update(self._pending)
+                self._pending = pending
+                self._schedule()
+
+            return False
+
+        return True
+
+    def _schedule(self) -> None:
+        """Flush after the delay if not already scheduled, the lock must be held."""
+        if self._timer == None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+def migrate(source, destination) -> int:
+    """Copy every user from one store to another.
+
+    Returns:
+        The number of users copied.
+    """
+    users = source.load_all()
+    destination.save_many(users)
+    return len(users)
+
+
+_store = None
+_writer = None
+_pid = None  # Process the store was opened in, a forked worker must open its own
+_lock = threading.Lock()
+
+
+def store():
+    """The shared store for BACKEND, the json users are migrated into a new sqlite store.
+
+    Sqlite connections and timer threads do not survive a fork,
+    so a forked worker process opens its own store and write behind buffer on first use.
+    The parent still writes whatever it had buffered.
+    """
+    global _store, _writer, _pid
+
+    with _lock:
+        if _store == None or _pid != os.getpid():
+            _pid = os.getpid()
+
+            if BACKEND == "sqlite":
+                new = not path.isfile(path.join(_resources, "users.db"))
+                _store = Sqlite_Store(path.join(_resources, "users.db"))
+
+                if new and (old := Json_Store(path.join(_resources, "users"))).usernames():
+                    log.write(
+                        _logger,
+                        "[*] Migrated %d users to sqlite" % migrate(old, _store),
+                    )
+
+            elif BACKEND == "json":
+                _store = Json_Store(path.join(_resources, "users"))
+
+            else:
+                raise ValueError("[!!] Unknown storage backend %s" % BACKEND)
+
+            _writer = Write_Behind(_store)
+            atexit.register(_writer.flush)
+
+    return _store
+
+
+def writer() -> Write_Behind:
+    """The shared write behind buffer for the store."""
+    store()
+    return _writer
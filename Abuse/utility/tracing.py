@@ -0,0 +1,217 @@
+# Per account timelines in the Chrome trace event format, load them in chrome://tracing or Perfetto
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import zlib
+from os import path
+
+SAMPLE = 0.05  # Share of user accounts traced, the same accounts are picked every run
+ALWAYS = []  # Usernames always traced, e.g. one known to be slow
+LIMIT = 100000  # Most spans kept, the oldest are dropped first
+
+
+class Tracer:
+    """Records spans of sampled user accounts, each account is shown as its own process.
+
+    Spans are complete events so nested spans on the same thread stack up in the viewer.
+
+    Attributes:
+        sample : float - Share of user accounts traced, 0 - 1
+        always : list - Usernames always traced
+        _file : str - Where the trace is saved, None for trace-<pid>.json in resources
+        _events : deque - Spans and instants, oldest dropped once full
+        _metadata : list - Process and thread names, never dropped
+        _processes : dir - Username to the trace process ID shown for it
+        _threads : set - (process ID, thread ID) pairs already named
+        _dropped : int - Number of events dropped to stay bounded
+        _lock : Lock - Use when changing events
+    """
+
+    def __init__(
+        self,
+        sample: float = SAMPLE,
+        always: list = ALWAYS,
+        limit: int = LIMIT,
+        file: str = None,
+    ) -> None:
+        if not 0 <= sample <= 1 or limit < 1:
+            raise ValueError("[!!] sample must be 0 - 1 and limit above 0")
+
+        self.sample = sample
+        self.always = list(always)
+        self._file = file
+        self._events = collections.deque(maxlen=limit)
+        self._metadata = []
+        self._processes = {}
+        self._threads = set()
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def sampled(self, account: str) -> bool:
+        """Is the user account traced, decided by a hash so it is the same in every process."""
+        if account in self.always:
+            return True
+
+        return zlib.crc32(account.encode()) / 2**32 < self.sample
+
+    @contextlib.contextmanager
+    def span(self, name: str, account: str, category: str = "page", **args):
+        """Record the with block as a span of the user account, nothing is done if it is not sampled.
+
+        Args:
+            name : str - What is being done
+            account : str - Username the work is for
+            category : str - Shown as the span's category
+            args - Extra attributes shown with the span
+
+        Yields:
+            The span's attributes, may be added to before the block ends.
+        """
+        if account == None or not self.sampled(account):
+            yield {}
+            return
+
+        args["account"] = account
+        args["thread"] = threading.current_thread().name
+        start = time.perf_counter_ns()
+
+        try:
+            yield args
+        except BaseException as error:
+            args["error"] = type(error).__name__
+            raise
+        finally:
+            self._add(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start // 1000,
+                    "dur": (time.perf_counter_ns() - start) // 1000,
+                    "args": args,
+                },
+                account,
+            )
+
+    def instant(self, name: str, account: str, category: str = "page", **args) -> None:
+        """Record a moment, e.g. a drop claimed."""
+        if account == None or not self.sampled(account):
+            return
+
+        args["account"] = account
+        self._add(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "i",
+                "s": "t",
+                "ts": time.perf_counter_ns() // 1000,
+                "args": args,
+            },
+            account,
+        )
+
+    def events(self) -> list:
+        """Copy of every event, metadata first."""
+        with self._lock:
+            return self._metadata + list(self._events)
+
+    def save(self) -> str:
+        """Save the trace if anything was traced.
+
+        Returns:
+            The file saved to, None if nothing was traced.
+        """
+        with self._lock:
+            if not self._events:
+                return None
+
+            data = {
+                "traceEvents": self._metadata + list(self._events),
+                "displayTimeUnit": "ms",
+                "otherData": {"dropped events": self._dropped},
+            }
+
+        file = self._file or path.join(
+            path.dirname(path.realpath(__file__)),
+            "..",
+            "resources",
+            "trace-%d.json" % os.getpid(),
+        )
+        with open(file + ".tmp", "w") as temporary:
+            json.dump(data, temporary)
+        os.replace(file + ".tmp", file)
+
+        return file
+
+    def _add(self, event: dir, account: str) -> None:
+        """Add an event on the account's process and the current thread."""
+        thread = threading.current_thread()
+
+        with self._lock:
+            if account not in self._processes:
+                self._processes[account] = len(self._processes) + 1
+                self._metadata.append(
+                    {
+                        "name": "process_name",
+                        "ph": "M",
+                        "pid": self._processes[account],
+                        "args": {"name": account},
+                    }
+                )
+
+            event["pid"] = self._processes[account]
+            event["tid"] = thread.ident
+
+            if (event["pid"], event["tid"]) not in self._threads:
+                self._threads.add((event["pid"], event["tid"]))
+                self._metadata.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": event["pid"],
+                        "tid": event["tid"],
+                        "args": {"name": thread.name},
+                    }
+                )
+
+            if len(self._events) == self._events.maxlen:
+                self._dropped += 1
+            self._events.append(event)
+
+
+tracer = Tracer()  # Shared by every page
+
+
+def traced(name: str = None) -> callable:
+    """Decorate a page method to record each call as a span of the page's user account.
+
+    Boolean results are added to the span, e.g. whether a login worked.
+
+    Args:
+        name : str - Span name, defaults to the method's qualified name
+    """
+
+    def decorate(method: callable) -> callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            user = getattr(self, "user", None)
+            account = user.username if user != None else None
+
+            with tracer.span(
+                name or method.__qualname__, account, category=type(self).__module__
+            ) as attributes:
+                result = method(self, *args, **kwargs)
+
+                if isinstance(result, bool):
+                    attributes["result"] = result
+
+                return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,132 @@
+# Learns how long to wait for elements to appear
+import collections
+import json
+import math
+import os
+import tempfile
+import threading
+from os import path
+from utility import log
+
+_logger = log.get("utility.wait_budget")
+
+
+class Wait_Budgets:
+    """Learned per page and selector timeouts for finding elements.
+
+    Records how long found elements took to appear and uses a high percentile of that plus a margin.
+    Selectors never found on a page wait the maximum, rarely shown elements such as the drops left
+    image can render far slower than the page average and must not be reported absent early.
+
+    Attributes:
+        percentile : float - Percentile of appearance times to use, 0 - 100
+        margin : float - Multiplied with the percentile to allow for slow loads
+        minimum : float - Fewest seconds to wait
+        maximum : float - Most seconds to wait, used when nothing has been learned
+        samples : int - Number of recent timings kept per key
+        _timings : dir - Key to recent timings in seconds
+        _file : str - Where learned timings are saved
+        _lock : Lock - Use when changing timings
+        _changed : bool - Are there unsaved timings
+    """
+
+    def __init__(
+        self,
+        file: str = path.join(
+            path.dirname(path.realpath(__file__)), "..", "resources", "wait_budgets.json"
+        ),
+        percentile: float = 95,
+        margin: float = 1.5,
+        minimum: float = 2,
+        maximum: float = 10,
+        samples: int = 50,
+    ) -> None:
+        self.percentile = percentile
+        self.margin = margin
+        self.minimum = minimum
+        self.maximum = maximum
+        self.samples = samples
+        self._timings = {}
+        self._file = file
+        self._lock = threading.Lock()
+        self._changed = False
+
+    def timeout(self, page: str, selector: str) -> float:
+        """Get the seconds to wait for a selector on a page."""
+        with self._lock:
+            timings = self._timings.get(self._key(page, selector))
+
+            if not timings:
+                return self.maximum
+
+            estimate = self._percentile(sorted(timings)) * self.margin
+
+        return min(self.maximum, max(self.minimum, estimate))
+
+    def record(self, page: str, selector: str, seconds: float) -> None:
+        """Record how long a found element took to appear."""
+        with self._lock:
+            key = self._key(page, selector)
+            if key not in self._timings:
+                self._timings[key] = collections.deque(maxlen=self.samples)
+            self._timings[key].append(seconds)
+
+            self._changed = True
+
+    def load(self) -> None:
+        """Load learned timings, nothing is learned if never saved or the file is unreadable."""
+        if not path.isfile(self._file):
+            return
+
+        try:
+            with open(self._file, "r") as file:
+                data = json.load(file)
+
+            timings = {
+                key: collections.deque(timings, maxlen=self.samples)
+                for key, timings in data.items()
+            }
+        except (OSError, ValueError, AttributeError, TypeError) as error:
+            log.write(_logger, "[!] Wait budgets not loaded, starting fresh: %s" % error)
+            return
+
+        with self._lock:
+            self._timings = timings
+            self._changed = False
+
+    def save(self) -> None:
+        """Save learned timings if they have changed.
+
+        Replaced in one go, pages and worker processes save the same file.
+        """
+        with self._lock:
+            if not self._changed:
+                return
+
+            data = {key: list(timings) for key, timings in self._timings.items()}
+
+            folder = path.dirname(path.abspath(self._file))
+            os.makedirs(folder, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=folder, suffix=".tmp")
+
+            try:
+                with os.fdopen(descriptor, "w") as file:
+                    json.dump(data, file)
+                os.replace(temporary, self._file)
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+            self._changed = False
+
+    def _percentile(self, timings: list) -> float:
+        """Nearest rank percentile of sorted timings."""
+        rank = math.ceil(self.percentile / 100 * len(timings))
+        return timings[max(0, rank - 1)]
+
+    @staticmethod
+    def _key(page: str, selector: str) -> str:
+        return page + " " + selector
+
+
+budgets = Wait_Budgets()  # Shared by all Twitch pages
@@ -0,0 +1,252 @@
+# Times the browser flows against the fake Twitch site and checks them against a baseline
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import fake_twitch
+import selenium
+import sessions
+import twitch
+from utility import log, rate_limit, reputation, wait_budget
+
+# Scenarios in the order each account runs them, all accounts start each scenario together
+SCENARIOS = [
+    "driver startup",
+    "cookie login",
+    "find stream",
+    "optimise stream",
+    "health check",
+    "claim drop",
+]
+ACCOUNTS = [1, 10, 50]  # No. of concurrent accounts each run is timed with
+THRESHOLD = 0.25  # Share a scenario's median may grow by before it is a regression
+SLACK = 0.1  # Seconds a scenario's median may grow by regardless, quick scenarios are noisy
+BASELINE = path.join(path.dirname(path.realpath(__file__)), "baseline.json")
+
+
+def summarise(seconds: list) -> dict:
+    """Median, 95th percentile and slowest of the seconds each account took."""
+    ordered = sorted(seconds)
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)],
+        "max": ordered[-1],
+    }
+
+
+def compare(
+    baseline: dict, results: dict, threshold: float = THRESHOLD, slack: float = SLACK
+) -> list:
+    """Find scenarios slower than the baseline.
+
+    Scenarios missing from either side are skipped, e.g. a run with fewer accounts.
+
+    Args:
+        baseline : dict - Results saved as the baseline
+        results : dict - Results of this run
+        threshold : float - Share the median may grow by
+        slack : float - Seconds the median may grow by regardless
+
+    Returns:
+        (accounts, scenario, baseline median, median) of each regression.
+    """
+    regressions = []
+
+    for accounts, scenarios in results["runs"].items():
+        for scenario, stats in scenarios.items():
+            known = baseline["runs"].get(accounts, {}).get(scenario)
+            if known == None:
+                continue
+
+            if stats["median"] > known["median"] * (1 + threshold) + slack:
+                regressions.append((accounts, scenario, known["median"], stats["median"]))
+
+    return regressions
+
+
+def _isolate(directory: str, rate_limited: bool) -> None:
+    """Start from nothing learned so runs are comparable, without touching the real resources."""
+    wait_budget.budgets = wait_budget.Wait_Budgets(
+        file=path.join(directory, "wait_budgets.json")
+    )
+    reputation.reputations = reputation.Reputation_Store(
+        file=path.join(directory, "channel_reputation.json")
+    )
+
+    # Twitch's rate limit would be all that is timed with many accounts
+    if not rate_limited:
+        rate_limit.limiter = rate_limit.Rate_Limiter(1000, 1000, 1000, 1000, 0, {})
+
+
+def _account(
+    username: str, headless: bool, barrier: threading.Barrier, timings: dict
+) -> None:
+    """Run every scenario for one account, timing each.
+
+    Scenarios call the pages' private steps directly, Tests/test_benchmarks.py runs one
+    account end to end so a renamed step fails there rather than when next benchmarking.
+    """
+    user = account.Account(username)
+    user.create(temporary=True)
+    user.cookies = [{"name": "auth-token", "value": username}]
+
+    stream = twitch.Stream(user, headless=headless)
+    inventory = twitch.Inventory(user, headless=headless)
+
+    def timed(scenario: str, work: callable) -> None:
+        barrier.wait()
+        start = time.perf_counter()
+
+        if work() == False:
+            raise RuntimeError("[!!] %s failed for %s" % (scenario, username))
+
+        timings[scenario].append(time.perf_counter() - start)
+
+    try:
+        timed("driver startup", stream._setup_webdriver)
+        timed("cookie login", stream._login_by_cookies)
+
+        stream._preseed_player()
+        timed("find stream", stream._find_stream)
+        timed("optimise stream", stream._optimise_stream)
+        timed(
+            "health check",
+            lambda: not stream._check_error() and stream._check_stream_alive(),
+        )
+
+        inventory._driver = stream._driver
+
+        def claim() -> bool:
+            inventory._driver.get(inventory._url)
+            return not inventory._check_error() and inventory._claim_drop()
+
+        timed("claim drop", claim)
+    except BaseException:
+        # Let the other accounts stop instead of waiting for this one forever
+        barrier.abort()
+        raise
+    finally:
+        inventory._driver = None
+        if stream._driver != None:
+            stream._driver.quit()
+
+
+def run(accounts: int, headless: bool = True, latency: float = 0) -> dict:
+    """Time every scenario with several accounts at once against a fresh fake site.
+
+    Returns:
+        Scenario to the summary of the seconds each account took.
+    """
+    site = fake_twitch.Fake_Twitch(channels=max(20, accounts), latency=latency)
+    twitch.BASE_URL = site.start()
+    sessions.validator = sessions.Session_Validator(site.url + "/oauth2/validate")
+
+    timings = {scenario: [] for scenario in SCENARIOS}
+    barrier = threading.Barrier(accounts)
+    threads = [
+        threading.Thread(
+            target=_account,
+            args=("bench%d" % number, headless, barrier, timings),
+            name="bench%d" % number,
+        )
+        for number in range(accounts)
+    ]
+
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        site.close()
+
+    if any(len(seconds) != accounts for seconds in timings.values()):
+        raise RuntimeError("[!!] Some accounts did not finish, see above")
+
+    return {scenario: summarise(seconds) for scenario, seconds in timings.items()}
+
+
+def main(args: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Time the browser flows against a fake Twitch site"
+    )
+    parser.add_argument("--accounts", type=int, nargs="+", default=ACCOUNTS)
+    parser.add_argument("--baseline", default=BASELINE, help="baseline to check against")
+    parser.add_argument("--save", action="store_true", help="save the run as the baseline")
+    parser.add_argument("--results", help="also write the run's results to this file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--slack", type=float, default=SLACK)
+    parser.add_argument("--latency", type=float, default=0, help="seconds per response")
+    parser.add_argument("--visible", action="store_true", help="show the browsers")
+    parser.add_argument(
+        "--rate-limited", action="store_true", help="keep Twitch's rate limit"
+    )
+    options = parser.parse_args(args)
+
+    log.setup(directory=None, level="WARNING")
+
+    results = {
+        "time": time.time(),
+        "python": platform.python_version(),
+        "selenium": selenium.__version__,
+        "cpus": os.cpu_count(),
+        "runs": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for accounts in options.accounts:
+            _isolate(directory, options.rate_limited)
+            print("[*] Timing %d accounts" % accounts)
+            results["runs"][str(accounts)] = run(
+                accounts, not options.visible, options.latency
+            )
+
+            for scenario, stats in results["runs"][str(accounts)].items():
+                print(
+                    "    %-16s median %6.2fs  p95 %6.2fs  max %6.2fs"
+                    % (scenario, stats["median"], stats["p95"], stats["max"])
+                )
+
+    if options.results:
+        with open(options.results, "w") as file:
+            json.dump(results, file, indent=1)
+
+    if options.save:
+        with open(options.baseline, "w") as file:
+            json.dump(results, file, indent=1)
+        print("[+] Saved baseline %s" % options.baseline)
+        return 0
+
+    if not path.isfile(options.baseline):
+        print("[!] No baseline to check against, run with --save to make one")
+        return 0
+
+    with open(options.baseline, "r") as file:
+        baseline = json.load(file)
+
+    regressions = compare(baseline, results, options.threshold, options.slack)
+    for accounts, scenario, before, after in regressions:
+        print(
+            "[!!] %s with %s accounts slowed from %.2fs to %.2fs"
+            % (scenario, accounts, before, after)
+        )
+
+    if not regressions:
+        print("[+] No regressions")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# Local stand-in for the Twitch pages twitch.py reads, so browser flows can be timed offline
+import html
+import http.server
+import json
+import threading
+import time
+from urllib import parse
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>%s - Twitch</title></head>
+<body>
+%s
+</body>
+</html>
+"""
+
+_HOME = """<h1>Twitch</h1>"""
+
+# Pressing return in the password box submits the form back to the home page
+_LOGIN = """<form action="/" method="get">
+    <input id="login-username" type="text">
+    <input id="password-input" type="password">
+    <button type="submit">Log In</button>
+</form>"""
+
+_CARD = """<article>
+    <a data-a-target="preview-card-title-link" href="/%s">%s is dropping</a>
+</article>"""
+
+# The player reads its quality and chat preferences from local storage like Twitch's does,
+# menus are hidden until opened so clicking them out of order fails as it would on Twitch
+_CHANNEL = """<div class="video-player">
+    <video></video>
+    <button data-a-target="player-settings-button" onclick="toggle('settings-menu')">Settings</button>
+    <div id="settings-menu" hidden>
+        <button data-a-target="player-settings-menu-item-quality" onclick="toggle('quality-menu')">Quality</button>
+    </div>
+    <div id="quality-menu" hidden>
+        <div data-a-target="player-settings-submenu-quality-option" onclick="choose('160p30')"><div>160p</div></div>
+        <div data-a-target="player-settings-submenu-quality-option" onclick="choose('360p30')"><div>360p</div></div>
+        <div data-a-target="player-settings-submenu-quality-option" onclick="choose('480p30')"><div>480p</div></div>
+        <div data-a-target="player-settings-submenu-quality-option" onclick="choose('720p60')"><div>720p</div></div>
+        <div data-a-target="player-settings-submenu-quality-option" onclick="choose('auto')"><div>Auto</div></div>
+    </div>
+</div>
+%s
+<div data-a-target="right-column-chat-bar" id="chat">
+    <button data-a-target="right-column__toggle-collapse-btn" onclick="collapse()">Collapse</button>
+    <div class="claimable-bonus__icon tw-flex" onclick="this.remove()"></div>
+</div>
+<script>
+function quality() {
+    var stored = window.localStorage.getItem("video-quality");
+    return stored ? JSON.parse(stored)["default"] : "1080p60";
+}
+
+Object.defineProperty(HTMLVideoElement.prototype, "videoHeight", {
+    get: function () {
+        var height = parseInt(quality());
+        return isNaN(height) ? 720 : height;
+    },
+});
+
+function toggle(id) {
+    var menu = document.getElementById(id);
+    menu.hidden = !menu.hidden;
+}
+
+function choose(value) {
+    window.localStorage.setItem("video-quality", JSON.stringify({"default": value}));
+    document.getElementById("settings-menu").hidden = true;
+    document.getElementById("quality-menu").hidden = true;
+}
+
+function collapse() {
+    window.localStorage.setItem("chatPaneCollapsed", "true");
+    document.getElementById("chat").remove();
+}
+
+if (window.localStorage.getItem("chatPaneCollapsed") === "true") {
+    document.getElementById("chat").remove();
+}
+</script>"""
+
+_LIVE = """<div class="channel-info-content">
+    <p>LIVE</p>
+    <a data-a-target="Drops Enabled" href="/drops/inventory">Drops Enabled</a>
+</div>"""
+
+_OFFLINE = """<div class="channel-info-content">
+    <p>Offline</p>
+</div>"""
+
+_REWARD = """<div data-test-selector="DropsCampaignInProgressRewardPresentation">
+        <img class="inventory-drop-image inventory-opacity-2 tw-image" alt="Drop %d" src="data:,">
+        <div role="progressbar" aria-label="Drop %d" aria-valuenow="%d"></div>
+        %s
+    </div>"""
+
+_CLAIM = """<button data-test-selector="DropsCampaignInProgressRewardPresentation-claim-button" onclick="this.remove()">Claim Now</button>"""
+
+_INVENTORY = """<h4>Claimed</h4>
+<p>In Progress</p>
+<div data-test-selector="DropsCampaignInProgressRewards-container">
+    %s
+</div>"""
+
+
+def channel_page(login: str, live: bool = True) -> str:
+    return _PAGE % (html.escape(login), _CHANNEL % (_LIVE if live else _OFFLINE))
+
+
+def directory_page(logins: list) -> str:
+    cards = "\n".join(_CARD % (login, html.escape(login)) for login in logins)
+    return _PAGE % ("Directory", cards)
+
+
+def inventory_page(drops: int = 3, claimable: int = 1) -> str:
+    rewards = "\n    ".join(
+        _REWARD % (number, number, 100, _CLAIM)
+        if number < claimable
+        else _REWARD % (number, number, 40, "")
+        for number in range(drops)
+    )
+    return _PAGE % ("Drops Inventory", _INVENTORY % rewards)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        site = self.server.site
+        time.sleep(site.latency)
+
+        section = parse.urlparse(self.path).path.strip("/").split("/")
+
+        if section == ["oauth2", "validate"]:
+            self._validate()
+            return
+        elif section == [""]:
+            page = _PAGE % ("Twitch", _HOME)
+        elif section == ["login"]:
+            page = _PAGE % ("Log In", _LOGIN)
+        elif section[0] == "directory":
+            page = directory_page(site.channels)
+        elif section == ["drops", "inventory"]:
+            page = inventory_page(site.drops, site.claimable)
+        elif len(section) == 1 and section[0] in site.channels:
+            page = channel_page(section[0], section[0] not in site.offline)
+        else:
+            self.send_error(404)
+            return
+
+        self._reply(200, "text/html; charset=utf-8", page)
+
+    def _validate(self):
+        """Every auth token is valid and never expires, like the session validator sees on Twitch."""
+        token = self.headers.get("Authorization", "")
+        if not token.startswith("OAuth "):
+            self._reply(401, "application/json", json.dumps({"status": 401}))
+            return
+
+        details = {"login": token[len("OAuth ") :], "scopes": [], "expires_in": 0}
+        self._reply(200, "application/json", json.dumps(details))
+
+    def _reply(self, status: int, kind: str, body: str):
+        raw = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+class Fake_Twitch:
+    """Serves the login form, directory cards, stream pages, inventory and token validation on localhost.
+
+    Attributes:
+        channels : list - Logins shown in the directory, in order
+        offline : set - Logins whose stream page shows them offline
+        drops : int - Drops in progress in the inventory
+        claimable : int - Drops in the inventory with a claim button
+        latency : float - Seconds added before each response
+        url : str - Base URL of the site, None until started
+        _server : ThreadingHTTPServer - Serves the pages, None until started
+        _thread : Thread - Runs the server
+    """
+
+    def __init__(
+        self,
+        channels: int = 20,
+        offline: int = 0,
+        drops: int = 3,
+        claimable: int = 1,
+        latency: float = 0,
+        port: int = 0,
+    ) -> None:
+        self.channels = ["channel%d" % number for number in range(channels)]
+        self.offline = set(self.channels[:offline])
+        self.drops = drops
+        self.claimable = claimable
+        self.latency = latency
+        self.url = None
+        self._port = port
+        self._server = None
+        self._thread = None
+
+    def start(self) -> str:
+        """Start serving in the background.
+
+        Returns:
+            The base URL of the site.
+        """
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", self._port), _Handler)
+        self._server.daemon_threads = True
+        self._server.site = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake twitch", daemon=True
+        )
+        self._thread.start()
+
+        self.url = "http://127.0.0.1:%d" % self._server.server_address[1]
+        return self.url
+
+    def close(self) -> None:
+        if self._server != None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
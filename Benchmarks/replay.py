@@ -0,0 +1,112 @@
+# Times page classification on saved snapshots and checks it still agrees with what was recorded
+import argparse
+import statistics
+import sys
+import time
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import fake_twitch
+import twitch
+from utility import snapshots
+
+# Pages of the fake site with what twitch.py should find in them
+FAKE_PAGES = {
+    "live channel": (
+        fake_twitch.channel_page("channel0"),
+        {"live": True, "drops": True, "error": False, "settings": True},
+    ),
+    "offline channel": (
+        fake_twitch.channel_page("channel0", live=False),
+        {"live": False, "drops": False, "error": False},
+    ),
+    "claimable inventory": (
+        fake_twitch.inventory_page(),
+        {"claim": True, "drops left": True, "claimed": True, "in progress": True},
+    ),
+    "inventory": (
+        fake_twitch.inventory_page(claimable=0),
+        {"claim": False, "drops left": True},
+    ),
+    "empty inventory": (
+        fake_twitch.inventory_page(drops=0, claimable=0),
+        {"claim": False, "drops left": False},
+    ),
+}
+
+
+def check_fake_pages() -> list:
+    """Classify the fake site's pages.
+
+    Returns:
+        (page, name, expected, found) of each disagreement.
+    """
+    disagreements = []
+
+    for page, (source, expected) in FAKE_PAGES.items():
+        found = snapshots.evaluate(source, {name: twitch.XPATHS[name] for name in expected})
+        disagreements.extend(
+            (page, name, expected[name], exists)
+            for name, exists in found.items()
+            if exists != expected[name]
+        )
+
+    return disagreements
+
+
+def time_classify(sources: list, repeats: int = 20) -> dict:
+    """Milliseconds to classify a page against every xpath, median and slowest of each page."""
+    xpaths = {
+        name: xpath for name, xpath in twitch.XPATHS.items() if "%s" not in xpath
+    }
+    seconds = []
+
+    for source in sources:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            snapshots.evaluate(source, xpaths)
+            seconds.append(time.perf_counter() - start)
+
+    return {
+        "median ms": statistics.median(seconds) * 1000,
+        "max ms": max(seconds) * 1000,
+    }
+
+
+def main(args: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Replay page classification on saved snapshots"
+    )
+    parser.add_argument(
+        "--snapshots",
+        default=snapshots.recorder.directory,
+        help="directory snapshots were recorded to",
+    )
+    options = parser.parse_args(args)
+
+    if not snapshots.available():
+        print("[!!] lxml is needed to replay snapshots")
+        return 1
+
+    recorder = snapshots.Snapshot_Recorder(options.snapshots)
+    recorded = recorder.snapshots()
+
+    disagreements = check_fake_pages() + recorder.replay(twitch.XPATHS)
+    for page, name, expected, found in disagreements:
+        print("[!!] %s: %s should be %s but was %s" % (page, name, expected, found))
+
+    sources = [source for source, _ in FAKE_PAGES.values()]
+    sources += [recorder.source(snapshot) for snapshot in recorded]
+    stats = time_classify(sources)
+
+    print(
+        "[*] %d fake pages and %d snapshots, median %.2fms max %.2fms per page"
+        % (len(FAKE_PAGES), len(recorded), stats["median ms"], stats["max ms"])
+    )
+
+    return 1 if disagreements else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
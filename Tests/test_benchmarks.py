@@ -0,0 +1,125 @@
+import sys
+import urllib.error
+import urllib.request
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Benchmarks"))
+
+import bench
+import fake_twitch
+import sessions
+import twitch
+from utility import chrome, rate_limit, reputation, wait_budget
+
+
+@pytest.fixture
+def site():
+    site = fake_twitch.Fake_Twitch(channels=3, offline=1)
+    site.start()
+    yield site
+    site.close()
+
+
+def chromedriver_missing():
+    try:
+        chrome.driver_location()
+    except (EnvironmentError, FileNotFoundError):
+        return True
+
+    return False
+
+
+def get(site, page):
+    with urllib.request.urlopen(site.url + page, timeout=5) as response:
+        return response.read().decode()
+
+
+class TestFakeTwitch:
+    def test_login_form(self, site):
+        page = get(site, "/login")
+        assert 'id="login-username"' in page
+        assert 'id="password-input"' in page
+
+    def test_directory_cards(self, site):
+        page = get(site, "/directory/game/SMITE/tags/drops")
+        assert page.count('data-a-target="preview-card-title-link"') == 3
+        assert 'href="/channel2"' in page
+
+    def test_live_channel(self, site):
+        page = get(site, "/channel1")
+        assert "<p>LIVE</p>" in page
+        assert 'data-a-target="Drops Enabled"' in page
+        assert 'data-a-target="player-settings-button"' in page
+
+    def test_offline_channel(self, site):
+        page = get(site, "/channel0")
+        assert "LIVE" not in page
+        assert "Drops Enabled" not in page
+
+    def test_inventory(self, site):
+        page = get(site, "/drops/inventory")
+        assert page.count("DropsCampaignInProgressRewardPresentation-claim-button") == 1
+        assert page.count("inventory-drop-image inventory-opacity-2 tw-image") == 3
+        assert 'aria-valuenow="40"' in page
+
+    def test_unknown_page(self, site):
+        with pytest.raises(urllib.error.HTTPError):
+            get(site, "/someone-else")
+
+
+class TestCompare:
+    def results(self, **medians):
+        return {
+            "runs": {
+                "10": {
+                    scenario.replace("_", " "): {"median": median}
+                    for scenario, median in medians.items()
+                }
+            }
+        }
+
+    def test_regression(self):
+        baseline = self.results(find_stream=2.0, claim_drop=1.0)
+        results = self.results(find_stream=3.0, claim_drop=1.1)
+
+        assert bench.compare(baseline, results, 0.25, 0.1) == [
+            ("10", "find stream", 2.0, 3.0)
+        ]
+
+    def test_slack_for_quick_scenarios(self):
+        baseline = self.results(cookie_login=0.01)
+        results = self.results(cookie_login=0.05)
+
+        assert bench.compare(baseline, results, 0.25, 0.1) == []
+
+    def test_new_scenarios_skipped(self):
+        baseline = {"runs": {"1": {"find stream": {"median": 1.0}}}}
+
+        assert bench.compare(baseline, self.results(find_stream=9.0)) == []
+
+    def test_summarise(self):
+        stats = bench.summarise([float(number) for number in range(1, 21)])
+        assert stats == {"median": 10.5, "p95": 19.0, "max": 20.0}
+
+
+@pytest.mark.skipif(chromedriver_missing(), reason="needs the chrome webdriver")
+class TestSmoke:
+    def test_one_account(self, monkeypatch, tmp_path):
+        # The run swaps these for the fake site and a fresh start, put them back afterwards
+        for module, name in [
+            (twitch, "BASE_URL"),
+            (sessions, "validator"),
+            (wait_budget, "budgets"),
+            (reputation, "reputations"),
+            (rate_limit, "limiter"),
+        ]:
+            monkeypatch.setattr(module, name, getattr(module, name))
+
+        bench._isolate(str(tmp_path), rate_limited=False)
+        results = bench.run(1)
+
+        assert list(results) == bench.SCENARIOS
+        assert all(stats["max"] > 0 for stats in results.values())
@@ -0,0 +1,133 @@
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import campaigns
+import discovery
+import main
+
+SMITE = {"game": "SMITE", "tags": ["drops"]}
+PALADINS = {"game": "Paladins", "tags": ["drops"]}
+ROGUE = {"game": "Rogue Company", "tags": []}
+
+NOW = 1_000_000_000  # 2001-09-09T01:46:40Z
+
+
+def campaign(game, watched, required=60, end="2030-01-01T00:00:00Z", claimed=False):
+    return {
+        "game": {"name": game},
+        "endAt": end,
+        "timeBasedDrops": [
+            {
+                "requiredMinutesWatched": required,
+                "self": {"currentMinutesWatched": watched, "isClaimed": claimed},
+            }
+        ],
+    }
+
+
+class TestReadInventory:
+    def test_next_drop(self):
+        progress = campaigns.read_inventory(
+            [
+                {
+                    "game": {"name": "SMITE"},
+                    "endAt": "2001-09-09T02:46:40Z",
+                    "timeBasedDrops": [
+                        {"requiredMinutesWatched": 60, "self": {"currentMinutesWatched": 60, "isClaimed": True}},
+                        {"requiredMinutesWatched": 120, "self": {"currentMinutesWatched": 70, "isClaimed": False}},
+                        {"requiredMinutesWatched": 240, "self": None},
+                    ],
+                }
+            ]
+        )
+
+        assert progress == {"smite": {"remaining": 50, "end": NOW + 3600}}
+
+    def test_earned(self):
+        progress = campaigns.read_inventory([campaign("SMITE", 60)])
+
+        assert progress["smite"]["remaining"] == None
+
+
+class TestScheduler:
+    def test_shortest_first(self):
+        schedule = campaigns.Campaign_Scheduler([SMITE, PALADINS])
+        schedule.update([campaign("SMITE", 0), campaign("Paladins", 50)])
+
+        assert schedule.choose(NOW) == PALADINS
+
+    def test_deadline_first(self):
+        schedule = campaigns.Campaign_Scheduler([SMITE, PALADINS])
+        # SMITE needs an hour and ends in 80 minutes, Paladins is shorter but would make it miss
+        schedule.update(
+            [
+                campaign("SMITE", 0, end="2001-09-09T03:06:40Z"),
+                campaign("Paladins", 30),
+            ]
+        )
+
+        assert schedule.choose(NOW) == SMITE
+
+    def test_skips_infeasible(self):
+        schedule = campaigns.Campaign_Scheduler([SMITE, PALADINS])
+        schedule.update(
+            [
+                campaign("SMITE", 0, end="2001-09-09T02:16:40Z"),
+                campaign("Paladins", 0, required=600),
+            ]
+        )
+
+        assert schedule.choose(NOW) == PALADINS
+
+    def test_tries_unseen_then_done(self):
+        schedule = campaigns.Campaign_Scheduler([SMITE, PALADINS], probe=60)
+        schedule.update([campaign("SMITE", 60, claimed=True)])
+
+        assert schedule.choose(NOW) == PALADINS
+        assert not schedule.done(NOW + 30)
+        assert schedule.done(NOW + 60)
+        assert schedule.choose(NOW + 60) == None
+
+    def test_unread_inventory_never_gives_up(self):
+        schedule = campaigns.Campaign_Scheduler([SMITE], probe=60)
+
+        assert schedule.choose(NOW) == SMITE
+        assert schedule.choose(NOW + 61) == SMITE
+        assert not schedule.done(NOW + 61)
+        assert not schedule.answered()
+
+        # The probe starts once the inventory shows SMITE missing
+        schedule.update([])
+        assert schedule.choose(NOW + 100) == SMITE
+        assert schedule.done(NOW + 160)
+
+    def test_needs_campaign(self):
+        with pytest.raises(ValueError):
+            campaigns.Campaign_Scheduler([])
+
+
+class TestBuildPages:
+    def build(self, drop_campaigns):
+        user = account.Account("stub")
+        user.create(temporary=True)
+        pages, _ = main.build_pages(
+            user, True, True, main.NOTIFICATIONS, drop_campaigns=drop_campaigns
+        )
+        return [page._schedule for page in pages]
+
+    def test_default_needs_no_schedule(self):
+        assert self.build([campaigns.DEFAULT]) == [None, None]
+
+    def test_shared_schedule(self):
+        stream, inventory = self.build([SMITE, PALADINS])
+        assert stream is inventory and stream.campaigns == [SMITE, PALADINS]
+
+
+def test_directory_url():
+    assert discovery.directory_url(SMITE) == "https://www.twitch.tv/directory/game/SMITE/tags/drops"
+    assert discovery.directory_url(ROGUE) == "https://www.twitch.tv/directory/game/Rogue%20Company"
@@ -0,0 +1,69 @@
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import discovery
+
+
+def channel(login, viewers=0):
+    return {"login": login, "id": None, "broadcast id": None, "viewers": viewers}
+
+
+class Fetcher:
+    def __init__(self, channels):
+        self.channels = channels
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if isinstance(self.channels, Exception):
+            raise self.channels
+        return [dict(channel) for channel in self.channels]
+
+
+class TestDirectory:
+    def test_fetches_once_per_ttl(self):
+        fetch = Fetcher([channel("first"), channel("second")])
+        directory = discovery.Directory(fetch, ttl=60)
+
+        for _ in range(10):
+            directory.claim()
+
+        assert fetch.calls == 1
+
+        directory.ttl = 0
+        directory.claim()
+        assert fetch.calls == 2
+
+    def test_spreads_by_rank(self):
+        directory = discovery.Directory(Fetcher([channel("first"), channel("second")]))
+
+        logins = [directory.claim()["login"] for _ in range(4)]
+
+        assert logins == ["first", "second", "first", "second"]
+
+        directory.release("second")
+        directory.release("second")
+        assert directory.claim()["login"] == "second"
+
+    def test_exclude_and_offline(self):
+        directory = discovery.Directory(Fetcher([channel("first"), channel("second")]))
+
+        assert directory.claim(["first"])["login"] == "second"
+
+        directory.offline("second")
+        assert directory.claim(["first"]) == None
+        assert directory.claim()["login"] == "first"
+
+    def test_failed_fetch_keeps_old(self):
+        fetch = Fetcher([channel("first")])
+        directory = discovery.Directory(fetch, ttl=0, retry=60)
+        directory.refresh()
+
+        fetch.channels = ConnectionError("down")
+        assert directory.claim()["login"] == "first"
+        assert directory.claim()["login"] == "first"
+
+        # Waits for the retry before fetching again
+        assert fetch.calls == 2
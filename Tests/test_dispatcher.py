@@ -0,0 +1,118 @@
+import sys
+import time
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+from tell_me_done import dispatcher, sender
+
+
+def user(username, phone="+441234567890"):
+    user = account.Account(username)
+    user.create(phone_number=phone, temporary=True)
+    return user
+
+
+def make(transport, **kwargs):
+    settings = {"window": 0, "backoff": 0.01, "interval": 0}
+    settings.update(kwargs)
+    return dispatcher.Dispatcher(transport, **settings)
+
+
+class TestDispatcher:
+    def test_coalesces_per_user(self):
+        transport = dispatcher.Stub_Transport()
+        dispatch = make(transport, window=60)
+        first, second = user("first"), user("second", "+449876543210")
+
+        start = time.monotonic()
+        for _ in range(3):
+            assert dispatch.submit("Drop is claimable", first)
+        assert dispatch.submit("Your all finished", first)
+        assert dispatch.submit("Drop is claimable", second)
+
+        # Producers never wait for the window or network
+        assert time.monotonic() - start < 0.5
+        assert transport.sent == []
+
+        assert dispatch.flush(5)
+        assert sorted(transport.sent) == [
+            ("+441234567890", "first Drop is claimable (x3); Your all finished"),
+            ("+449876543210", "second Drop is claimable"),
+        ]
+        dispatch.close(5)
+
+    def test_retries_with_backoff(self):
+        transport = dispatcher.Stub_Transport(failures=2)
+        dispatch = make(transport, retries=3)
+
+        dispatch.submit("Drop is claimable", user("first"))
+
+        assert dispatch.flush(5)
+        assert transport.sent == [("+441234567890", "first Drop is claimable")]
+        dispatch.close(5)
+
+    def test_gives_up(self):
+        transport = dispatcher.Stub_Transport(failures=10)
+        dispatch = make(transport, retries=1)
+
+        dispatch.submit("Drop is claimable", user("first"))
+
+        assert dispatch.flush(5)
+        assert transport.sent == []
+        assert transport.failures == 8
+        dispatch.close(5)
+
+    def test_rate_limited_does_not_use_retries(self):
+        transport = dispatcher.Stub_Transport(rate_limits=3)
+        dispatch = make(transport, retries=0)
+
+        dispatch.submit("Drop is claimable", user("first"))
+
+        assert dispatch.flush(5)
+        assert transport.sent == [("+441234567890", "first Drop is claimable")]
+        dispatch.close(5)
+
+    def test_bounded(self):
+        transport = dispatcher.Stub_Transport()
+        dispatch = make(transport, window=60, size=1)
+
+        assert dispatch.submit("Drop is claimable", user("first"))
+        assert not dispatch.submit("Drop is claimable", user("second"))
+        dispatch.close(5)
+
+    def test_connect_builds_transport_once(self, monkeypatch):
+        built = []
+        monkeypatch.setattr(
+            dispatcher,
+            "Twilio_Transport",
+            lambda: built.append(dispatcher.Stub_Transport()) or built[-1],
+        )
+        dispatch = make(None)
+
+        dispatch.connect()
+        dispatch.connect()
+        assert dispatch.submit("Drop is claimable", user("first"))
+        assert dispatch.flush(5)
+
+        assert len(built) == 1
+        assert built[0].sent == [("+441234567890", "first Drop is claimable")]
+
+    def test_no_phone(self):
+        dispatch = make(dispatcher.Stub_Transport())
+
+        assert not dispatch.submit("Drop is claimable", user("first", phone=None))
+        dispatch.close(5)
+
+
+class TestNotifier:
+    def test_send_is_queued(self):
+        transport = dispatcher.Stub_Transport()
+        notifier = sender.Notifier(dispatch=make(transport))
+
+        assert notifier.send("Drop is claimable", user=user("first"))
+
+        notifier.dispatch.flush(5)
+        assert transport.sent == [("+441234567890", "first Drop is claimable")]
+        notifier.dispatch.close(5)
@@ -0,0 +1,103 @@
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import driver_pool
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class FakeDriver:
+    """Records what the pool does to a browser."""
+
+    def __init__(self):
+        self.window_handles = ["main", "extra"]
+        self.switch_to = FakeSwitch(self)
+        self.cookies_cleared = 0
+        self.url = None
+        self.quit_called = False
+
+    def close(self):
+        self.window_handles.remove(self.current)
+
+    def delete_all_cookies(self):
+        self.cookies_cleared += 1
+
+    def execute_cdp_cmd(self, command, params):
+        pass
+
+    def get(self, url):
+        self.url = url
+
+    def quit(self):
+        self.quit_called = True
+
+
+class TestDriverPool:
+    """
+    Test handing out, resetting and recycling webdrivers
+        launched - Every driver the fake launcher has made : Array
+    """
+
+    def setup_method(self):
+        self.launched = []
+
+    def launcher(self, headless):
+        driver = FakeDriver()
+        self.launched.append(driver)
+        return driver
+
+    def test_reuse(self):
+        pool = driver_pool.Driver_Pool(True, size=1, launcher=self.launcher)
+        first = pool.acquire()
+        pool.release(first)
+
+        assert first.url == "about:blank"
+        assert first.window_handles == ["main"]
+        assert first.cookies_cleared == 1
+
+        assert pool.acquire() is first
+        stats = pool.stats()
+        assert stats["launches"] == 1
+        assert stats["reuses"] == 1
+
+    def test_recycle(self):
+        pool = driver_pool.Driver_Pool(True, size=1, max_uses=2, launcher=self.launcher)
+        first = pool.acquire()
+        pool.release(first)
+        assert pool.acquire() is first
+        pool.release(first)
+
+        assert first.quit_called
+        pool.warm(wait=True)
+        assert pool.acquire() is not first
+
+    def test_warm(self):
+        pool = driver_pool.Driver_Pool(True, size=2, launcher=self.launcher)
+        pool.warm(wait=True)
+        assert len(self.launched) == 2
+
+        pool.acquire()
+        pool.acquire()
+        assert len(self.launched) == 2
+        assert pool.stats()["reuses"] == 2
+
+    def test_unknown_driver(self):
+        pool = driver_pool.Driver_Pool(True, launcher=self.launcher)
+        stranger = FakeDriver()
+        pool.release(stranger)
+        assert stranger.quit_called
+
+    def test_close(self):
+        pool = driver_pool.Driver_Pool(True, launcher=self.launcher)
+        driver = pool.acquire()
+        pool.close()
+        pool.release(driver)
+        assert driver.quit_called
@@ -0,0 +1,86 @@
+import json
+import logging
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import log
+
+
+@pytest.fixture
+def directory(tmp_path):
+    log.setup(directory=str(tmp_path), console=False)
+    yield tmp_path
+    log.get("test.quiet").setLevel(logging.NOTSET)
+    log.setup(directory=None)
+
+
+def read(directory):
+    log.flush()
+    with open(path.join(str(directory), "drops.jsonl"), "r") as file:
+        return [json.loads(line) for line in file]
+
+
+class TestWrite:
+    def test_json_line(self, directory):
+        log.write(
+            log.get("test"), "[*] New stream found: https://x", "alice", duration=1.5
+        )
+
+        (line,) = read(directory)
+        assert line["level"] == "INFO"
+        assert line["component"] == "test"
+        assert line["account"] == "alice"
+        assert line["event"] == "new_stream_found"
+        assert line["message"] == "New stream found: https://x"
+        assert line["duration"] == 1.5
+
+    def test_level_from_prefix(self, directory):
+        logger = log.get("test")
+        log.write(logger, "[!] Slow")
+        log.write(logger, "[!!] Broken")
+        log.write(logger, "<< Sent")
+        log.write(logger, "Plain")
+
+        assert [line["level"] for line in read(directory)] == [
+            "WARNING",
+            "ERROR",
+            "INFO",
+            "INFO",
+        ]
+
+    def test_fields(self, directory):
+        log.write(log.get("test"), "[*] Drops processed", event="drops", next_check=60)
+
+        (line,) = read(directory)
+        assert line["event"] == "drops"
+        assert line["next_check"] == 60
+        assert "duration" not in line
+
+    def test_component_level(self, directory):
+        log.setup(directory=str(directory), console=False, levels={"test.quiet": "ERROR"})
+
+        log.write(log.get("test.quiet"), "[!] Hidden")
+        log.write(log.get("test.quiet"), "[!!] Shown")
+        log.write(log.get("test"), "[*] Shown")
+
+        assert [line["message"] for line in read(directory)] == ["Shown", "Shown"]
+
+
+class TestConsole:
+    def record(self, account):
+        record = logging.LogRecord("drops.test", logging.INFO, "", 0, "[*] Hi", (), None)
+        record.structured = {"account": account}
+        return record
+
+    def test_account_line(self):
+        line = log.Console_Formatter().format(self.record("alice"))
+        account, _, message = line.split(" - ")
+        assert account == "alice"
+        assert message == "[*] Hi"
+
+    def test_plain_line(self):
+        assert log.Console_Formatter().format(self.record(None)) == "[*] Hi"
@@ -0,0 +1,98 @@
+import json
+import sys
+import urllib.request
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import metrics
+
+
+class TestMetrics:
+    def test_counter_and_gauge(self):
+        registry = metrics.Registry()
+        clicks = registry.counter("clicks_total", "Clicks", ["result"])
+        running = registry.gauge("running", "Running")
+
+        clicks.inc(result="clicked")
+        clicks.inc(2, result="clicked")
+        clicks.inc(result='say "hi"')
+        running.inc()
+        running.inc()
+        running.dec()
+
+        text = registry.render()
+        assert "# TYPE clicks_total counter" in text
+        assert 'clicks_total{result="clicked"} 3' in text
+        assert 'clicks_total{result="say \\"hi\\""} 1' in text
+        assert "\nrunning 1\n" in text
+
+        with pytest.raises(ValueError):
+            clicks.inc(-1, result="clicked")
+        with pytest.raises(ValueError):
+            clicks.inc(page="stream")
+
+    def test_histogram(self):
+        registry = metrics.Registry()
+        seconds = registry.histogram("launch_seconds", "Launch", ["source"], buckets=(1, 5))
+
+        seconds.observe(0.5, source="launch")
+        seconds.observe(3, source="launch")
+        seconds.observe(60, source="launch")
+
+        text = registry.render()
+        assert 'launch_seconds_bucket{source="launch",le="1"} 1' in text
+        assert 'launch_seconds_bucket{source="launch",le="5"} 2' in text
+        assert 'launch_seconds_bucket{source="launch",le="+Inf"} 3' in text
+        assert 'launch_seconds_count{source="launch"} 3' in text
+
+        value = registry.snapshot()["launch_seconds"]["samples"][0]["value"]
+        assert value["buckets"] == {"1": 1, "5": 1, "+Inf": 1}
+        assert value["sum"] == 63.5
+
+    def test_registered_once(self):
+        registry = metrics.Registry()
+
+        assert registry.counter("clicks_total", "Clicks") is registry.counter("clicks_total", "Clicks")
+        with pytest.raises(ValueError):
+            registry.gauge("clicks_total", "Clicks")
+
+
+class TestExporter:
+    def test_serves_and_dumps(self, tmp_path):
+        registry = metrics.Registry()
+        registry.counter("clicks_total", "Clicks").inc()
+        file = str(tmp_path / "metrics.json")
+
+        exporter = metrics.Exporter(registry, port=0, file=file, interval=60)
+        exporter.start()
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:%d/metrics" % exporter.port) as response:
+                assert "clicks_total 1" in response.read().decode()
+        finally:
+            exporter.close()
+
+        with open(file) as dump:
+            assert json.load(dump)["metrics"]["clicks_total"]["samples"][0]["value"] == 1
+
+    def test_two_exporters(self, tmp_path):
+        registry = metrics.Registry()
+        first = metrics.Exporter(registry, port=0)
+        first.start()
+
+        try:
+            # A second process on the same port carries on without serving
+            clash = metrics.Exporter(registry, port=first.port)
+            clash.start()
+            assert clash.port == None
+            clash.close()
+
+            # Supervisor workers each get their own port and file
+            port, file = metrics.worker_settings(first.port, str(tmp_path / "m.json"), 1)
+            assert port == first.port + 1
+            assert file == str(tmp_path / "m-1.json")
+            assert metrics.worker_settings(None, None, 1) == (None, None)
+        finally:
+            first.close()
@@ -0,0 +1,139 @@
+import json
+import shutil
+import subprocess
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import twitch
+from utility import wait_budget
+from selenium.common.exceptions import TimeoutException
+
+# Stands in for the page, each xpath's element appears after its milliseconds, never if missing
+_PAGE = """
+var appear = %s;
+var start = Date.now();
+var checks = [];
+var XPathResult = {FIRST_ORDERED_NODE_TYPE: 9};
+var document = {
+    evaluate: function (xpath) {
+        checks.push(Date.now() - start);
+        var shown = xpath in appear && Date.now() - start >= appear[xpath];
+        return {singleNodeValue: shown ? {} : null};
+    },
+};
+
+(function () {
+%s
+}).apply(null, %s.concat([function (found) {
+    console.log(JSON.stringify({found: found, checks: checks}));
+}]));
+"""
+
+
+class FakeDriver:
+    """Runs async scripts in node against a page whose elements appear over time."""
+
+    current_url = "https://www.twitch.tv/channel0"
+
+    def __init__(self, appear):
+        self.appear = appear
+        self.script_timeout = None
+        self.checks = []
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_async_script(self, script, *args):
+        program = _PAGE % (json.dumps(self.appear), script, json.dumps(list(args)))
+
+        try:
+            result = subprocess.run(
+                ["node", "-e", program],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=self.script_timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise TimeoutException("script timed out")
+
+        result = json.loads(result.stdout)
+        self.checks = result["checks"]
+        return result["found"]
+
+
+@pytest.fixture
+def budgets(monkeypatch, tmp_path):
+    budgets = wait_budget.Wait_Budgets(file=str(tmp_path / "budgets.json"))
+    monkeypatch.setattr(wait_budget, "budgets", budgets)
+    return budgets
+
+
+def page(appear):
+    user = account.Account("stub")
+    user.create(temporary=True)
+    page = twitch.Twitch(user)
+    page._driver = FakeDriver(appear)
+    return page
+
+
+XPATHS = {"live": twitch.XPATHS["live"], "drops": twitch.XPATHS["drops"]}
+
+
+@pytest.mark.skipif(shutil.which("node") == None, reason="needs node to run the script")
+class TestProbe:
+    def test_first_match(self, budgets):
+        probing = page({XPATHS["drops"]: 300})
+
+        found = probing._probe_xpaths(XPATHS, timeout=5)
+
+        assert found == {"live": False, "drops": True}
+        # Returned as soon as one was found rather than at the deadline
+        assert probing._driver.checks[-1] < 1000
+        assert budgets.timeout("channel", XPATHS["drops"]) == budgets.minimum
+        assert budgets.timeout("channel", XPATHS["live"]) == budgets.maximum
+
+    def test_none_at_deadline(self, budgets):
+        probing = page({})
+
+        found = probing._probe_xpaths(XPATHS, timeout=0.6)
+
+        assert found == {"live": False, "drops": False}
+        assert probing._driver.checks[-1] >= 600
+        assert budgets.timeout("channel", XPATHS["live"]) == budgets.maximum
+
+    def test_poll_interval(self, budgets, monkeypatch):
+        monkeypatch.setattr(twitch, "PROBE_INTERVAL", 0.1)
+        probing = page({})
+
+        probing._probe_xpaths(XPATHS, timeout=0.5)
+
+        # Each check evaluates every xpath once
+        rounds = probing._driver.checks[:: len(XPATHS)]
+        assert len(rounds) == pytest.approx(6, abs=1)
+        assert all(
+            later - earlier >= 100 - 5 for earlier, later in zip(rounds, rounds[1:])
+        )
+
+
+class StuckDriver(FakeDriver):
+    """Never answers, as if the page hung."""
+
+    def execute_async_script(self, script, *args):
+        self.args = args
+        raise TimeoutException("script timed out")
+
+
+class TestProbeStuck:
+    def test_script_timeout(self, budgets):
+        probing = page({})
+        probing._driver = StuckDriver({})
+
+        assert probing._probe_xpaths(XPATHS, timeout=2) == {"live": False, "drops": False}
+        assert probing._driver.script_timeout == 7
+        assert probing._driver.args[1:] == (2000, int(twitch.PROBE_INTERVAL * 1000))
@@ -0,0 +1,143 @@
+import os
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import twitch
+from utility import chrome, profiles
+
+
+class FakeDriver:
+    def __init__(self, cookies=None):
+        self.cookies = cookies or []
+        self.visited = []
+        self.added = []
+        self.quit_count = 0
+
+    def execute_cdp_cmd(self, command, params):
+        return {"cookies": self.cookies}
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def add_cookie(self, cookie):
+        self.added.append(cookie)
+
+    def refresh(self):
+        self.visited.append("refresh")
+
+    def quit(self):
+        self.quit_count += 1
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = profiles.Profile_Store(str(tmp_path), max_bytes=1024)
+    monkeypatch.setattr(profiles, "profiles", store)
+    return store
+
+
+@pytest.fixture
+def launched(monkeypatch, store):
+    launched = []
+
+    def launch(headless, user_data=None):
+        launched.append(user_data)
+        return FakeDriver([{"name": "auth-token", "value": "token"}])
+
+    monkeypatch.setattr(profiles, "ENABLED", True)
+    monkeypatch.setattr(chrome, "launch", launch)
+    return launched
+
+
+def write(file, size):
+    os.makedirs(path.dirname(file), exist_ok=True)
+    with open(file, "wb") as f:
+        f.write(b"0" * size)
+
+
+def page():
+    user = account.Account("stub")
+    user.create(temporary=True)
+    user.cookies = [{"name": "auth-token", "value": "token"}]
+    return twitch.Twitch(user)
+
+
+class TestStore:
+    def test_one_browser_per_profile(self, store):
+        directory = store.acquire("stub")
+
+        assert directory == store.path("stub")
+        assert store.acquire("stub") == None
+        assert store.acquire("other") != None
+
+        store.release("stub")
+        assert store.acquire("stub") == directory
+
+    def test_locked_between_processes(self, store):
+        other = profiles.Profile_Store(store.directory)
+
+        assert store.acquire("stub") != None
+        assert other.acquire("stub") == None
+
+        store.release("stub")
+        assert other.acquire("stub") != None
+
+    def test_caches_cleared(self, store):
+        write(path.join(store.path("stub"), "Default", "Cache", "data"), 2048)
+        write(path.join(store.path("stub"), "Default", "Cookies"), 100)
+
+        store.acquire("stub")
+
+        assert profiles.size(store.path("stub")) == 100
+        assert path.isfile(path.join(store.path("stub"), "Default", "Cookies"))
+
+    def test_wiped_when_still_too_large(self, store):
+        write(path.join(store.path("stub"), "Default", "History"), 2048)
+
+        assert store.trim("stub") == 0
+        assert not path.exists(store.path("stub"))
+
+
+class TestBrowser:
+    def test_profile_used_and_released(self, launched, store):
+        first = page()
+        first._setup_webdriver()
+
+        assert launched == [store.path("stub")]
+        assert first._user_data == store.path("stub")
+
+        driver = first._driver
+        first._release_driver()
+        assert driver.quit_count == 1
+        assert store.acquire("stub") != None
+
+    def test_in_use_falls_back_to_cookies(self, launched, store):
+        first, second = page(), page()
+        first._setup_webdriver()
+        second._setup_webdriver()
+
+        assert launched == [store.path("stub"), None]
+        assert second._user_data == None
+
+    def test_logged_in_profile_skips_page_loads(self, launched, monkeypatch):
+        monkeypatch.setattr(twitch.sessions.validator, "valid", lambda user: True)
+        logged_in = page()
+        logged_in._setup_webdriver()
+
+        assert logged_in._login_by_cookies()
+        assert logged_in._driver.visited == []
+
+        # A stale token in the profile is replaced
+        stale = page()
+        stale.user.username = "stale"
+        stale._setup_webdriver()
+        stale._driver.cookies = [{"name": "auth-token", "value": "old"}]
+
+        assert stale._login_by_cookies()
+        assert stale._driver.added == stale.user.cookies
+        assert stale._driver.visited == [twitch.BASE_URL, "refresh"]
@@ -0,0 +1,50 @@
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import progress
+
+
+class TestProgressTracker:
+    def tracker(self):
+        return progress.Progress_Tracker(minimum=60, maximum=1800, default=600, slack=30)
+
+    def test_unknown_rate(self):
+        tracker = self.tracker()
+        tracker.update({"drop": 50}, when=0)
+        assert tracker.next_check(now=0) == 600
+
+    def test_checks_after_completion(self):
+        tracker = self.tracker()
+        tracker.update({"drop": 50}, when=0)
+        tracker.update({"drop": 60}, when=600)
+
+        # 10% per 10 minutes so 40% left is 2400s away
+        assert tracker.eta("drop", now=600) == 2400
+        assert tracker.next_check(now=600) == 1800
+
+        tracker.update({"drop": 95}, when=2700)
+        assert tracker.eta("drop", now=2700) == 300
+        assert tracker.next_check(now=2700) == 330
+
+    def test_soonest_drop(self):
+        tracker = self.tracker()
+        tracker.update({"slow": 0, "fast": 80}, when=0)
+        tracker.update({"slow": 1, "fast": 90}, when=100)
+        assert tracker.next_check(now=100) == 130
+
+    def test_forget_claimed(self):
+        tracker = self.tracker()
+        tracker.update({"drop": 50}, when=0)
+        tracker.update({"drop": 60}, when=600)
+        tracker.update({}, when=700)
+        assert tracker.eta("drop") == None
+        assert tracker.next_check() == 600
+
+    def test_reset_on_new_drop(self):
+        tracker = self.tracker()
+        tracker.update({"drop": 90}, when=0)
+        tracker.update({"drop": 95}, when=60)
+        tracker.update({"drop": 5}, when=120)
+        assert tracker.eta("drop", now=120) == None
@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import threading
+import time
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import rate_limit
+
+
+class TestTokenBucket:
+    def test_burst_then_rate(self):
+        bucket = rate_limit.Token_Bucket(rate=2, capacity=2)
+        now = time.monotonic()
+
+        assert bucket.take(now) == 0
+        assert bucket.take(now) == 0
+        assert bucket.take(now) == pytest.approx(0.5)
+        assert bucket.take(now + 0.5) == 0
+
+    def test_reserve_ahead(self):
+        bucket = rate_limit.Token_Bucket(rate=1, capacity=1)
+        now = time.monotonic()
+
+        assert bucket.reserve(now) == 0
+        assert bucket.reserve(now) == pytest.approx(1)
+        assert bucket.reserve(now) == pytest.approx(2)
+
+
+class TestRateLimiter:
+    def test_host_limit_across_accounts(self):
+        limiter = rate_limit.Rate_Limiter(host_rate=20, host_burst=1, jitter=0)
+
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=limiter.acquire, args=("user%d" % number,))
+            for number in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # First is free, the other four wait a token each
+        assert time.monotonic() - start >= 4 / 20 - 0.02
+        assert limiter.stats()["navigation"]["count"] == 5
+
+    def test_account_limit(self):
+        limiter = rate_limit.Rate_Limiter(host_rate=1000, account_rate=10, jitter=0)
+
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire("first")
+        limiter.acquire("second")
+
+        assert time.monotonic() - start == pytest.approx(0.2, abs=0.1)
+
+    def test_priority_order(self):
+        limiter = rate_limit.Rate_Limiter(host_rate=10, host_burst=1, jitter=0)
+        limiter.acquire()  # Empty the bucket
+        order = []
+
+        def acquire(priority):
+            limiter.acquire(priority=priority)
+            order.append(priority)
+
+        health = threading.Thread(target=acquire, args=("health",))
+        health.start()
+        time.sleep(0.02)
+        login = threading.Thread(target=acquire, args=("login",))
+        login.start()
+        health.join()
+        login.join()
+
+        assert order == ["login", "health"]
+
+    def test_async(self):
+        limiter = rate_limit.Rate_Limiter(host_rate=20, host_burst=1, jitter=0)
+
+        async def main():
+            start = time.monotonic()
+            await asyncio.gather(*(limiter.acquire_async() for _ in range(3)))
+            return time.monotonic() - start
+
+        assert asyncio.run(main()) >= 2 / 20 - 0.02
+        assert limiter.stats()["navigation"]["count"] == 3
+
+    def test_hosts_limited_apart(self):
+        limiter = rate_limit.Rate_Limiter(
+            host_rate=1,
+            host_burst=1,
+            account_rate=1000,
+            jitter=0,
+            hosts={rate_limit.SPADE_HOST: (1000, 10)},
+        )
+        limiter.acquire("user", rate_limit.HOST)  # Empty the page load bucket
+
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire("user", rate_limit.SPADE_HOST, "health")
+
+        assert time.monotonic() - start < 0.5
+
+    def test_shared_between_processes(self):
+        limiter = rate_limit.Rate_Limiter(
+            host_rate=1, host_burst=5, hosts={rate_limit.GQL_HOST: (20, 40)}
+        )
+        limiter.share(4)
+
+        assert limiter.host_rate == 0.25
+        assert limiter.host_burst == 1.25
+        assert limiter.hosts == {rate_limit.GQL_HOST: (5, 10)}
+
+        with pytest.raises(ValueError):
+            limiter.share(0)
+
+    def test_unknown_priority(self):
+        with pytest.raises(ValueError):
+            rate_limit.Rate_Limiter().acquire(priority="urgent")
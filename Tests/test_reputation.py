@@ -0,0 +1,90 @@
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import discovery
+from utility import reputation
+
+
+def channel(login, viewers=0):
+    return {"login": login, "id": None, "broadcast id": None, "viewers": viewers}
+
+
+class TestReputationStore:
+    def test_stability(self, tmp_path):
+        store = reputation.Reputation_Store(file=str(tmp_path / "reputation.json"), grace=60)
+
+        assert store.stability("unknown") == 0.5
+
+        store.record("flaky", 5, True)
+        store.record("flaky", 10, True)
+        store.record("steady", 3000, False)
+        # Lasting the grace period is good even if it ended offline
+        store.record("steady", 120, True)
+
+        assert store.stability("flaky") == 0.25
+        assert store.stability("steady") == 0.75
+
+    def test_samples_bounded(self, tmp_path):
+        store = reputation.Reputation_Store(file=str(tmp_path / "reputation.json"), samples=2)
+
+        for _ in range(5):
+            store.record("flaky", 0, True)
+        store.record("flaky", 3000, False)
+
+        assert store.stability("flaky") == 0.5
+
+    def test_save_load(self, tmp_path):
+        file = str(tmp_path / "reputation.json")
+        store = reputation.Reputation_Store(file=file)
+        store.record("flaky", 0, True)
+        store.save()
+
+        loaded = reputation.Reputation_Store(file=file)
+        loaded.load()
+
+        assert loaded.stability("flaky") == store.stability("flaky")
+
+    def test_saved_whole(self, tmp_path):
+        store = reputation.Reputation_Store(file=str(tmp_path / "new" / "reputation.json"))
+        store.record("flaky", 0, True)
+        store.save()
+
+        assert [file.name for file in (tmp_path / "new").iterdir()] == ["reputation.json"]
+
+    def test_corrupt_starts_fresh(self, tmp_path):
+        file = tmp_path / "reputation.json"
+        file.write_text('{"flaky": [[0, tr')
+
+        store = reputation.Reputation_Store(file=str(file))
+        store.load()
+        assert store.stability("flaky") == 0.5
+
+
+class TestRanking:
+    def directory(self, channels, tmp_path):
+        store = reputation.Reputation_Store(file=str(tmp_path / "reputation.json"))
+        directory = discovery.Directory(
+            lambda: [dict(channel) for channel in channels], reputations=store
+        )
+        return directory, store
+
+    def test_unstable_ranked_last(self, tmp_path):
+        directory, store = self.directory([channel("flaky"), channel("steady")], tmp_path)
+
+        for _ in range(3):
+            store.record("flaky", 0, True)
+
+        assert directory.claim()["login"] == "steady"
+
+    def test_viewers_raise_score(self, tmp_path):
+        directory, _ = self.directory([channel("small", 1), channel("big", 5000)], tmp_path)
+
+        assert directory.score(channel("small", 1)) < directory.score(channel("big", 5000))
+        assert directory.claim()["login"] == "big"
+
+    def test_excluded(self, tmp_path):
+        directory, _ = self.directory([channel("first"), channel("second")], tmp_path)
+
+        assert directory.claim(["first", "second"]) == None
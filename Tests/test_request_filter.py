@@ -0,0 +1,96 @@
+import json
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import request_filter
+
+
+class FakeDriver:
+    def __init__(self, events=()):
+        self.commands = []
+        self.log = [
+            {"message": json.dumps({"message": {"method": method, "params": params}})}
+            for method, params in events
+        ]
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+    def get_log(self, kind):
+        assert kind == "performance"
+        log, self.log = self.log, []
+        return log
+
+
+class TestProfiles:
+    @pytest.mark.parametrize("profile", list(request_filter.PROFILES))
+    def test_allowed_never_blocked(self, profile):
+        for url in request_filter.ALLOWED:
+            assert not request_filter.blocked(url, profile), url
+
+    def test_blocks(self):
+        assert request_filter.blocked(
+            "https://static-cdn.jtvnw.net/previews-ttv/live_user_streamer-440x248.jpg",
+            "directory",
+        )
+        assert request_filter.blocked(
+            "https://static.twitchcdn.net/assets/roobert.woff2", "inventory"
+        )
+        assert request_filter.blocked("wss://irc-ws.chat.twitch.tv/", "stream")
+        assert not request_filter.blocked("wss://irc-ws.chat.twitch.tv/", "inventory")
+
+    def test_chat_on(self):
+        assert not request_filter.blocked(
+            "wss://irc-ws.chat.twitch.tv/", "stream with chat"
+        )
+        assert request_filter.blocked(
+            "https://extension-files.twitch.tv/abc/panel.html", "stream with chat"
+        )
+
+
+class TestRequestFilter:
+    def test_apply(self):
+        driver = FakeDriver()
+
+        assert request_filter.Request_Filter().apply(driver, "stream")
+        assert driver.commands[-1] == (
+            "Network.setBlockedURLs",
+            {"urls": request_filter.PROFILES["stream"]},
+        )
+
+        with pytest.raises(ValueError):
+            request_filter.Request_Filter().apply(driver, "everything")
+
+    def test_collect(self):
+        driver = FakeDriver(
+            [
+                ("Network.requestWillBeSent", {"requestId": "1", "type": "Image"}),
+                ("Network.loadingFinished", {"requestId": "1", "encodedDataLength": 3000}),
+                ("Network.requestWillBeSent", {"requestId": "2", "type": "Image"}),
+                ("Network.loadingFinished", {"requestId": "2", "encodedDataLength": 1000}),
+                ("Network.requestWillBeSent", {"requestId": "3", "type": "Image"}),
+                (
+                    "Network.loadingFailed",
+                    {"requestId": "3", "type": "Image", "blockedReason": "inspector"},
+                ),
+                (
+                    "Network.loadingFailed",
+                    {"requestId": "4", "type": "Font", "errorText": "net::ERR_BLOCKED_BY_CLIENT"},
+                ),
+                ("Network.loadingFailed", {"requestId": "5", "errorText": "net::ERR_FAILED"}),
+            ]
+        )
+        filters = request_filter.Request_Filter()
+
+        filters.collect(driver)
+        stats = filters.stats()
+
+        assert stats["requests"] == 2
+        assert stats["bytes"] == 4000
+        assert stats["blocked requests"] == 2
+        assert stats["blocked bytes (estimated)"] == 2000
+        assert stats["blocked by type"] == {"Image": 1, "Font": 1}
@@ -0,0 +1,148 @@
+import asyncio
+import sys
+import threading
+import time
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import scheduler
+
+
+class FakePage:
+    """Steps a set number of times, recording what the scheduler did."""
+
+    def __init__(self, user, steps, wait=0.01, fail=False):
+        self.user = user
+        self.steps = steps
+        self.wait = wait
+        self.fail = fail
+        self.calls = []
+        self.threads = set()
+
+    def _setup(self):
+        self.calls.append("setup")
+
+    def _step(self):
+        self.threads.add(threading.current_thread().name)
+        if self.fail:
+            raise RuntimeError("page broke")
+
+        if self.steps == 0:
+            return None
+
+        self.steps -= 1
+        self.calls.append("step")
+        return self.wait
+
+    def _finish(self):
+        self.calls.append("finish")
+
+
+def user(name):
+    user_account = account.Account(name)
+    user_account.create(temporary=True)
+    return user_account
+
+
+class TestScheduler:
+    def test_all_accounts_finish(self):
+        pages = {}
+
+        def build(user_account):
+            pages[user_account.username] = [FakePage(user_account, 3)]
+            return pages[user_account.username], False
+
+        runtime = scheduler.Scheduler(build, accounts=2, blocking=2, tick=0.01)
+        runtime.run([user(str(i)) for i in range(5)])
+
+        assert len(pages) == 5
+        for (page,) in pages.values():
+            assert page.calls == ["setup", "step", "step", "step", "finish"]
+            assert all(name.startswith("blocking") for name in page.threads)
+
+    def test_failed_page_cancels_others(self):
+        healthy = []
+
+        def build(user_account):
+            healthy.append(FakePage(user_account, 1000, wait=10))
+            return [healthy[-1], FakePage(user_account, 0, fail=True)], False
+
+        start = time.time()
+        runtime = scheduler.Scheduler(build, tick=0.01)
+        runtime.run([user("broken")])
+
+        assert time.time() - start < 5
+        assert healthy[0].calls[-1] == "finish"
+
+    def test_timed_out_step_not_overlapped(self):
+        pages = []
+
+        def build(user_account):
+            pages.append(SlowPage(user_account, [0.35, 0]))
+            return pages, False
+
+        runtime = scheduler.Scheduler(build, timeout=0.1, max_timeouts=5, tick=0.01)
+        runtime.run([user("slow")])
+
+        assert pages[0].most_at_once == 1
+        assert pages[0].calls == ["setup", "step", "step", "finish"]
+
+    def test_stuck_step_drops_page(self):
+        pages = []
+
+        def build(user_account):
+            pages.append(SlowPage(user_account, [0.5]))
+            return pages, False
+
+        runtime = scheduler.Scheduler(build, timeout=0.1, max_timeouts=2, tick=0.01)
+        runtime.run([user("stuck")])
+
+        assert pages[0].most_at_once == 1
+        assert "finish" not in pages[0].calls
+
+
+class SlowPage(FakePage):
+    """Each step sleeps for the next of its durations, recording overlapping steps."""
+
+    def __init__(self, user, durations):
+        FakePage.__init__(self, user, len(durations))
+        self.durations = list(durations)
+        self.at_once = 0
+        self.most_at_once = 0
+        self.lock = threading.Lock()
+
+    def _step(self):
+        with self.lock:
+            self.at_once += 1
+            self.most_at_once = max(self.most_at_once, self.at_once)
+
+        try:
+            if self.durations:
+                time.sleep(self.durations.pop(0))
+            return FakePage._step(self)
+        finally:
+            with self.lock:
+                self.at_once -= 1
+
+
+class TestTimerWheel:
+    def test_sleep(self):
+        async def sleeps():
+            wheel = scheduler.Timer_Wheel(tick=0.01, slots=4)
+            wheel.start()
+            loop = asyncio.get_running_loop()
+
+            start = loop.time()
+            # Longer than one turn of the wheel
+            await wheel.sleep(0.1)
+            elapsed = loop.time() - start
+
+            cancelled = wheel.sleep(0.02)
+            cancelled.cancel()
+            await wheel.sleep(0.05)
+            wheel.stop()
+            return elapsed
+
+        assert 0.09 <= asyncio.run(sleeps()) < 1
@@ -0,0 +1,158 @@
+import http.server
+import json
+import sys
+import threading
+import time
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import sessions
+import twitch
+
+
+class StubValidate(http.server.BaseHTTPRequestHandler):
+    """Stand in for id.twitch.tv/oauth2/validate, the server holds tokens to seconds left."""
+
+    def do_GET(self):
+        self.server.checks += 1
+        token = self.headers.get("Authorization", "")[len("OAuth ") :]
+
+        if token not in self.server.tokens:
+            self.reply(401, {"status": 401, "message": "invalid access token"})
+        else:
+            self.reply(200, {"login": "stub", "expires_in": self.server.tokens[token]})
+
+    def reply(self, status, data):
+        raw = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubValidate)
+    server.tokens = {"good": 3600, "long": 36000, "forever": 0}
+    server.checks = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def validator(server, monkeypatch):
+    validator = sessions.Session_Validator(
+        "http://127.0.0.1:%d/oauth2/validate" % server.server_address[1]
+    )
+    monkeypatch.setattr(sessions, "validator", validator)
+    return validator
+
+
+def user(token="good", password=None, expiry=None):
+    user = account.Account("stub")
+    user.create(password, temporary=True)
+    user.cookies = [{"name": "auth-token", "value": token}]
+    if expiry != None:
+        user.cookies[0]["expiry"] = expiry
+    return user
+
+
+class TestValidator:
+    def test_valid_records_expiry(self, validator):
+        account = user()
+
+        assert validator.valid(account)
+        assert account.expires == pytest.approx(time.time() + 3600, abs=5)
+
+    def test_cookie_expiry_when_twitch_does_not_say(self, validator):
+        account = user("forever", expiry=1900000000)
+
+        assert validator.valid(account)
+        assert account.expires == 1900000000
+
+    def test_rejected(self, validator):
+        assert not validator.valid(user("expired"))
+
+    def test_no_cookies(self, validator):
+        account = user()
+        account.cookies = None
+
+        assert not validator.valid(account)
+
+    def test_cached(self, validator, server):
+        account = user()
+
+        assert validator.valid(account)
+        assert validator.valid(account)
+        assert server.checks == 1
+
+        # New cookies are checked again
+        account.cookies = [{"name": "auth-token", "value": "expired"}]
+        assert not validator.valid(account)
+        assert server.checks == 2
+
+    def test_unreachable_counts_as_valid(self):
+        validator = sessions.Session_Validator("http://127.0.0.1:1/oauth2/validate")
+
+        assert validator.valid(user())
+
+    def test_expiring(self):
+        account = user()
+        assert not sessions.validator.expiring(account, 60, now=0)
+
+        account.expires = 100
+        assert sessions.validator.expiring(account, 60, now=50)
+        assert not sessions.validator.expiring(account, 60, now=30)
+
+
+class TestSessionWatcher:
+    def test_warns_expiring_and_invalid_once(self, validator):
+        expiring = user("good")
+        expiring.username = "expiring"
+        invalid = user("expired")
+        invalid.username = "invalid"
+        fine = user("long")
+        fine.username = "fine"
+
+        watcher = sessions.Session_Watcher([expiring, invalid, fine], margin=1800)
+
+        assert watcher.check(now=time.time() + 2000) == ["expiring", "invalid"]
+        assert watcher.check(now=time.time() + 2000) == []
+
+        # New cookies are watched again
+        invalid.cookies = [{"name": "auth-token", "value": "revoked"}]
+        assert watcher.check(now=time.time() + 2000) == ["invalid"]
+
+    def test_no_cookies(self, validator):
+        account = user()
+        account.cookies = None
+
+        assert sessions.Session_Watcher([account]).check() == []
+
+    def test_next_check(self):
+        account = user()
+        account.expires = 10000
+        watcher = sessions.Session_Watcher([account], margin=1000, interval=3600)
+
+        assert watcher.next_check(now=8000) == 1000
+        assert watcher.next_check(now=9500) == 60
+        assert watcher.next_check(now=0) == 3600
+
+
+class TestBrowserLogin:
+    def test_invalid_cookies_skip_the_browser(self, validator):
+        page = twitch.Twitch(user("expired"))
+        page._driver = None  # Any use of the driver would fail
+
+        assert not page._login_by_cookies()
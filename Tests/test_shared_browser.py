@@ -0,0 +1,168 @@
+import sys
+import threading
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import twitch
+from utility import chrome, rate_limit
+from selenium.common.exceptions import WebDriverException
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        if self.driver.broken:
+            raise WebDriverException("browser gone")
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """Browser with one tab open, more are opened with window.open."""
+
+    def __init__(self, name="browser"):
+        self.name = name
+        self.window_handles = [name + "0"]
+        self.current_window_handle = self.window_handles[0]
+        self.switch_to = FakeSwitch(self)
+        self.broken = False
+
+    def execute_script(self, script, *args):
+        if "window.open" in script:
+            self.window_handles.append(self.name + str(len(self.window_handles)))
+
+    def execute_cdp_cmd(self, command, params):
+        return {}
+
+    def get(self, url):
+        pass
+
+    def add_cookie(self, cookie):
+        pass
+
+    def refresh(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def launched(monkeypatch):
+    launched = []
+
+    def launch(headless, user_data=None):
+        launched.append(FakeDriver("browser%d-" % len(launched)))
+        return launched[-1]
+
+    monkeypatch.setattr(chrome, "launch", launch)
+    monkeypatch.setattr(twitch.sessions.validator, "valid", lambda user: True)
+    monkeypatch.setattr(
+        rate_limit, "limiter", rate_limit.Rate_Limiter(1000, 1000, 1000, 1000, 0)
+    )
+    return launched
+
+
+def pages(count=2):
+    user = account.Account("stub")
+    user.create(temporary=True)
+    user.cookies = [{"name": "auth-token", "value": "token"}]
+    session = twitch.Session(user)
+    return session, [
+        twitch.Twitch(user, headless=True, session=session) for _ in range(count)
+    ]
+
+
+def held_elsewhere(lock):
+    """Is the lock held, checked from another thread as it is reentrant."""
+    acquired = []
+
+    def acquire():
+        acquired.append(lock.acquire(timeout=1))
+        if acquired[0]:
+            lock.release()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    thread.join()
+    return not acquired[0]
+
+
+class TestSharedBrowser:
+    def test_one_browser_a_tab_each(self, launched):
+        session, (first, second) = pages()
+        first._setup()
+        second._setup()
+
+        assert len(launched) == 1
+        assert first._tab == "browser0-0"
+        assert second._tab == "browser0-1"
+
+        with first._focus():
+            assert launched[0].current_window_handle == "browser0-0"
+        with second._focus():
+            assert launched[0].current_window_handle == "browser0-1"
+
+    def test_new_tab_after_restart(self, launched):
+        session, (first, second) = pages()
+        first._setup()
+        second._setup()
+
+        # The other page restarted the browser, this page's tab went with it
+        session.replace(FakeDriver("restarted"))
+
+        with first._focus():
+            assert first._driver is session.driver
+            assert first._tab == "restarted0"
+            assert first._generation == session.generation
+
+        assert len(launched) == 1
+
+    def test_turn_waited_before_lock_after_restart(self, launched, monkeypatch):
+        user = account.Account("stub")
+        user.create(temporary=True)
+        user.cookies = [{"name": "auth-token", "value": "token"}]
+        session = twitch.Session(user)
+        inventory = twitch.Inventory(user, session=session)
+        inventory._setup()
+
+        waited = []
+        monkeypatch.setattr(
+            inventory,
+            "_wait_turn",
+            lambda priority="navigation": waited.append(held_elsewhere(session.lock)),
+        )
+        session.replace(FakeDriver("restarted"))
+
+        with inventory._focus():
+            assert inventory._tab == "restarted0"
+
+        assert waited == [False]
+
+    def test_lock_released_when_focus_fails(self, launched):
+        session, (first, second) = pages()
+        first._setup()
+        second._setup()
+        launched[0].broken = True
+
+        with pytest.raises(WebDriverException):
+            with first._focus():
+                pass
+
+        assert not held_elsewhere(session.lock)
+
+    def test_lock_released_on_error(self, launched):
+        session, (page,) = pages(1)
+        page._setup()
+
+        with pytest.raises(RuntimeError):
+            with page._focus():
+                assert held_elsewhere(session.lock)
+                raise RuntimeError
+
+        assert not held_elsewhere(session.lock)
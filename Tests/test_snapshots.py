@@ -0,0 +1,119 @@
+import sys
+import threading
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Benchmarks"))
+
+pytest.importorskip("lxml")
+
+import fake_twitch
+import replay
+import twitch
+from utility import snapshots
+
+CHANNEL = fake_twitch.channel_page("channel0")
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    return snapshots.Snapshot_Recorder(str(tmp_path), limit=2)
+
+
+class TestEvaluate:
+    def test_fake_pages(self):
+        assert replay.check_fake_pages() == []
+
+    def test_error(self):
+        page = fake_twitch._PAGE % ("Error", "<p>Error #2000 - network</p>")
+        found = snapshots.evaluate(page, {"error": twitch.XPATHS["error"]})
+        assert found == {"error": True}
+
+    def test_empty_page(self):
+        assert snapshots.evaluate("", {"live": twitch.XPATHS["live"]}) == {"live": False}
+
+    def test_label(self):
+        assert snapshots.label({"live": True, "drops": True, "error": False}) == "drops+live"
+        assert snapshots.label({"error": False}) == "none"
+
+
+class TestRecorder:
+    def test_replay_agrees(self, recorder):
+        recorder.record("channel", {"live": True, "error": False}, CHANNEL, "http://x/c")
+
+        (snapshot,) = recorder.snapshots()
+        assert snapshot["url"] == "http://x/c"
+        assert recorder.source(snapshot) == CHANNEL
+        assert recorder.replay(twitch.XPATHS) == []
+
+    def test_replay_disagrees(self, recorder):
+        recorder.record("channel", {"live": False, "unknown": True}, CHANNEL)
+
+        ((_, name, recorded, replayed),) = recorder.replay(twitch.XPATHS)
+        assert (name, recorded, replayed) == ("live", False, True)
+
+    def test_limit_per_label(self, recorder, tmp_path):
+        for _ in range(3):
+            recorder.record("channel", {"live": True}, CHANNEL)
+        recorder.record("channel", {"live": False}, CHANNEL)
+
+        assert len(recorder.snapshots()) == 3
+        assert not recorder.wanted("channel", {"live": True})
+
+        # Counts survive a restart
+        again = snapshots.Snapshot_Recorder(str(tmp_path), limit=2)
+        assert again.record("channel", {"live": True}, CHANNEL) == None
+
+
+class FakeDriver:
+    current_url = "https://www.twitch.tv/channel0"
+
+    def __init__(self, source):
+        self.page_source = source
+
+    def refresh(self):
+        pass
+
+    def execute_script(self, script, *args):
+        return []
+
+
+class TestClassify:
+    def page(self, source):
+        user = twitch.account.Account("stub")
+        user.create(temporary=True)
+        page = twitch.Stream(user)
+        page._driver = FakeDriver(source)
+        return page
+
+    def test_one_copy(self):
+        found = self.page(CHANNEL)._classify(["live", "drops", "error"])
+        assert found == {"live": True, "drops": True, "error": False}
+
+    def test_records(self, monkeypatch, recorder):
+        monkeypatch.setattr(snapshots, "RECORD", True)
+        monkeypatch.setattr(snapshots, "recorder", recorder)
+
+        self.page(CHANNEL)._classify(["live"])
+
+        (snapshot,) = recorder.snapshots()
+        assert snapshot["page"] == "channel"
+        assert snapshot["found"] == {"live": True}
+
+    def test_claim_missed_by_the_copy_still_tried(self, monkeypatch):
+        user = twitch.account.Account("stub")
+        user.create(temporary=True)
+        inventory = twitch.Inventory(user, threading.Event())
+        inventory._driver = FakeDriver(fake_twitch.inventory_page(claimable=0))
+        inventory._stepped = True
+        claims = []
+
+        monkeypatch.setattr(inventory, "_wait_turn", lambda priority="navigation": None)
+        monkeypatch.setattr(inventory, "_check_error", lambda: False)
+        monkeypatch.setattr(inventory, "_claim_drop", lambda: claims.append(1))
+
+        inventory._step()
+
+        assert claims == [1]
@@ -0,0 +1,254 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import accounts, storage
+
+
+def user(cookies=None):
+    return {
+        "password": None,
+        "phone": "+441234567890",
+        "admin": True,
+        "cookies": cookies,
+        "expires": None,
+    }
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        store = storage.Json_Store(str(tmp_path / "users"))
+    else:
+        store = storage.Sqlite_Store(str(tmp_path / "users.db"))
+
+    yield store
+    store.close()
+
+
+class TestStores:
+    def test_round_trip(self, store):
+        store.save("first", user([{"name": "auth-token", "value": "1"}]))
+
+        assert store.exists("first")
+        assert store.load("first") == user([{"name": "auth-token", "value": "1"}])
+        assert store.load_all() == {"first": user([{"name": "auth-token", "value": "1"}])}
+
+    def test_delete(self, store):
+        store.save("first", user())
+        store.delete("first")
+
+        assert not store.exists("first")
+        with pytest.raises(FileNotFoundError):
+            store.load("first")
+        with pytest.raises(FileNotFoundError):
+            store.delete("first")
+
+    def test_many_users(self, store):
+        store.save_many({"user%d" % number: user() for number in range(1000)})
+
+        start = time.perf_counter()
+        users = store.load_all()
+
+        assert len(users) == 1000
+        if isinstance(store, storage.Sqlite_Store):
+            assert time.perf_counter() - start < 0.5
+
+
+    def test_expiry_round_trip(self, store):
+        data = dict(user([{"name": "auth-token", "value": "1"}]), expires=1700000000.5)
+        store.save("first", data)
+
+        assert store.load("first") == data
+
+
+class TestSqliteStore:
+    def test_database_from_before_expiry(self, tmp_path):
+        connection = sqlite3.connect(str(tmp_path / "users.db"))
+        connection.execute(
+            "CREATE TABLE users (username TEXT PRIMARY KEY, password TEXT, phone TEXT,"
+            " admin INTEGER, cookies TEXT, updated INTEGER)"
+        )
+        connection.execute("INSERT INTO users VALUES ('first', NULL, NULL, 1, 'null', 1)")
+        connection.commit()
+        connection.close()
+
+        store = storage.Sqlite_Store(str(tmp_path / "users.db"))
+        assert store.load("first")["expires"] == None
+        store.close()
+
+
+def save_in_worker(parent_store):
+    """Forked worker, must get its own store and writer rather than the parent's."""
+    if storage.store() is parent_store:
+        os._exit(1)
+
+    storage.store().save("worker", user())
+    storage.writer().flush()
+    os._exit(0)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+class TestForkedWorkers:
+    def test_own_store_per_process(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(storage, "BACKEND", "sqlite")
+        monkeypatch.setattr(storage, "_resources", str(tmp_path))
+        monkeypatch.setattr(storage, "_store", None)
+        monkeypatch.setattr(storage, "_writer", None)
+        monkeypatch.setattr(storage, "_pid", None)
+        parent = storage.store()
+
+        worker = multiprocessing.get_context("fork").Process(
+            target=save_in_worker, args=(parent,)
+        )
+        worker.start()
+        worker.join(30)
+
+        assert worker.exitcode == 0
+        assert parent.load("worker") == user()
+        assert storage.store() is parent
+        parent.close()
+
+
+class TestJsonStore:
+    def test_no_temporary_files_left(self, tmp_path):
+        store = storage.Json_Store(str(tmp_path))
+        store.save("first", user())
+
+        assert sorted(file.name for file in tmp_path.iterdir()) == ["first.json"]
+        assert json.loads((tmp_path / "first.json").read_text()) == user()
+
+
+class TestWriteBehind:
+    def test_batches_saves(self, tmp_path):
+        saves = []
+
+        class Recorder:
+            def save_many(self, users):
+                saves.append(users)
+
+        writer = storage.Write_Behind(Recorder(), delay=60)
+
+        for number in range(100):
+            writer.put("first", user([{"value": number}]))
+        writer.put("second", user())
+
+        assert writer.get("first") == user([{"value": 99}])
+        assert saves == []
+
+        writer.flush()
+
+        assert saves == [{"first": user([{"value": 99}]), "second": user()}]
+        assert writer.get("first") == None
+
+    def test_flushes_after_delay(self, tmp_path):
+        store = storage.Json_Store(str(tmp_path))
+        writer = storage.Write_Behind(store, delay=0.01)
+        writer.put("first", user())
+
+        time.sleep(0.5)
+
+        assert store.load("first") == user()
+
+    def test_failed_write_requeued(self, tmp_path):
+        class Failing:
+            fails = 1
+            saves = []
+
+            def save_many(self, users):
+                if self.fails:
+                    self.fails -= 1
+                    raise sqlite3.OperationalError("database is locked")
+                self.saves.append(users)
+
+        writer = storage.Write_Behind(Failing(), delay=60)
+        writer.put("first", user())
+
+        assert not writer.flush()
+        writer.put("second", user())
+        assert writer.pending() == {"first": user(), "second": user()}
+
+        assert writer.flush()
+        assert Failing.saves == [{"first": user(), "second": user()}]
+
+    def test_migrate(self, tmp_path):
+        source = storage.Json_Store(str(tmp_path / "users"))
+        source.save_many({"first": user(), "second": user([{"value": 1}])})
+        destination = storage.Sqlite_Store(str(tmp_path / "users.db"))
+
+        assert storage.migrate(source, destination) == 2
+        assert destination.load_all() == source.load_all()
+        destination.close()
+
+
+class TestRegistry:
+    def registry(self, tmp_path):
+        store = storage.Json_Store(str(tmp_path))
+        store.save_many(
+            {
+                "first": user(),
+                "second": {"password": None, "phone": None, "admin": False, "cookies": None},
+            }
+        )
+        return store, accounts.Registry(store, interval=0)
+
+    def touch(self, tmp_path, username, step=1):
+        # Make sure the mtime moves on coarse filesystems
+        file = tmp_path / (username + ".json")
+        stat = file.stat()
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + step * 10**9))
+
+    def test_indexes(self, tmp_path):
+        _, registry = self.registry(tmp_path)
+
+        assert "first" in registry
+        assert "third" not in registry
+        assert registry.by_phone("+441234567890").username == "first"
+        assert [user.username for user in registry.admins()] == ["first"]
+        assert len(registry.accounts()) == 2
+
+    def test_reloads_only_changed(self, tmp_path):
+        store, registry = self.registry(tmp_path)
+        first, second = registry.get("first"), registry.get("second")
+
+        store.save("second", {"password": None, "phone": "+449876543210", "admin": True, "cookies": None})
+        self.touch(tmp_path, "second")
+        loads = []
+        load = store.load
+        store.load = lambda username: loads.append(username) or load(username)
+
+        assert registry.by_phone("+449876543210") is second
+        assert loads == ["second"]
+        assert registry.get("first") is first
+        assert len(registry.admins()) == 2
+
+    def test_deleted(self, tmp_path):
+        store, registry = self.registry(tmp_path)
+        registry.refresh()
+
+        store.delete("first")
+
+        assert "first" not in registry
+        assert registry.by_phone("+441234567890") == None
+        assert registry.admins() == []
+
+    def test_refresh_interval(self, tmp_path):
+        store, registry = self.registry(tmp_path)
+        registry.interval = 60
+        registry.refresh()
+
+        store.delete("first")
+
+        assert "first" in registry
+        registry.refresh(force=True)
+        assert "first" not in registry
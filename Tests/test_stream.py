@@ -0,0 +1,155 @@
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import twitch
+from utility import chrome, rate_limit, reputation
+from selenium.common.exceptions import WebDriverException
+
+
+class FakeDriver:
+    def __init__(self, height=None, cdp=True, cards=()):
+        self.height = height
+        self.cdp = cdp
+        self.cards = list(cards)
+        self.commands = []
+        self.visited = []
+
+    def execute_cdp_cmd(self, command, params):
+        if not self.cdp:
+            raise WebDriverException("no devtools")
+        self.commands.append((command, params))
+        return {"identifier": "1"}
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, *args):
+        return self.height
+
+    def execute_script(self, script, *args):
+        return self.cards
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def add_cookie(self, cookie):
+        self.commands.append(("add_cookie", cookie))
+
+    def refresh(self):
+        self.visited.append("refresh")
+
+    def quit(self):
+        pass
+
+
+def stream(driver, chat_on=False):
+    user = account.Account("stub")
+    user.create(temporary=True)
+    page = twitch.Stream(user, chat_on=chat_on)
+    page._driver = driver
+    return page
+
+
+@pytest.fixture
+def reputations(monkeypatch, tmp_path):
+    store = reputation.Reputation_Store(file=str(tmp_path / "reputation.json"))
+    monkeypatch.setattr(reputation, "reputations", store)
+    return store
+
+
+class TestSetup:
+    def test_logs_in_and_preseeds(self, monkeypatch):
+        driver = FakeDriver()
+        monkeypatch.setattr(chrome, "launch", lambda headless, user_data=None: driver)
+        monkeypatch.setattr(twitch.sessions.validator, "valid", lambda user: True)
+        monkeypatch.setattr(
+            rate_limit, "limiter", rate_limit.Rate_Limiter(1000, 1000, 1000, 1000, 0)
+        )
+
+        user = account.Account("stub")
+        user.create(temporary=True)
+        user.cookies = [{"name": "auth-token", "value": "token"}]
+        page = twitch.Stream(user, headless=True)
+
+        page._setup()
+
+        assert page._driver is driver
+        assert driver.visited == [twitch.BASE_URL, "refresh"]
+        assert ("add_cookie", user.cookies[0]) in driver.commands
+        assert page._preseeded
+
+
+class TestPreseed:
+    def test_preferences_injected(self):
+        driver = FakeDriver()
+        page = stream(driver)
+
+        page._preseed_player()
+
+        assert page._preseeded
+        command, params = driver.commands[0]
+        assert command == "Page.addScriptToEvaluateOnNewDocument"
+        assert '\\"160p30\\"' in params["source"]
+        assert "chatPaneCollapsed" in params["source"]
+
+    def test_chat_left_alone(self):
+        driver = FakeDriver()
+        page = stream(driver, chat_on=True)
+
+        page._preseed_player()
+
+        assert "chatPaneCollapsed" not in driver.commands[0][1]["source"]
+        assert page._profile == "stream with chat"
+
+    def test_no_devtools(self):
+        page = stream(FakeDriver(cdp=False))
+
+        page._preseed_player()
+
+        assert not page._preseeded
+
+    def test_quality_check(self):
+        assert stream(FakeDriver(height=160))._check_low_quality()
+        assert not stream(FakeDriver(height=1080))._check_low_quality()
+        assert not stream(FakeDriver(height=None))._check_low_quality()
+
+
+class TestFailover:
+    def page(self, monkeypatch, live):
+        driver = FakeDriver(cards=["/offline", "/OFFLINE", "/live/videos", "/later"])
+        page = stream(driver)
+        monkeypatch.setattr(page, "_wait_turn", lambda priority="navigation": None)
+        monkeypatch.setattr(
+            page,
+            "_probe_xpaths",
+            lambda xpaths, timeout=None: dict.fromkeys(
+                xpaths, driver.visited[-1].endswith("/" + live)
+            ),
+        )
+        return page, driver
+
+    def test_next_candidate_without_reload(self, monkeypatch, reputations):
+        page, driver = self.page(monkeypatch, "live")
+
+        assert page._find_stream()
+
+        assert page._channel == "live"
+        assert driver.visited[1:] == [
+            "https://www.twitch.tv/offline",
+            "https://www.twitch.tv/live",
+        ]
+        assert page._failed == ["offline"]
+        assert page._candidates == ["later"]
+        assert reputations.stability("offline") < 0.5
+
+    def test_stable_first(self, monkeypatch, reputations):
+        reputations.record("offline", 0, True)
+        page, driver = self.page(monkeypatch, "live")
+
+        assert page._find_stream()
+        assert driver.visited[1:] == ["https://www.twitch.tv/live"]
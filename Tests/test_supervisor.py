@@ -0,0 +1,37 @@
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import supervisor
+
+
+def crashing_worker(usernames, threads, events, worker, workers):
+    """Finishes every user apart from "crash", which takes the process down."""
+    for username in usernames:
+        if username == "crash":
+            sys.exit(1)
+        events.put(username)
+
+
+class TestPartition:
+    def test_round_robin(self):
+        assert supervisor.partition(["a", "b", "c", "d", "e"], 2) == [
+            ["a", "c", "e"],
+            ["b", "d"],
+        ]
+
+    def test_more_shards_than_users(self):
+        assert supervisor.partition(["a"], 4) == [["a"]]
+
+
+class TestSupervisor:
+    def test_restarts_then_gives_up(self):
+        boss = supervisor.Supervisor(
+            processes=2, max_restarts=1, target=crashing_worker
+        )
+
+        given_up = boss.run(["a", "crash", "b", "c"], finalise=False)
+
+        assert given_up == ["crash"]
+        assert boss._done == 3
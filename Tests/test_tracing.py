@@ -0,0 +1,86 @@
+import json
+import sys
+import threading
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import tracing
+
+
+class User:
+    def __init__(self, username):
+        self.username = username
+
+
+class Page:
+    def __init__(self, username):
+        self.user = User(username)
+
+    @tracing.traced()
+    def _login(self):
+        return self._find()
+
+    @tracing.traced("find")
+    def _find(self):
+        return True
+
+    @tracing.traced()
+    def _fail(self):
+        raise LookupError
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    tracer = tracing.Tracer(sample=0, always=["slow"], limit=3, file=str(tmp_path / "trace.json"))
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    return tracer
+
+
+class TestTracer:
+    def test_sampling(self):
+        assert tracing.Tracer(sample=1).sampled("anyone")
+        assert not tracing.Tracer(sample=0).sampled("anyone")
+        assert tracing.Tracer(sample=0, always=["slow"]).sampled("slow")
+
+        half = tracing.Tracer(sample=0.5)
+        users = ["user%d" % number for number in range(200)]
+        assert 50 < sum(half.sampled(user) for user in users) < 150
+        assert [half.sampled(user) for user in users] == [half.sampled(user) for user in users]
+
+    def test_nested_spans(self, tracer):
+        assert Page("slow")._login()
+        Page("fast")._login()
+
+        spans = [event for event in tracer.events() if event["ph"] == "X"]
+        assert [span["name"] for span in spans] == ["find", "Page._login"]
+        assert spans[0]["ts"] >= spans[1]["ts"]
+        assert spans[0]["ts"] + spans[0]["dur"] <= spans[1]["ts"] + spans[1]["dur"]
+        assert spans[1]["args"]["account"] == "slow"
+        assert spans[1]["args"]["thread"] == threading.current_thread().name
+        assert spans[1]["args"]["result"] == True
+
+        names = [event["args"]["name"] for event in tracer.events() if event["ph"] == "M"]
+        assert names == ["slow", threading.current_thread().name]
+
+    def test_error_recorded(self, tracer):
+        with pytest.raises(LookupError):
+            Page("slow")._fail()
+
+        assert tracer.events()[-1]["args"]["error"] == "LookupError"
+
+    def test_bounded_and_saved(self, tracer):
+        for _ in range(5):
+            tracer.instant("claimed", "slow")
+
+        file = tracer.save()
+
+        with open(file) as trace:
+            data = json.load(trace)
+        assert len([event for event in data["traceEvents"] if event["ph"] == "i"]) == 3
+        assert data["otherData"]["dropped events"] == 2
+
+    def test_nothing_to_save(self, tmp_path):
+        assert tracing.Tracer(file=str(tmp_path / "trace.json")).save() == None
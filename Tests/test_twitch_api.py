@@ -0,0 +1,357 @@
+import base64
+import http.server
+import json
+import sys
+import threading
+import urllib.parse
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+import account
+import campaigns
+import discovery
+import twitch_api
+from utility import progress, rate_limit, reputation
+
+
+class StubTwitch(http.server.BaseHTTPRequestHandler):
+    """Minimal stand in for the Twitch GraphQL endpoint.
+
+    The server object holds the state: drops, claimed, requests, live, heartbeats, drops_event.
+    """
+
+    def do_GET(self):
+        # Channel page, only the heartbeat url is needed
+        page = '<script>window.__settings = {"spade_url": "http://127.0.0.1:%d/spade"};</script>' % (
+            self.server.server_address[1]
+        )
+        raw = page.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        if self.path == "/spade":
+            form = urllib.parse.parse_qs(
+                self.rfile.read(int(self.headers["Content-Length"])).decode()
+            )
+            self.server.heartbeats.append(
+                json.loads(base64.b64decode(form["data"][0]))[0]
+            )
+
+            if len(self.server.heartbeats) >= 3:
+                self.server.drops_event.set()
+
+            self.send_response(204)
+            self.end_headers()
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((body, dict(self.headers)))
+
+        anonymous = body["operationName"] == "DirectoryPage_Game" and "Authorization" not in self.headers
+        if self.headers.get("Authorization") != "OAuth token" and not anonymous:
+            self.reply({"errors": [{"message": "unauthorized"}], "data": None})
+            return
+
+        if body["operationName"] == "Inventory":
+            self.reply(
+                {
+                    "data": {
+                        "currentUser": {
+                            "id": "1",
+                            "inventory": {
+                                "dropCampaignsInProgress": [
+                                    {
+                                        "id": "campaign",
+                                        "name": "SMITE",
+                                        "endAt": "2030-01-01T00:00:00Z",
+                                        "game": {"name": "SMITE"},
+                                        "timeBasedDrops": self.server.drops,
+                                    }
+                                ]
+                            },
+                        }
+                    }
+                }
+            )
+
+        elif body["operationName"] == "CurrentUser":
+            self.reply({"data": {"currentUser": {"id": "1", "login": "stub"}}})
+
+        elif body["operationName"] == "DirectoryPage_Game":
+            assert body["variables"]["options"]["tags"] == [twitch_api.DROPS_TAG]
+            edges = [
+                {
+                    "node": {
+                        "id": "broadcast",
+                        "viewersCount": 10,
+                        "broadcaster": {"id": "99", "login": "streamer"},
+                    }
+                },
+                {
+                    "node": {
+                        "id": "other broadcast",
+                        "viewersCount": 5,
+                        "broadcaster": {"id": "98", "login": "other"},
+                    }
+                },
+            ][: body["variables"]["limit"]]
+            self.reply({"data": {"game": {"streams": {"edges": edges}}}})
+
+        elif body["operationName"] == "ChannelStream":
+            live = self.server.live and body["variables"]["login"] not in self.server.offline
+            stream = {"id": "broadcast"} if live else None
+            self.reply({"data": {"user": {"id": "99", "stream": stream}}})
+
+        elif body["operationName"] == "DropsPage_ClaimDropRewards":
+            instance = body["variables"]["input"]["dropInstanceID"]
+            self.server.claimed.append(instance)
+
+            for drop in self.server.drops:
+                if drop["self"]["dropInstanceID"] == instance:
+                    drop["self"]["isClaimed"] = True
+
+            self.reply({"data": {"claimDropRewards": {"status": "ELIGIBLE_FOR_ALL"}}})
+
+        else:
+            self.reply({"errors": [{"message": "unknown operation"}], "data": None})
+
+    def reply(self, data):
+        raw = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+def drop(name, watched, required=60, claimed=False):
+    return {
+        "id": name,
+        "name": name,
+        "requiredMinutesWatched": required,
+        "self": {
+            "currentMinutesWatched": watched,
+            "isClaimed": claimed,
+            "dropInstanceID": name + "-instance",
+        },
+    }
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubTwitch)
+    server.drops = []
+    server.claimed = []
+    server.requests = []
+    server.live = True
+    server.offline = set()
+    server.heartbeats = []
+    server.drops_event = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reputations(monkeypatch, tmp_path):
+    store = reputation.Reputation_Store(file=str(tmp_path / "reputation.json"))
+    monkeypatch.setattr(reputation, "reputations", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch):
+    limiter = rate_limit.Rate_Limiter(1000, 1000, 1000, 1000, 0, {})
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    return limiter
+
+
+@pytest.fixture
+def user():
+    user = account.Account("stub")
+    user.create(temporary=True)
+    user.cookies = [{"name": "auth-token", "value": "token"}]
+    return user
+
+
+def url(server):
+    return "http://127.0.0.1:%d/gql" % server.server_address[1]
+
+
+class TestHttpInventory:
+    def test_claims_then_stops(self, server, user):
+        server.drops = [drop("first", 60), drop("second", 60, claimed=True)]
+        drops = threading.Event()
+
+        inventory = twitch_api.Inventory(user, drops, url=url(server))
+        inventory._progress = progress.Progress_Tracker(0, 0, 0)
+        inventory.run()
+
+        assert server.claimed == ["first-instance"]
+        assert drops.is_set()
+        assert server.requests[0][1]["Client-Id"] == twitch_api.CLIENT_ID
+
+    def test_drops_still_in_progress(self, server, user):
+        server.drops = [drop("first", 10)]
+        drops = threading.Event()
+
+        inventory = twitch_api.Inventory(user, drops, url=url(server))
+        inventory._setup()
+
+        assert not inventory._claim_drop()
+        assert inventory._check_drops_available()
+        assert not drops.is_set()
+
+    def test_bad_token(self, server, user):
+        user.cookies = [{"name": "auth-token", "value": "expired"}]
+        drops = threading.Event()
+
+        inventory = twitch_api.Inventory(user, drops, url=url(server))
+        inventory._setup()
+
+        # Errors must not be mistaken for an empty inventory
+        assert inventory._check_error()
+        assert inventory._check_drops_available()
+        assert not drops.is_set()
+
+    def test_rate_limited(self, server, user, limiter):
+        drops = threading.Event()
+
+        inventory = twitch_api.Inventory(user, drops, url=url(server))
+        inventory._setup()
+
+        assert limiter.stats()["health"]["count"] == 1
+
+    def test_no_auth_cookie(self, user):
+        user.cookies = [{"name": "other", "value": "1"}]
+
+        with pytest.raises(PermissionError):
+            twitch_api.Client(user).token()
+
+
+class TestHttpStream:
+    def stream(self, server, user):
+        stream = twitch_api.Stream(
+            user,
+            server.drops_event,
+            url=url(server),
+            www_url="http://127.0.0.1:%d" % server.server_address[1],
+        )
+        stream._interval = 0.02
+        stream._heartbeat = 0.01
+        return stream
+
+    def test_heartbeats_until_drops_done(self, server, user):
+        stream = self.stream(server, user)
+        stream.run()
+
+        assert len(server.heartbeats) == 3
+        heartbeat = server.heartbeats[0]
+        assert heartbeat["event"] == "minute-watched"
+        assert heartbeat["properties"]["channel_id"] == "99"
+        assert heartbeat["properties"]["broadcast_id"] == "broadcast"
+        assert heartbeat["properties"]["user_id"] == "1"
+
+    def test_offline(self, server, user):
+        server.live = False
+        stream = self.stream(server, user)
+        stream._setup()
+
+        assert stream._find_stream()
+        assert not stream._check_stream_alive()
+
+    def test_fails_over_without_requery(self, server, user, reputations):
+        server.offline = {"streamer"}
+        stream = self.stream(server, user)
+        stream._setup()
+
+        assert stream._find_stream()
+        assert stream._channel["login"] == "streamer"
+        assert not stream._check_stream_alive()
+
+        assert stream._find_stream()
+        assert stream._channel["login"] == "other"
+
+        directory_queries = [
+            body for body, _ in server.requests if body["operationName"] == "DirectoryPage_Game"
+        ]
+        assert len(directory_queries) == 1
+        assert reputations.stability("streamer") < reputations.stability("other")
+
+
+class TestDiscovery:
+    def test_http_fetcher(self, server):
+        channels = discovery.http_fetcher(url(server))()
+
+        assert [channel["login"] for channel in channels] == ["streamer", "other"]
+        assert channels[0]["broadcast id"] == "broadcast"
+        assert "Authorization" not in server.requests[0][1]
+
+    def test_streams_share_directory(self, server, user):
+        directory = discovery.Directory(discovery.http_fetcher(url(server)))
+        streams = [
+            twitch_api.Stream(
+                user,
+                url=url(server),
+                www_url="http://127.0.0.1:%d" % server.server_address[1],
+                directory=directory,
+            )
+            for _ in range(3)
+        ]
+
+        for stream in streams:
+            stream._setup()
+            assert stream._find_stream()
+
+        # One directory query for every stream, spread over both channels
+        directory_queries = [
+            body for body, _ in server.requests if body["operationName"] == "DirectoryPage_Game"
+        ]
+        assert len(directory_queries) == 1
+        assert directory.stats()["assigned"] == {"streamer": 2, "other": 1}
+
+        for stream in streams:
+            stream._finish()
+        assert directory.stats()["assigned"] == {}
+
+
+class TestCampaigns:
+    def test_inventory_drives_stream(self, server, user):
+        paladins = {"game": "Paladins", "tags": [twitch_api.DROPS_TAG]}
+        schedule = campaigns.Campaign_Scheduler([paladins, campaigns.DEFAULT])
+        server.drops = [drop("first", 30)]
+
+        inventory = twitch_api.Inventory(user, url=url(server), schedule=schedule)
+        stream = twitch_api.Stream(
+            user,
+            url=url(server),
+            www_url="http://127.0.0.1:%d" % server.server_address[1],
+            schedule=schedule,
+        )
+        stream._setup()
+        inventory._setup()
+
+        # SMITE has drops in progress so is watched before trying Paladins
+        assert stream._follow_schedule()
+        assert stream._find_stream()
+        directory_queries = [
+            body for body, _ in server.requests if body["operationName"] == "DirectoryPage_Game"
+        ]
+        assert directory_queries[-1]["variables"]["name"] == "SMITE"
+
+        stream._campaign = paladins
+        assert stream._follow_schedule()
+        assert stream._channel == None
+        assert stream._campaign == campaigns.DEFAULT
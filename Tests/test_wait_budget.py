@@ -0,0 +1,54 @@
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.realpath(__file__)), "..", "Abuse"))
+
+from utility import wait_budget
+
+
+class TestWaitBudgets:
+    def budgets(self, tmp_path):
+        return wait_budget.Wait_Budgets(
+            file=str(tmp_path / "budgets.json"), minimum=2, maximum=10, margin=1.5
+        )
+
+    def test_unknown(self, tmp_path):
+        assert self.budgets(tmp_path).timeout("channel", "//p") == 10
+
+    def test_learned(self, tmp_path):
+        budgets = self.budgets(tmp_path)
+        for seconds in [1, 2, 3, 4]:
+            budgets.record("channel", "//p", seconds)
+
+        assert budgets.timeout("channel", "//p") == 6
+        # Never found selectors wait the maximum, not the page's timings
+        assert budgets.timeout("channel", "//h4") == 10
+        assert budgets.timeout("directory", "//p") == 10
+
+    def test_minimum(self, tmp_path):
+        budgets = self.budgets(tmp_path)
+        budgets.record("channel", "//p", 0.1)
+        assert budgets.timeout("channel", "//p") == 2
+
+    def test_persisted(self, tmp_path):
+        budgets = self.budgets(tmp_path)
+        budgets.record("channel", "//p", 3)
+        budgets.save()
+
+        loaded = self.budgets(tmp_path)
+        loaded.load()
+        assert loaded.timeout("channel", "//p") == 4.5
+
+    def test_saved_whole(self, tmp_path):
+        budgets = wait_budget.Wait_Budgets(file=str(tmp_path / "new" / "budgets.json"))
+        budgets.record("channel", "//p", 3)
+        budgets.save()
+
+        assert [file.name for file in (tmp_path / "new").iterdir()] == ["budgets.json"]
+
+    def test_corrupt_starts_fresh(self, tmp_path):
+        (tmp_path / "budgets.json").write_text('{"channel //p": [3')
+
+        budgets = self.budgets(tmp_path)
+        budgets.load()
+        assert budgets.timeout("channel", "//p") == 10